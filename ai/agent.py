@@ -1,16 +1,21 @@
+import math
 import time
 import torch
 import random
 import numpy as np
-from typing import List, Optional, Tuple
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 from domain.board import Board
 from domain.move import Move
 from domain.dice import Dice
+from domain.batch_move_generation import batch_afterstates, batch_has_won, stack_cells, zobrist_hashes
 from domain.move_generation import legal_moves
 from domain.constants import WHITE, BLACK
-from ai.board_evaluator import BoardEvaluator
-from ai.board_encoder import BoardEncoder
-from ai.bearoff import exact_value_on_roll
+from ai.board_evaluator import BoardEvaluator, WeightsWatch
+from ai.board_encoder import BoardEncoder, EncodingCache
+from ai.bearoff import exact_value_on_roll, exact_values_on_roll
+from ai.numpy_inference import TORCH_INFERENCE, make_numpy_evaluator
+from ai.quantization import QUANTIZATION_MODES, QuantizedEvaluator
 
 
 _DIE_SIDES = 6
@@ -27,31 +32,245 @@ def _build_dice_outcomes() -> List[Tuple[int, int, float]]:
 
 
 _DICE_OUTCOMES = _build_dice_outcomes()
+_DICE_WEIGHTS = np.array([weight for _, _, weight in _DICE_OUTCOMES])
 
 
 class _TimeoutError(Exception):
     pass
 
 
+class _ChanceNode:
+    """What a chance node of the N-ply search learned, kept across
+    iterative-deepening iterations (_SearchMemo): the opponent's replies per
+    non-pass dice outcome with their 1-ply scores, the pass outcomes' share
+    of the value, and the latest deeper outcome values and reply scores."""
+
+    __slots__ = ("weights", "replies", "reply_1ply", "pass_value", "values", "reply_scores")
+
+    def __init__(self, weights, replies, reply_1ply, pass_value):
+        self.weights: List[float] = weights
+        self.replies: List[List[Move]] = replies
+        self.reply_1ply: List[List[float]] = reply_1ply
+        self.pass_value: float = pass_value
+        self.values: List[Optional[float]] = [None] * len(weights)
+        self.reply_scores: List[Optional[Dict[Move, float]]] = [None] * len(weights)
+
+
+class _SearchMemo:
+    """Chance nodes of one get_best_move call, keyed by (zobrist, mover), up
+    to `limit` of them.
+
+    Depth d+1 revisits every chance node of depth d one level deeper, so it
+    skips their move generation and 1-ply pre-screens and orders their
+    outcomes and replies by the depth-d results. Transpositions within one
+    depth (the same position after different rolls) hit it too."""
+
+    def __init__(self, limit: int = 2000) -> None:
+        self.nodes: Dict[Tuple[int, int], _ChanceNode] = {}
+        self.limit = limit
+        self.hits = 0
+
+
+class EvalCache:
+    """Bounded LRU of net outputs keyed by (Board.zobrist, perspective): the
+    value the net gives the player on roll, exactly as a leaf evaluation
+    would return it. Exact bear-off values are not cached (the DB is a lookup).
+
+    Values are only valid for the weights they were computed with. `sync`
+    clears the cache when the evaluator's weights changed since the last call
+    (board_evaluator.WeightsWatch), so worker `load_state_dict`s and optimizer
+    steps on a live evaluator invalidate it without any bookkeeping at the
+    call sites.
+    """
+
+    __slots__ = ("capacity", "entries", "hits", "misses", "invalidations", "_watch")
+
+    def __init__(self, capacity: int) -> None:
+        if capacity <= 0:
+            raise ValueError(f"eval cache capacity must be positive, got {capacity}")
+        self.capacity = capacity
+        self.entries: "OrderedDict[Tuple[int, bool], float]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._watch: Optional[WeightsWatch] = None
+
+    def sync(self, evaluator: torch.nn.Module) -> None:
+        if self._watch is None or self._watch.module is not evaluator:
+            self._watch = WeightsWatch(evaluator)
+        if self._watch.changed() and self.entries:
+            self.entries.clear()
+            self.invalidations += 1
+
+    def get(self, key: Tuple[int, bool]) -> Optional[float]:
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return value
+
+    def put(self, key: Tuple[int, bool], value: float) -> None:
+        entries = self.entries
+        entries[key] = value
+        if len(entries) > self.capacity:
+            entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._watch = None
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+class InferenceBuffers:
+    """Reusable float32 batches for Agent's leaf forward passes: encoders write
+    rows straight into `inputs(rows)`, and the net's values land in
+    `outputs(rows)`. Both grow geometrically and never shrink, so a search
+    allocates only while its batches keep reaching new sizes.
+
+    The input batch is a torch tensor's memory (`input_tensor` shares it with
+    the numpy view). With `pin_memory` it is page-locked, so the copy to a
+    CUDA evaluator can be asynchronous.
+    """
+
+    __slots__ = ("input_size", "pin_memory", "_inputs", "_input_tensor", "_outputs")
+
+    def __init__(self, input_size: int, capacity: int = 64, pin_memory: bool = False) -> None:
+        if capacity <= 0:
+            raise ValueError(f"InferenceBuffers capacity must be positive, got {capacity}")
+        self.input_size = input_size
+        self.pin_memory = pin_memory
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int) -> None:
+        self._input_tensor = torch.empty((capacity, self.input_size), dtype=torch.float32,
+                                         pin_memory=self.pin_memory)
+        self._inputs = self._input_tensor.numpy()
+        self._outputs = np.empty((capacity, 1), dtype=np.float32)
+
+    @property
+    def capacity(self) -> int:
+        return len(self._inputs)
+
+    def reserve(self, rows: int) -> None:
+        """Make room for `rows` rows. Growing discards the current contents."""
+        if rows > len(self._inputs):
+            self._allocate(max(rows, 2 * len(self._inputs)))
+
+    def inputs(self, rows: int) -> np.ndarray:
+        """C-contiguous (rows, input_size) view to encode into."""
+        self.reserve(rows)
+        return self._inputs[:rows]
+
+    def input_tensor(self, rows: int) -> torch.Tensor:
+        """The first `rows` input rows as a tensor sharing their memory."""
+        return self._input_tensor[:rows]
+
+    def outputs(self, rows: int) -> np.ndarray:
+        """(rows, 1) view the net's values are written to."""
+        self.reserve(rows)
+        return self._outputs[:rows]
+
+
 class Agent:
     def __init__(self, board_evaluator: BoardEvaluator, board_encoder: BoardEncoder,
-                 bearoff=None):
+                 bearoff=None, encoding_cache: Optional[EncodingCache] = None,
+                 eval_cache: Optional[EvalCache] = None, inference: str = TORCH_INFERENCE,
+                 calibration: Optional[np.ndarray] = None):
         self.board_evaluator = board_evaluator
         self.board_encoder = board_encoder
+        # Optional EvalCache: net leaf values shared by every search depth (and
+        # across iterative-deepening iterations); cleared when the weights or
+        # the inference backend change.
+        self.eval_cache = eval_cache
+        self.set_inference(inference, calibration)
+        # Every leaf batch is encoded into and evaluated from these (_evaluate_inputs).
+        self.buffers = InferenceBuffers(board_encoder.input_size,
+                                        pin_memory=self._model_device().type == "cuda")
+        # Optional ai.board_encoder.EncodingCache over board_encoder: 1-ply leaves
+        # and pass positions are looked up there before being encoded.
+        self.encoding_cache = encoding_cache
         # Optional ai.bearoff.BearoffDB: exact-race positions bypass the net and
         # get exact equity at every leaf-evaluation site.
         self.bearoff = bearoff
         # Depth actually reached by the most recent get_best_move call (search instrumentation).
         self.last_search_depth = 1
+        # Root candidates finished at the depth the deadline interrupted (0 if none was).
+        self.last_search_partial = 0
+        # Optional ai.parallel_search.SearchPool: spreads depth >= 3 root
+        # searches and 2-ply move rankings over worker processes.
+        self.search_pool = None
+
+    def set_inference(self, inference: str, calibration: Optional[np.ndarray] = None,
+                      backend=None) -> None:
+        """Select the backend for leaf forward passes: "torch", "numpy" /
+        "numpy_fp16" (ai.numpy_inference) or "int8_dynamic" / "int8_static"
+        (ai.quantization; static needs encoded `calibration` rows). Non-torch
+        backends track board_evaluator's weights.
+
+        A ready-made `backend` (e.g. an ai.inference_server.InferenceClient)
+        is installed as is, under the name `inference`. Switching backends
+        clears eval_cache, whose values are the old backend's outputs."""
+        switching = hasattr(self, "inference")
+        if backend is not None:
+            self.backend_evaluator = backend
+        elif inference in QUANTIZATION_MODES:
+            self.backend_evaluator = QuantizedEvaluator(self.board_evaluator, inference, calibration)
+        else:
+            self.backend_evaluator = make_numpy_evaluator(self.board_evaluator, inference)
+        self.inference = inference
+        if switching and self.eval_cache is not None:
+            self.eval_cache.clear()
 
     def _exact_value(self, board: Board, persp_is_white: bool) -> Optional[float]:
         """Exact win prob of the perspective player on roll, or None outside
         exact races. Mirrors the net's output semantics exactly."""
         return exact_value_on_roll(board, persp_is_white, self.bearoff)
 
+    def _leaf_encoder(self):
+        """Whatever serves leaf encodings: the cache when there is one."""
+        return self.board_encoder if self.encoding_cache is None else self.encoding_cache
+
+    def _synced_eval_cache(self) -> Optional[EvalCache]:
+        cache = self.eval_cache
+        if cache is not None:
+            cache.sync(self.board_evaluator)
+        return cache
+
     def _model_device(self):
         return next(self.board_evaluator.parameters()).device
 
+    def _evaluate_inputs(self, rows: int) -> np.ndarray:
+        """Net values, (rows,) float32, for the first `rows` rows of
+        `buffers.inputs` on the selected backend. The result is a view into
+        `buffers.outputs`: read it before the next evaluation."""
+        buffers = self.buffers
+        out = buffers.outputs(rows)
+        if self.backend_evaluator is not None:
+            self.backend_evaluator(buffers.inputs(rows), out=out)
+            return out[:, 0]
+        x = buffers.input_tensor(rows)
+        device = self._model_device()
+        if device.type != "cpu":
+            x = x.to(device, non_blocking=buffers.pin_memory)
+        with torch.no_grad():
+            torch.from_numpy(out).copy_(self.board_evaluator(x))
+        return out[:, 0]
+
     @staticmethod
     def _prune_branches(
         moves: List[Move],
@@ -84,125 +303,156 @@ class Agent:
         return survivors
 
     def _evaluate_moves_batch(self, board: Board, possible_moves: List[Move], color: int) -> List[float]:
-        device = self._model_device()
-        is_whites_turn_next = color != WHITE
-        scores: List[float] = [0.0] * len(possible_moves)
-        encoded_afterstates = []
-        encode_indices: List[int] = []
-
-        for idx, move in enumerate(possible_moves):
-            token = board.apply(move, color)
-            if board.has_won(color):
-                scores[idx] = 1.0
-            else:
-                exact = self._exact_value(board, is_whites_turn_next)
-                if exact is not None:
-                    scores[idx] = 1.0 - exact
+        return self.evaluate_moves_many([(board, possible_moves, color)])[0]
+
+    def _net_leaf_values(self, boards: List[Board], persp_flags: List[bool],
+                         cache: Optional[EvalCache]) -> List[float]:
+        """Net values of deferred leaves (clones, each with its perspective) in
+        one encode and forward pass, stored in `cache` when there is one."""
+        rows = len(boards)
+        self._leaf_encoder().encode_boards(boards, persp_flags, out=self.buffers.inputs(rows))
+        values = self._evaluate_inputs(rows).tolist()
+        if cache is not None:
+            for leaf, flag, value in zip(boards, persp_flags, values):
+                cache.put((leaf.zobrist, flag), value)
+        return values
+
+    def evaluate_moves_many(self, requests: List[Tuple[Board, List[Move], int]]) -> List[List[float]]:
+        """1-ply scores for several (board, moves, color) requests at once: the
+        afterstates of all of them go through one encode and forward pass.
+        Self-play that advances many games in lockstep batches its decisions
+        this way; a single request is `evaluate_moves` at 1 ply."""
+        scores = [[0.0] * len(moves) for _, moves, _ in requests]
+        afterstates: List[Board] = []
+        persp_flags: List[bool] = []
+        targets: List[Tuple[int, int]] = []
+        cache = self._synced_eval_cache()
+
+        for r, (board, possible_moves, color) in enumerate(requests):
+            is_whites_turn_next = color != WHITE
+            request_scores = scores[r]
+            for idx, move in enumerate(possible_moves):
+                token = board.apply(move, color)
+                if board.has_won(color):
+                    request_scores[idx] = 1.0
                 else:
-                    encoded_afterstates.append(self.board_encoder.encode_board(board, is_whites_turn=is_whites_turn_next))
-                    encode_indices.append(idx)
-            board.undo(token)
-
-        if encoded_afterstates:
-            board_batch = torch.from_numpy(np.stack(encoded_afterstates)).float().to(device)
-            with torch.no_grad():
-                opponent_values = self.board_evaluator(board_batch).squeeze(1).detach().cpu().numpy()
-            for j, idx in enumerate(encode_indices):
-                scores[idx] = 1.0 - float(opponent_values[j])
+                    exact = self._exact_value(board, is_whites_turn_next)
+                    if exact is None and cache is not None:
+                        exact = cache.get((board.zobrist, is_whites_turn_next))
+                    if exact is not None:
+                        request_scores[idx] = 1.0 - exact
+                    else:
+                        afterstates.append(board.clone())
+                        persp_flags.append(is_whites_turn_next)
+                        targets.append((r, idx))
+                board.undo(token)
+
+        if afterstates:
+            # The cloned afterstates of every request share one encode and forward pass.
+            values = self._net_leaf_values(afterstates, persp_flags, cache)
+            for (r, idx), value in zip(targets, values):
+                scores[r][idx] = 1.0 - value
         return scores
 
     def _evaluate_moves_2ply_batch(self, board: Board, possible_moves: List[Move], color: int) -> List[float]:
         """Expectimax over the 21 distinct dice outcomes. For each candidate move, opponent picks
         the response that minimizes our value; we average across dice weighted by probability.
         Opponent-reply afterstates are encoded from *our* perspective (we are on roll again after
-        the reply), matching the 1-ply/N-ply convention that the net values the player to move."""
-        device = self._model_device()
+        the reply), matching the 1-ply/N-ply convention that the net values the player to move.
+
+        Vectorized over slot-code arrays: the distinct candidate afterstates are stacked once,
+        `batch_afterstates` generates every reply of all of them per roll, and each distinct
+        leaf row is valued once, delta-encoded from its candidate afterstate. Every (candidate, dice) subproblem is a segment of leaf rows;
+        one `np.minimum.reduceat` takes the opponent's choices."""
         opponent_color = -color
         is_our_turn = color == WHITE
 
-        dice = Dice(_DIE_SIDES)
-
-        # Leaf values are gathered into one flat array; exact-race leaves are
-        # resolved immediately via the bear-off DB, the rest in one net batch.
-        leaf_values: List[float] = []
-        pending_encoded: List[np.ndarray] = []
-        pending_slots: List[int] = []
-        plans: List[Optional[List[Tuple[int, int, float, str]]]] = []
-
-        def add_leaf(persp_is_white: bool) -> None:
-            exact = self._exact_value(board, persp_is_white)
-            if exact is not None:
-                leaf_values.append(exact)
-            else:
-                leaf_values.append(0.0)  # placeholder, filled from the net batch
-                pending_slots.append(len(leaf_values) - 1)
-                pending_encoded.append(
-                    self.board_encoder.encode_board(board, is_whites_turn=persp_is_white))
-
+        # Per candidate: -1 for an immediate win, else its distinct afterstate.
+        cand_index: List[int] = []
+        afterstate_index: Dict[int, int] = {}
+        afterstates: List[Board] = []
         for m_c in possible_moves:
             token_c = board.apply(m_c, color)
             if board.has_won(color):
-                plans.append(None)
-                board.undo(token_c)
-                continue
-            cand_plan: List[Tuple[int, int, float, str]] = []
-            for (i, j, weight) in _DICE_OUTCOMES:
-                dice.set(i, j)
-                opp_moves = legal_moves(board, opponent_color, dice)
-                start = len(leaf_values)
-                if not opp_moves:
-                    add_leaf(is_our_turn)
-                    end = len(leaf_values)
-                    cand_plan.append((start, end, weight, "pass"))
-                else:
-                    opp_wins = False
-                    for m_o in opp_moves:
-                        token_o = board.apply(m_o, opponent_color)
-                        if board.has_won(opponent_color):
-                            opp_wins = True
-                            board.undo(token_o)
-                            break
-                        # After the opponent's reply it is our turn again, so encode from
-                        # our perspective — the net values the player on roll.
-                        add_leaf(is_our_turn)
-                        board.undo(token_o)
-                    if opp_wins:
-                        n_keep = sum(1 for s in pending_slots if s < start)
-                        del pending_slots[n_keep:]
-                        del pending_encoded[n_keep:]
-                        del leaf_values[start:]
-                        cand_plan.append((start, start, weight, "opp_win"))
-                    else:
-                        end = len(leaf_values)
-                        cand_plan.append((start, end, weight, "opp_min"))
-            plans.append(cand_plan)
+                cand_index.append(-1)
+            else:
+                known = afterstate_index.setdefault(board.zobrist, len(afterstates))
+                if known == len(afterstates):
+                    afterstates.append(board.clone())
+                cand_index.append(known)
             board.undo(token_c)
-
-        if pending_encoded:
-            board_batch = torch.from_numpy(np.stack(pending_encoded)).float().to(device)
-            with torch.no_grad():
-                net_values = self.board_evaluator(board_batch).squeeze(1).detach().cpu().numpy()
-            for slot, val in zip(pending_slots, net_values):
-                leaf_values[slot] = float(val)
-        values = np.asarray(leaf_values, dtype=np.float32)
-
-        scores: List[float] = []
-        for cand_plan in plans:
-            if cand_plan is None:
-                scores.append(1.0)
-                continue
-            expected = 0.0
-            for (start, end, weight, kind) in cand_plan:
-                if kind == "pass":
-                    val_d = float(values[start])
-                elif kind == "opp_win":
-                    val_d = 0.0
-                else:
-                    # Opponent picks the reply that minimizes our (to-move) value.
-                    val_d = float(values[start:end].min())
-                expected += weight * val_d
-            scores.append(expected)
-        return scores
+        if not afterstates:
+            return [1.0] * len(possible_moves)
+
+        # Leaf rows of subproblem (u, outcome o) carry segment id u * 21 + o. A
+        # candidate the opponent cannot answer is its own leaf (a pass).
+        cand_cells = stack_cells(afterstates)
+        num_outcomes = len(_DICE_OUTCOMES)
+        rows: List[np.ndarray] = []
+        segments: List[np.ndarray] = []
+        parents: List[np.ndarray] = []
+        for o, (i, j, _) in enumerate(_DICE_OUTCOMES):
+            replies = batch_afterstates(cand_cells, opponent_color, i, j, board.home_size)
+            passed = np.ones(len(afterstates), dtype=bool)
+            passed[replies.board_index] = False
+            passed = np.flatnonzero(passed)
+            rows += [replies.cells, cand_cells[passed]]
+            segments += [replies.board_index * num_outcomes + o, passed * num_outcomes + o]
+            parents += [replies.board_index, passed]
+        segment = np.concatenate(segments)
+        order = np.argsort(segment, kind="stable")
+        leaf_cells = np.concatenate(rows)[order]
+        leaf_parent = np.concatenate(parents)[order]
+        starts = np.flatnonzero(np.diff(segment[order], prepend=-1))
+
+        # A reply that wins for the opponent is worth 0.0 to us; the rest are
+        # valued once per distinct position.
+        leaf_values = np.zeros(len(leaf_cells), dtype=np.float32)
+        live = ~batch_has_won(leaf_cells, opponent_color, board.pieces_per_player)
+        unique_cells, first, inverse = np.unique(leaf_cells[live], axis=0, return_index=True,
+                                                 return_inverse=True)
+        unique_parent = leaf_parent[live][first]
+        leaf_values[live] = self._cells_values(unique_cells, is_our_turn, board.home_size,
+                                               (cand_cells, unique_parent))[inverse.reshape(-1)]
+
+        # Opponent picks the reply that minimizes our (to-move) value.
+        mins = np.minimum.reduceat(leaf_values, starts)
+        expected = mins.reshape(-1, num_outcomes).astype(np.float64) @ _DICE_WEIGHTS
+        return [1.0 if c < 0 else float(expected[c]) for c in cand_index]
+
+    def _cells_values(self, cells: np.ndarray, persp_is_white: bool, home_size: int,
+                      parents: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> np.ndarray:
+        """Leaf values, (B,) float32, of a (B, board_size + 2) slot-code array
+        for one perspective: exact races from the bear-off DB, then the eval
+        cache, then one net batch for the rest (stored back into the cache).
+        With `parents` = (parent cells, parent index per row) the net rows are
+        delta-encoded from their parents (BoardEncoder.encode_afterstates)."""
+        values = exact_values_on_roll(cells, persp_is_white, self.bearoff, home_size)
+        cache = self._synced_eval_cache()
+        keys = None
+        if cache is not None:
+            keys = zobrist_hashes(cells)
+            for r in np.flatnonzero(np.isnan(values)):
+                cached = cache.get((keys[r], persp_is_white))
+                if cached is not None:
+                    values[r] = cached
+        pending = np.flatnonzero(np.isnan(values))
+        if len(pending):
+            rows = len(pending)
+            if parents is None:
+                self.board_encoder.encode_boards(cells[pending], persp_is_white,
+                                                 out=self.buffers.inputs(rows))
+            else:
+                parent_cells, parent_index = parents
+                self.board_encoder.encode_afterstates(parent_cells, parent_index[pending],
+                                                      cells[pending], persp_is_white,
+                                                      out=self.buffers.inputs(rows))
+            net_values = self._evaluate_inputs(rows)
+            values[pending] = net_values
+            if cache is not None:
+                for r, val in zip(pending.tolist(), net_values.tolist()):
+                    cache.put((keys[r], persp_is_white), val)
+        return values.astype(np.float32)
 
     def _evaluate_moves_nply(
         self,
@@ -214,6 +464,7 @@ class Agent:
         deadline: Optional[float] = None,
         relative_cutoff: Optional[float] = None,
         max_branch: Optional[int] = None,
+        chance_pruning: bool = False,
     ) -> List[float]:
         """Recursive expectimax with beam pruning at opponent branches.
 
@@ -222,73 +473,198 @@ class Agent:
         moves with 1-ply and prunes them via _prune_branches (relative_cutoff + max_branch,
         falling back to beam_threshold); recurses on survivors. Raises _TimeoutError if
         deadline is exceeded mid-computation.
+
+        With chance_pruning, chance nodes stop early (Star1) once the remaining dice
+        weight cannot move their value across the window their parent needs. The best
+        candidate's score is exact; the others may come back as upper bounds below it.
         """
+        window = (-math.inf, math.inf) if chance_pruning else None
+        return self._expectimax(board, possible_moves, color, depth, beam_threshold, deadline,
+                                relative_cutoff, max_branch, window, None)
+
+    def _expectimax(
+        self,
+        board: Board,
+        possible_moves: List[Move],
+        color: int,
+        depth: int,
+        beam_threshold: float,
+        deadline: Optional[float],
+        relative_cutoff: Optional[float],
+        max_branch: Optional[int],
+        window: Optional[Tuple[float, float]],
+        memo: Optional[_SearchMemo],
+        scores: Optional[List[float]] = None,
+    ) -> List[float]:
+        """Decision node of _evaluate_moves_nply: scores of `possible_moves` for
+        `color`. With a (alpha, beta) window, candidates are searched against the
+        best score so far, and once one reaches beta the rest are skipped and
+        score 0.0 (the node's value is then a lower bound).
+
+        Scores are appended to `scores` when it is given, so a caller still has
+        the finished candidates' scores after a _TimeoutError."""
         if depth <= 1:
             return self._evaluate_moves_batch(board, possible_moves, color)
 
-        device = self._model_device()
-        opponent_color = -color
-        is_our_turn = color == WHITE
-        dice = Dice(_DIE_SIDES)
-        scores: List[float] = []
-
-        for m_c in possible_moves:
+        if scores is None:
+            scores = []
+        for k, m_c in enumerate(possible_moves):
             token_c = board.apply(m_c, color)
             # try/finally guarantees token_c is undone even if a deadline (_TimeoutError)
             # unwinds the recursion from a deeper frame mid-iteration.
             try:
                 if board.has_won(color):
-                    scores.append(1.0)
-                    continue
-
-                expected = 0.0
-                # Collect pass-positions (no opp moves) for a single deferred batch resolve
-                pass_encoded: List[np.ndarray] = []
-                pass_weights: List[float] = []
-
-                for (d1, d2, weight) in _DICE_OUTCOMES:
-                    if deadline is not None and time.monotonic() > deadline:
-                        raise _TimeoutError()
-
-                    dice.set(d1, d2)
-                    opp_moves = legal_moves(board, opponent_color, dice)
-
-                    if not opp_moves:
-                        exact = self._exact_value(board, is_our_turn)
-                        if exact is not None:
-                            expected += weight * exact
-                        else:
-                            pass_encoded.append(self.board_encoder.encode_board(board, is_whites_turn=is_our_turn))
-                            pass_weights.append(weight)
-                        continue
-
-                    # 1-ply pre-screen to prune unpromising opponent replies
-                    opp_1ply = self._evaluate_moves_batch(board, opp_moves, opponent_color)
-                    surviving_idx = self._prune_branches(
-                        opp_moves, opp_1ply, beam_threshold, relative_cutoff, max_branch
-                    )
-                    surviving = [opp_moves[i] for i in surviving_idx]
-
-                    opp_deep = self._evaluate_moves_nply(
-                        board, surviving, opponent_color, depth - 1, beam_threshold, deadline,
-                        relative_cutoff, max_branch,
-                    )
-                    expected += weight * (1.0 - max(opp_deep))
-
-                # Resolve all pass-positions in one batch
-                if pass_encoded:
-                    batch = torch.from_numpy(np.stack(pass_encoded)).float().to(device)
-                    with torch.no_grad():
-                        vals = self.board_evaluator(batch).squeeze(1).detach().cpu().numpy()
-                    for val, w in zip(vals, pass_weights):
-                        expected += w * float(val)
-
-                scores.append(expected)
+                    value = 1.0
+                else:
+                    value = self._chance_value(board, color, depth, beam_threshold, deadline,
+                                               relative_cutoff, max_branch, window, memo)
             finally:
                 board.undo(token_c)
-
+            scores.append(value)
+            if window is not None:
+                alpha, beta = window
+                if value >= beta:
+                    scores.extend([0.0] * (len(possible_moves) - k - 1))
+                    break
+                window = (max(alpha, value), beta)
         return scores
 
+    def _chance_value(
+        self,
+        board: Board,
+        color: int,
+        depth: int,
+        beam_threshold: float,
+        deadline: Optional[float],
+        relative_cutoff: Optional[float],
+        max_branch: Optional[int],
+        window: Optional[Tuple[float, float]],
+        memo: Optional[_SearchMemo],
+    ) -> float:
+        """Chance node of _evaluate_moves_nply: expected value for `color`, who has
+        just moved on `board`, over the opponent's 21 dice outcomes.
+
+        Pass outcomes share one leaf (the board itself) and are resolved first.
+        All other outcomes get their 1-ply reply pre-screen in one batch; at depth
+        2 the pre-screen is the search. Deeper, each outcome recurses on the
+        surviving replies. With a window the pre-screen (or an earlier, shallower
+        visit recorded in `memo`) also orders the outcomes, largest expected
+        effect on the bound first, and the node returns an upper bound as soon
+        as it cannot exceed alpha, or a lower bound once it reaches beta (values
+        are in [0, 1])."""
+        if deadline is not None and time.monotonic() > deadline:
+            raise _TimeoutError()
+
+        node = self._memo_chance_node(board, color, memo)
+        weights = node.weights
+        expected = node.pass_value
+        if not weights:
+            return expected
+
+        opp_1ply = node.reply_1ply
+        if depth == 2:
+            # The surviving replies would be re-scored at 1 ply; the best is already known.
+            for weight, scores in zip(weights, opp_1ply):
+                expected += weight * (1.0 - max(scores))
+            return expected
+
+        opponent_color = -color
+        order = range(len(weights))
+        if window is not None:
+            alpha, beta = window
+            outcome_values = [1.0 - max(scores) if value is None else value
+                              for value, scores in zip(node.values, opp_1ply)]
+            estimate = expected + sum(w * v for w, v in zip(weights, outcome_values))
+            if estimate <= alpha:
+                # Expected to fail low: strong replies lower the upper bound fastest.
+                order = sorted(order, key=lambda i: -weights[i] * (1.0 - outcome_values[i]))
+            elif estimate >= beta:
+                order = sorted(order, key=lambda i: -weights[i] * outcome_values[i])
+        remaining = sum(weights)
+
+        for i in order:
+            weight = weights[i]
+            opp_moves = node.replies[i]
+            surviving_idx = self._prune_branches(
+                opp_moves, opp_1ply[i], beam_threshold, relative_cutoff, max_branch
+            )
+            surviving = [opp_moves[j] for j in surviving_idx]
+            previous = node.reply_scores[i]
+            if previous is not None:
+                surviving.sort(key=lambda m: -previous.get(m, 0.0))
+            remaining -= weight
+            child_window = None
+            if window is not None:
+                # Reply values at or below `low` lift us to beta even if every
+                # remaining outcome scores 0; values at or above `high` keep us
+                # at or below alpha even if every remaining outcome scores 1.
+                low = 1.0 - (beta - expected) / weight
+                high = 1.0 - (alpha - expected - remaining) / weight
+                child_window = (low, high)
+
+            opp_deep = self._expectimax(
+                board, surviving, opponent_color, depth - 1, beam_threshold, deadline,
+                relative_cutoff, max_branch, child_window, memo,
+            )
+            best_reply = max(opp_deep)
+            expected += weight * (1.0 - best_reply)
+            if memo is not None:
+                node.values[i] = 1.0 - best_reply
+                node.reply_scores[i] = dict(zip(surviving, opp_deep))
+            if child_window is not None:
+                if best_reply >= child_window[1]:
+                    return expected + remaining
+                if best_reply <= child_window[0]:
+                    return expected
+        return expected
+
+    def _memo_chance_node(self, board: Board, color: int,
+                          memo: Optional[_SearchMemo]) -> _ChanceNode:
+        """The chance node after `color` moved on `board`, from `memo` or expanded."""
+        if memo is None:
+            return self._expand_chance_node(board, color)
+        key = (board.zobrist, color)
+        node = memo.nodes.get(key)
+        if node is not None:
+            memo.hits += 1
+            return node
+        node = self._expand_chance_node(board, color)
+        if len(memo.nodes) < memo.limit:
+            memo.nodes[key] = node
+        return node
+
+    def _expand_chance_node(self, board: Board, color: int) -> _ChanceNode:
+        """Generate the opponent's replies to `board` for every dice outcome,
+        score them at 1 ply in one batch, and value the pass outcomes."""
+        opponent_color = -color
+        is_our_turn = color == WHITE
+        dice = Dice(_DIE_SIDES)
+        weights: List[float] = []
+        requests: List[Tuple[Board, List[Move], int]] = []
+        pass_weight = 0.0
+        for (d1, d2, weight) in _DICE_OUTCOMES:
+            dice.set(d1, d2)
+            opp_moves = legal_moves(board, opponent_color, dice, compact=True)
+            if opp_moves:
+                weights.append(weight)
+                requests.append((board, opp_moves, opponent_color))
+            else:
+                pass_weight += weight
+
+        pass_value = 0.0
+        if pass_weight > 0.0:
+            # The opponent passes and we are on roll again on the same board.
+            value = self._exact_value(board, is_our_turn)
+            if value is None:
+                cache = self._synced_eval_cache()
+                if cache is not None:
+                    value = cache.get((board.zobrist, is_our_turn))
+                if value is None:
+                    value = self._net_leaf_values([board], [is_our_turn], cache)[0]
+            pass_value = pass_weight * value
+        replies = [moves for _, moves, _ in requests]
+        return _ChanceNode(weights, replies, self.evaluate_moves_many(requests), pass_value)
+
     def get_best_move(
         self,
         board: Board,
@@ -300,7 +676,9 @@ class Agent:
         relative_cutoff: Optional[float] = None,
         max_branch: Optional[int] = None,
         max_depth: Optional[int] = None,
+        chance_pruning: bool = False,
     ) -> Tuple[Optional[Move], float]:
+        self.last_search_partial = 0
         if not possible_moves:
             self.last_search_depth = 0
             return None, 0.0
@@ -312,7 +690,7 @@ class Agent:
         # Non-time-budget path: existing fixed-depth behavior
         if time_budget_s is None:
             if lookahead_plies >= 2:
-                move_scores = self._evaluate_moves_2ply_batch(board, possible_moves, color)
+                move_scores = self.evaluate_moves(board, possible_moves, color, lookahead_plies=2)
                 self.last_search_depth = 2
             else:
                 move_scores = self._evaluate_moves_batch(board, possible_moves, color)
@@ -328,22 +706,42 @@ class Agent:
         best_idx = int(max(range(len(best_scores)), key=lambda i: best_scores[i]))
         self.last_search_depth = 1
 
+        # Chance nodes carry their pre-screens and orderings into the next depth.
+        memo = _SearchMemo()
         depth = 2
         while time.monotonic() < deadline:
             if max_depth is not None and depth > max_depth:
                 break  # don't attempt depths we won't realistically complete
+            # Candidates best-first by the previous depth's scores.
             candidate_indices = self._prune_branches(
                 possible_moves, best_scores, beam_threshold, relative_cutoff, max_branch
             )
             candidate_moves = [possible_moves[i] for i in candidate_indices]
+            window = (-math.inf, math.inf) if chance_pruning else None
 
+            partial: List[float] = []
             try:
-                partial = self._evaluate_moves_nply(
-                    board, candidate_moves, color, depth, beam_threshold, deadline,
-                    relative_cutoff, max_branch,
-                )
+                if self.search_pool is not None and depth >= 3:
+                    self.search_pool.search_root(
+                        self, board, candidate_moves, color, depth, beam_threshold, deadline,
+                        relative_cutoff, max_branch, chance_pruning, memo, partial,
+                    )
+                else:
+                    self._expectimax(
+                        board, candidate_moves, color, depth, beam_threshold, deadline,
+                        relative_cutoff, max_branch, window, memo, partial,
+                    )
             except _TimeoutError:
-                break  # discard partial results, keep previous depth's best
+                # The candidates finished at this depth include the previous best
+                # (searched first); play the best of them. Their scores are not
+                # comparable with the unfinished candidates' shallower ones.
+                if partial:
+                    j = int(max(range(len(partial)), key=lambda k: partial[k]))
+                    best_idx = candidate_indices[j]
+                    best_scores = list(best_scores)
+                    best_scores[best_idx] = partial[j]
+                    self.last_search_partial = len(partial)
+                break
 
             new_scores = list(best_scores)
             for j, i in enumerate(candidate_indices):
@@ -359,6 +757,8 @@ class Agent:
         if not possible_moves:
             return []
         if lookahead_plies >= 2:
+            if self.search_pool is not None and len(possible_moves) > 1:
+                return self.search_pool.evaluate_moves_2ply(board, possible_moves, color)
             return self._evaluate_moves_2ply_batch(board, possible_moves, color)
         return self._evaluate_moves_batch(board, possible_moves, color)
 
@@ -368,27 +768,54 @@ class Agent:
         a one-ply Bellman backup of the raw net eval — a strictly better bootstrap target than
         net(position), used by the depth-2 TD-target experiment (E14). Returns a win-prob for
         `color`, matching the perspective of the net's own bootstrap values."""
+        return self.position_values_lookahead([(board, color)])[0]
+
+    def position_values_lookahead(self, positions: List[Tuple[Board, int]]) -> List[float]:
+        """`position_value_lookahead` for several (board, color) positions, with
+        the 1-ply leaves of all their dice outcomes in one batch."""
+        return [float(sum(weight * v for (_, _, weight), v in zip(_DICE_OUTCOMES, values)))
+                for values in self.roll_values(positions)]
+
+    def roll_values(self, positions: List[Tuple[Board, int]]) -> List[List[float]]:
+        """Per (board, color) position, the value for `color` of each of the 21
+        dice outcomes (in `_DICE_OUTCOMES` order): the best 1-ply move score,
+        or for a pass 1 - the opponent's static value. Their weighted sum is
+        `position_value_lookahead`; the gap between the rolled outcome's value
+        and that sum is the roll's luck (rollout variance reduction)."""
         dice = Dice(_DIE_SIDES)
-        opp_is_white = (color != WHITE)
-        device = self._model_device()
-        expected = 0.0
-        for (i, j, weight) in _DICE_OUTCOMES:
-            dice.set(i, j)
-            moves = legal_moves(board, color, dice)
-            if not moves:
+        cache = self._synced_eval_cache()
+        values = [[0.0] * len(_DICE_OUTCOMES) for _ in positions]
+        requests: List[Tuple[Board, List[Move], int]] = []
+        request_owner: List[Tuple[int, int]] = []
+        passes: List[Board] = []
+        pass_flags: List[bool] = []
+        pass_owner: List[Tuple[int, int]] = []
+        for p, (board, color) in enumerate(positions):
+            opp_is_white = (color != WHITE)
+            for o, (i, j, _) in enumerate(_DICE_OUTCOMES):
+                dice.set(i, j)
+                moves = legal_moves(board, color, dice, compact=True)
+                if moves:
+                    requests.append((board, moves, color))
+                    request_owner.append((p, o))
+                    continue
                 # `color` has no legal move and passes; value for `color` is 1 - opponent's static value.
                 exact = self._exact_value(board, opp_is_white)
+                if exact is None and cache is not None:
+                    exact = cache.get((board.zobrist, opp_is_white))
                 if exact is not None:
-                    v = exact
+                    values[p][o] = 1.0 - exact
                 else:
-                    enc = self.board_encoder.encode_board(board, is_whites_turn=opp_is_white)
-                    with torch.no_grad():
-                        v = float(self.board_evaluator(
-                            torch.from_numpy(enc).float().unsqueeze(0).to(device)).squeeze())
-                expected += weight * (1.0 - v)
-            else:
-                expected += weight * max(self._evaluate_moves_batch(board, moves, color))
-        return float(expected)
+                    passes.append(board.clone())
+                    pass_flags.append(opp_is_white)
+                    pass_owner.append((p, o))
+        if passes:
+            for (p, o), v in zip(pass_owner, self._net_leaf_values(passes, pass_flags, cache)):
+                values[p][o] = 1.0 - float(v)
+        for (p, o), scores in zip(request_owner, self.evaluate_moves_many(requests)):
+            values[p][o] = float(max(scores))
+        return values
+
 
 class RandomAgent:
     """An agent that chooses a move randomly from the possible moves."""
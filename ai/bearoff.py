@@ -32,9 +32,10 @@ from typing import Dict, List, Optional, Tuple
 import numpy as np
 
 from domain.board import Board
-from domain.constants import BLACK, WHITE
+from domain.constants import BLACK
 from domain.dice import Dice
 from domain.move_generation import legal_moves
+from domain.zobrist import PIN_FLAG
 
 # Truncation length of the rolls-to-finish pmf. Exact-die bear-off makes some
 # states very slow: 15 checkers at distance 1 only come off via rolls containing
@@ -154,7 +155,7 @@ class BearoffDB:
             e_acc = 0.0
             for (d1, d2, weight) in outcomes:
                 dice.set(d1, d2)
-                moves = legal_moves(board, BLACK, dice)
+                moves = legal_moves(board, BLACK, dice, compact=True)
                 if not moves:
                     p_pass += weight
                     continue
@@ -241,23 +242,22 @@ def race_state(board: Board) -> Optional[Tuple[Tuple[int, ...], Tuple[int, ...]]
     owner's home quadrant. Otherwise None.
 
     Those two conditions imply no future contact: White's checkers are all on
-    points board_size-home_size+1.., Black's all on 1..home_size, moving apart."""
+    points board_size-home_size+1.., Black's all on 1..home_size, moving apart.
+    Non-races (the common case at search leaves) are rejected in O(1) via the
+    board's incremental summary counters."""
+    if not board.is_pure_race():
+        return None
     bsize = board.board_size
     hsize = board.home_size
     white = [0] * hsize
     black = [0] * hsize
-    for i in range(1, bsize + 1):
-        if board.n[i] == 0:
-            continue
-        if board.pinned[i]:
-            return None
-        c = board.color[i]
-        if not board.is_home(c, i):
-            return None
-        if c == WHITE:
-            white[bsize - i] += board.n[i]  # distance = bsize + 1 - i
-        else:
-            black[i - 1] += board.n[i]  # distance = i
+    # Only the two home quadrants can be occupied now.
+    for d in range(1, hsize + 1):
+        i = bsize + 1 - d
+        if board.n[i]:
+            white[d - 1] = board.n[i]
+        if board.n[d]:
+            black[d - 1] = board.n[d]
     return tuple(white), tuple(black)
 
 
@@ -274,3 +274,26 @@ def exact_value_on_roll(board: Board, persp_is_white: bool,
     white, black = rs
     me, opp = (white, black) if persp_is_white else (black, white)
     return db.win_prob_on_roll(me, opp)
+
+
+def exact_values_on_roll(cells: np.ndarray, persp_is_white: bool, db: Optional[BearoffDB],
+                         home_size: int) -> np.ndarray:
+    """`exact_value_on_roll` for every row of a (B, board_size + 2) array of
+    slot codes (domain.zobrist): (B,) float64, NaN where the row is not an
+    exact race (everywhere without a DB)."""
+    values = np.full(len(cells), np.nan)
+    if db is None or not len(cells):
+        return values
+    bsize = cells.shape[1] - 2
+    play = cells[:, 1:bsize + 1]
+    slot = np.arange(1, bsize + 1)
+    outside_w = (play > 0) & (slot < bsize - home_size + 1)
+    outside_b = (play < 0) & (slot > home_size)
+    race = ~((np.abs(play) & PIN_FLAG) != 0).any(axis=1) & ~(outside_w | outside_b).any(axis=1)
+    for r in np.flatnonzero(race):
+        row = cells[r]
+        white = tuple(max(int(row[bsize + 1 - d]), 0) for d in range(1, home_size + 1))
+        black = tuple(max(-int(row[d]), 0) for d in range(1, home_size + 1))
+        me, opp = (white, black) if persp_is_white else (black, white)
+        values[r] = db.win_prob_on_roll(me, opp)
+    return values
@@ -1,13 +1,19 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
 import numpy as np
 
+from domain.batch_move_generation import stack_cells
 from domain.board import Board
 from domain.constants import WHITE, BLACK
+from domain.zobrist import CODE_OFFSET, CODE_SPAN, PIN_FLAG, STACK_MASK
 from config.config_loader import ConfigLoader
 
 # Encoder versions kept for backward compatibility.
 LEGACY_V1 = "legacy_unary_v1"   # gold_v1..v4: 2 color bits + 2 captured + N count
 UNARY_V2 = "unary_v2"           # gold_v5: 1 color bit + 2 captured + N count
 UNARY_V3 = "unary_v3"           # current: unary_v2 raw + 18 smart features
+UNARY_V3_RAW = "unary_v3_raw"   # unary_v2 raw only; the net appends the 18 (ai.fixed_features)
 
 SMART_FEATURE_COUNT = 18
 
@@ -27,16 +33,233 @@ class BoardEncoder:
         self._num_points = self.board_size + 2  # 0 and N+1 are bear-off slots
         self._raw_size = self._num_points * self.point_size
         self._smart_size = SMART_FEATURE_COUNT if version == UNARY_V3 else 0
+        # Batch-path lookup tables, built on first encode_boards call.
+        self._tables = None
+        self._sparse_table = None
+        self._slot_base = np.arange(self._num_points) * CODE_SPAN + CODE_OFFSET
 
     @property
     def input_size(self) -> int:
         return self._raw_size + self._smart_size
 
+    def fixed_features(self):
+        """The module to prepend to BoardEvaluator's first layer for this
+        version (`FixedFeatures` for unary_v3_raw), or None."""
+        if self.version != UNARY_V3_RAW:
+            return None
+        from ai.fixed_features import FixedFeatures
+        return FixedFeatures(self.board_size, self.pieces_per_player, self.home_size)
+
     def encode_board(self, board: Board, is_whites_turn: bool) -> np.ndarray:
         if self.version == LEGACY_V1:
             return self._encode_legacy(board, is_whites_turn)
         return self._encode_modern(board, is_whites_turn)
 
+    def encode_boards(self, boards: Union[Sequence, np.ndarray], persp_flags,
+                      out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Encode a batch in one vectorized pass into a (B, input_size) float32 array.
+
+        `boards` is a sequence of Board / PackedBoard or a (B, board_size + 2)
+        array of slot codes (domain.zobrist); `persp_flags` is one is-white's-turn
+        flag per board, or a single flag for the whole batch. Row b is bit-for-bit
+        `encode_board(boards[b], persp_flags[b])`. When `out` is given it must be a
+        C-contiguous (B, input_size) float32 array; it is fully overwritten and
+        returned."""
+        rel = self._relative_codes(boards, persp_flags)
+        out = self._batch_out(out, rel.shape[0])
+        raw_table, feature_table, held_table, _ = self._lookup_tables()
+        self._raw_view(out)[...] = raw_table[rel + CODE_OFFSET]
+        if self.version == UNARY_V3:
+            idx = rel + self._slot_base
+            self._write_smart(out[:, self._raw_size:], feature_table[idx].sum(axis=1), held_table[idx])
+        return out
+
+    def encode_afterstates(self, parents: np.ndarray, parent_index: np.ndarray,
+                           cells: np.ndarray, is_whites_turn: bool,
+                           out: Optional[np.ndarray] = None) -> np.ndarray:
+        """`encode_boards(cells, is_whites_turn)` for rows that each lie a move
+        away from a parent position, by delta encoding.
+
+        `parents` is a (P, board_size + 2) slot-code array and row b of `cells`
+        an afterstate of `parents[parent_index[b]]`. For unary_v3 the parents
+        are encoded once; each row starts as a copy of its parent's encoding
+        and only the slots where it differs are re-encoded: raw blocks from the
+        code table, features 0-13 by adding per-slot table deltas to the
+        parent's sums, primes from the row's held mask. The other versions
+        have no summed features to save, so they encode the rows directly.
+        Bit-for-bit equal to `encode_boards`; `out` as there."""
+        if self.version != UNARY_V3:
+            return self.encode_boards(cells, is_whites_turn, out)
+        rel_parents = self._relative_codes(parents, is_whites_turn)
+        rel = self._relative_codes(cells, is_whites_turn)
+        out = self._batch_out(out, rel.shape[0])
+        raw_table, feature_table, held_table, _ = self._lookup_tables()
+        np.take(self.encode_boards(parents, is_whites_turn), parent_index, axis=0, out=out)
+        # Row-major, so each row's patches are contiguous.
+        rows, slots = np.nonzero(rel != rel_parents[parent_index])
+        codes = rel[rows, slots]
+        self._raw_view(out)[rows, slots] = raw_table[codes + CODE_OFFSET]
+        parent_idx = rel_parents + self._slot_base
+        counts = feature_table[parent_idx].sum(axis=1)[parent_index]
+        if len(rows):
+            delta = (feature_table[codes + self._slot_base[slots]]
+                     - feature_table[parent_idx[parent_index[rows], slots]])
+            starts = np.flatnonzero(np.diff(rows, prepend=-1))
+            counts[rows[starts]] += np.add.reduceat(delta, starts, axis=0)
+        self._write_smart(out[:, self._raw_size:], counts, held_table[rel + self._slot_base])
+        return out
+
+    def encode_sparse(self, boards: Union[Sequence, np.ndarray], persp_flags
+                      ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Sparse form of `encode_boards` for `BoardEvaluator.forward_sparse`.
+
+        Every raw feature is 0 or 1, so the raw section is returned as the
+        positions of its ones: `indices` (N,) int32, row after row in ascending
+        order, with `offsets` (B,) int32 the start of each row in `indices`.
+        `dense` (B, input_size - raw_size) float32 holds the remaining features
+        (the 18 unary_v3 ones; zero width for the other versions). Same inputs
+        as `encode_boards`."""
+        rel = self._relative_codes(boards, persp_flags)
+        batch = rel.shape[0]
+        idx = rel + self._slot_base
+        if self._sparse_table is None:
+            self._sparse_table = self._build_sparse_table()
+        active = self._sparse_table[idx].reshape(batch, -1)
+        valid = active >= 0
+        indices = active[valid]
+        offsets = np.zeros(batch, dtype=np.int32)
+        np.cumsum(valid.sum(axis=1)[:-1], out=offsets[1:])
+        dense = np.empty((batch, self._smart_size), dtype=np.float32)
+        if self.version == UNARY_V3:
+            _, feature_table, held_table, _ = self._lookup_tables()
+            self._write_smart(dense, feature_table[idx].sum(axis=1), held_table[idx])
+        return indices, offsets, dense
+
+    def _relative_codes(self, boards: Union[Sequence, np.ndarray], persp_flags) -> np.ndarray:
+        """(B, num_points) slot codes in current-player coordinates: Black's
+        view is the slot-reversed board, and a positive code is always "ours"."""
+        n = self._num_points
+        cells = boards if isinstance(boards, np.ndarray) else stack_cells(boards)
+        if cells.size == 0:
+            cells = cells.reshape(0, n)
+        if cells.ndim != 2 or cells.shape[1] != n:
+            raise ValueError(f"expected (B, {n}) slot codes, got shape {cells.shape}")
+        if isinstance(persp_flags, (bool, np.bool_)):
+            return cells if persp_flags else -cells[:, ::-1]
+        persp = np.asarray(persp_flags, dtype=bool)
+        return np.where(persp[:, None], cells, -cells[:, ::-1])
+
+    def _batch_out(self, out: Optional[np.ndarray], batch: int) -> np.ndarray:
+        if out is None:
+            return np.empty((batch, self.input_size), dtype=np.float32)
+        if (out.shape != (batch, self.input_size) or out.dtype != np.float32
+                or not out.flags.c_contiguous):
+            raise ValueError(f"out must be a C-contiguous float32 array of shape "
+                             f"{(batch, self.input_size)}")
+        return out
+
+    def _raw_view(self, out: np.ndarray) -> np.ndarray:
+        """(B, num_points, point_size) view of the raw section of a batch."""
+        ps = self.point_size
+        return np.ndarray((out.shape[0], self._num_points, ps), np.float32, out, 0,
+                          (out.strides[0], ps * out.itemsize, out.itemsize))
+
+    def _lookup_tables(self):
+        if self._tables is None:
+            self._tables = self._build_tables()
+        return self._tables
+
+    def _write_smart(self, smart: np.ndarray, counts: np.ndarray, held: np.ndarray) -> None:
+        """Fill (B, 18) unary_v3 features from summed feature-table rows
+        `counts` (B, 14) and the per-slot held mask `held` (B, num_points, 2)."""
+        batch = smart.shape[0]
+        scale = self._lookup_tables()[3]
+        # Per-slot counters are additive; scale their sums in float64 and store
+        # as float32 — the scalar path's exact rounding.
+        smart[:, :14] = counts * scale
+        # Longest run of consecutive held points, both colors at once: the
+        # running held count minus its value at the last gap.
+        held = held.transpose(0, 2, 1).reshape(2 * batch, self._num_points)
+        total = np.cumsum(held, axis=1)
+        at_gap = np.maximum.accumulate(np.where(held, 0, total), axis=1)
+        prime = (total - at_gap).max(axis=1, initial=0).reshape(batch, 2)
+        smart[:, 14:16] = prime * (1.0 / self.home_size)
+        smart[:, 16] = (counts[:, 0] - counts[:, 1]) * scale[0]
+        smart[:, 17] = (counts[:, 12] - counts[:, 13]) * scale[12]
+
+    def _build_tables(self):
+        """Lookup tables for `encode_boards`, indexed by perspective-relative slot
+        code (see `_encode_legacy` / `_encode_modern` for the per-field rules):
+
+        - raw:     code -> the slot's point_size raw block
+        - feature: slot * CODE_SPAN + CODE_OFFSET + code -> that slot's
+                   contribution to unary_v3 features 0..13
+        - held:    same index -> (ours held, theirs held) for prime runs
+        - scale:   float64 multipliers turning feature sums into features 0..13
+        """
+        n = self._num_points
+        bs = self.board_size
+        last_slot = n - 1
+        legacy = self.version == LEGACY_V1
+        raw = np.zeros((CODE_SPAN, self.point_size), dtype=np.float32)
+        feature = np.zeros((n * CODE_SPAN, 14), dtype=np.int32)
+        held = np.zeros((n * CODE_SPAN, 2), dtype=bool)
+        for code in range(-CODE_OFFSET + 1, CODE_OFFSET):
+            mag = abs(code)
+            count = mag & STACK_MASK
+            if count == 0:
+                continue
+            is_ours = code > 0
+            captured_by_our = bool(mag & PIN_FLAG) and is_ours
+            captured_by_their = bool(mag & PIN_FLAG) and not is_ours
+            row = raw[code + CODE_OFFSET]
+            if legacy:
+                row[:4] = (1.0, not is_ours, captured_by_our, captured_by_their)
+                row[4:4 + count] = 1.0
+            else:
+                row[:3] = (not is_ours, captured_by_our, captured_by_their)
+                row[3:3 + count] = 1.0
+
+            our_count = count if is_ours else int(captured_by_their)
+            their_count = int(captured_by_our) if is_ours else count
+            for slot in range(n):
+                f = feature[slot * CODE_SPAN + CODE_OFFSET + code]
+                h = held[slot * CODE_SPAN + CODE_OFFSET + code]
+                if slot == 0 or slot == last_slot:
+                    f[12] = our_count
+                    f[13] = their_count
+                    continue
+                f[0] = our_count * (last_slot - slot)
+                f[1] = their_count * slot
+                f[2] = is_ours and count == 1
+                f[3] = not is_ours and count == 1
+                f[4] = h[0] = is_ours and count >= 2
+                f[5] = h[1] = not is_ours and count >= 2
+                f[6] = captured_by_their
+                f[7] = captured_by_our
+                if bs - self.home_size + 1 <= slot <= bs:
+                    f[8] = our_count
+                    f[11] = their_count
+                elif 1 <= slot <= self.home_size:
+                    f[9] = their_count
+                    f[10] = our_count
+        ppp = self.pieces_per_player
+        scale = np.array([1.0 / (ppp * bs)] * 2 + [1.0 / ppp] * 12)
+        return raw, feature, held, scale
+
+    def _build_sparse_table(self) -> np.ndarray:
+        """slot * CODE_SPAN + CODE_OFFSET + code -> flat raw positions of the
+        slot's ones, ascending, padded with -1 to the widest slot."""
+        raw = self._lookup_tables()[0] != 0
+        width = int(raw.sum(axis=1).max())
+        per_code = np.full((CODE_SPAN, width), -1, dtype=np.int32)
+        for code, row in enumerate(raw):
+            ones = np.flatnonzero(row)
+            per_code[code, :len(ones)] = ones
+        slot_start = np.arange(self._num_points, dtype=np.int32)[:, None, None] * self.point_size
+        table = np.where(per_code >= 0, per_code + slot_start, -1)
+        return table.reshape(self._num_points * CODE_SPAN, width)
+
     def _encode_legacy(self, board: Board, is_whites_turn: bool) -> np.ndarray:
         out = np.zeros(self._raw_size, dtype=np.float32)
         ps = self.point_size
@@ -242,3 +465,100 @@ class BoardEncoder:
             smart[17] = (our_borne - their_borne) * inv_ppp
 
         return out
+
+
+class EncodingCache:
+    """Bounded LRU of encoded rows keyed by (Board.zobrist, perspective).
+
+    A drop-in for its encoder's `encode_board` / `encode_boards`. Cached rows
+    are read-only float32 arrays: `encode_board` hands the stored row itself
+    back, `encode_boards` copies rows into a fresh (or the given) batch and
+    encodes only the misses, in one `encoder.encode_boards` call. Every row is
+    its own array, so a row a caller still holds stays valid after eviction.
+
+    Positions are identified by Board.zobrist alone, so one cache serves one
+    encoder (version and geometry are not part of the key), and boards whose
+    slot arrays were written directly must be recompute()d first. Encodings
+    don't depend on network weights; the cache survives weight updates.
+    """
+
+    __slots__ = ("encoder", "capacity", "entries", "hits", "misses")
+
+    def __init__(self, encoder: BoardEncoder, capacity: int) -> None:
+        if capacity <= 0:
+            raise ValueError(f"encoding cache capacity must be positive, got {capacity}")
+        self.encoder = encoder
+        self.capacity = capacity
+        self.entries: "OrderedDict[Tuple[int, bool], np.ndarray]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def input_size(self) -> int:
+        return self.encoder.input_size
+
+    def encode_board(self, board: Board, is_whites_turn: bool) -> np.ndarray:
+        key = (board.zobrist, bool(is_whites_turn))
+        entries = self.entries
+        row = entries.get(key)
+        if row is not None:
+            entries.move_to_end(key)
+            self.hits += 1
+            return row
+        self.misses += 1
+        row = self.encoder.encode_board(board, is_whites_turn)
+        self._store(key, row)
+        return row
+
+    def encode_boards(self, boards: Sequence, persp_flags,
+                      out: Optional[np.ndarray] = None) -> np.ndarray:
+        """`BoardEncoder.encode_boards` for a sequence of Board / PackedBoard
+        (the key needs `.zobrist`). The returned batch is the caller's."""
+        batch = len(boards)
+        flags = np.broadcast_to(np.asarray(persp_flags, dtype=bool), (batch,)).tolist()
+        out = self.encoder._batch_out(out, batch)
+        keys = [(board.zobrist, flag) for board, flag in zip(boards, flags)]
+        entries = self.entries
+        missing: List[int] = []
+        for i, key in enumerate(keys):
+            row = entries.get(key)
+            if row is None:
+                missing.append(i)
+            else:
+                entries.move_to_end(key)
+                out[i] = row
+        self.hits += batch - len(missing)
+        self.misses += len(missing)
+        if not missing:
+            return out
+        if len(missing) == batch:
+            fresh = self.encoder.encode_boards(boards, flags, out=out)
+        else:
+            fresh = self.encoder.encode_boards([boards[i] for i in missing],
+                                               [flags[i] for i in missing])
+            out[missing] = fresh
+        for j, i in enumerate(missing):
+            self._store(keys[i], fresh[j].copy())
+        return out
+
+    def _store(self, key: Tuple[int, bool], row: np.ndarray) -> None:
+        row.flags.writeable = False
+        entries = self.entries
+        entries[key] = row
+        if len(entries) > self.capacity:
+            entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -1,15 +1,24 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from typing import List
+from itertools import chain
+from typing import List, Optional
 
 class BoardEvaluator(nn.Module):
-    def __init__(self, input_size: int, hidden_sizes: List[int] = None, aux_heads: int = 0):
+    def __init__(self, input_size: int, hidden_sizes: List[int] = None, aux_heads: int = 0,
+                 fixed_features: Optional[nn.Module] = None):
         super(BoardEvaluator, self).__init__()
         if hidden_sizes is None:
             hidden_sizes = [512, 256, 128]
         self.hidden_sizes = list(hidden_sizes)
         self.aux_heads = int(aux_heads)
+        self._bag_cache = None  # see _bag_weight
+        # Optional non-trainable input transform (BoardEncoder.fixed_features(),
+        # e.g. unary_v3_raw's FixedFeatures). It has no persistent state, so the
+        # state_dict matches an evaluator fed the transformed input directly.
+        self.fixed_features = fixed_features
+        if fixed_features is not None:
+            input_size = fixed_features.output_size
 
         sizes = [input_size] + self.hidden_sizes + [1]
         self.layers = nn.ModuleList([
@@ -22,6 +31,8 @@ class BoardEvaluator(nn.Module):
             self.aux_head = nn.Linear(self.hidden_sizes[-1], self.aux_heads)
 
     def _trunk(self, x):
+        if self.fixed_features is not None:
+            x = self.fixed_features(x)
         for layer in self.layers[:-1]:
             x = F.relu(layer(x))
         return x
@@ -36,3 +47,65 @@ class BoardEvaluator(nn.Module):
 
     def forward(self, x):
         return torch.sigmoid(self.forward_logits(x))
+
+    def forward_sparse_logits(self, indices, offsets, dense):
+        """`forward_logits` on a `BoardEncoder.encode_sparse` batch.
+
+        The first layer sums the weight columns of the active raw features (an
+        embedding bag) instead of multiplying the mostly-zero dense input, so
+        its cost scales with occupied points. Same parameters as the dense
+        path: any checkpoint works unchanged."""
+        if self.fixed_features is not None:
+            raise ValueError("forward_sparse needs the dense features from encode_sparse; "
+                             "it does not support fixed_features")
+        first = self.layers[0]
+        raw_size = first.in_features - dense.shape[1]
+        x = F.embedding_bag(indices, self._bag_weight(raw_size), offsets, mode="sum")
+        if dense.shape[1]:
+            x = x + F.linear(dense, first.weight[:, raw_size:])
+        x = F.relu(x + first.bias)
+        for layer in self.layers[1:-1]:
+            x = F.relu(layer(x))
+        return self.layers[-1](x)
+
+    def forward_sparse(self, indices, offsets, dense):
+        return torch.sigmoid(self.forward_sparse_logits(indices, offsets, dense))
+
+    def _bag_weight(self, raw_size: int):
+        """First-layer raw columns as contiguous embedding rows. embedding_bag on
+        the strided transpose is >20x slower, so outside autograd the copy is
+        cached until the weight changes (in-place updates and load_state_dict
+        bump the tensor's version counter)."""
+        w = self.layers[0].weight
+        if torch.is_grad_enabled() and w.requires_grad:
+            return w[:, :raw_size].t().contiguous()
+        key = (w.data_ptr(), w._version, raw_size)
+        if self._bag_cache is None or self._bag_cache[0] != key:
+            self._bag_cache = (key, w.detach()[:, :raw_size].t().contiguous())
+        return self._bag_cache[1]
+
+
+class WeightsWatch:
+    """Cheap check for "have this module's weights changed?".
+
+    Compares every parameter's and buffer's (storage pointer, version counter)
+    with the previous check, so in-place writes (optimizer steps,
+    load_state_dict) and device moves are caught. The tensor list is captured
+    once: walking module.parameters() alone costs ~35us, the check ~3us.
+    Replacing a Parameter object outright is not tracked; build a new watch.
+    """
+
+    __slots__ = ("module", "_tensors", "_signature")
+
+    def __init__(self, module: nn.Module):
+        self.module = module
+        self._tensors = list(chain(module.parameters(), module.buffers()))
+        self._signature = None
+
+    def changed(self) -> bool:
+        """True on the first call and whenever the weights changed since the last one."""
+        signature = tuple((t.data_ptr(), t._version) for t in self._tensors)
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        return True
@@ -82,21 +82,40 @@ def save_checkpoint(path: str, evaluator, config, optimizer=None) -> None:
     torch.save(payload, path)
 
 
-def load_agent_from_checkpoint(path: str, config, device: Optional[torch.device] = None):
+def load_agent_from_checkpoint(path: str, config, device: Optional[torch.device] = None,
+                               encoder_version: Optional[str] = None, inference: str = "torch"):
+    """Agent for a checkpoint. `encoder_version` may swap unary_v3 for
+    unary_v3_raw (or back): the two feed the same network, the raw one with the
+    smart features computed by the net's FixedFeatures module. `inference`
+    selects the agent's forward-pass backend (Agent.set_inference);
+    int8_static is calibrated on `ai.quantization.quantization_calibration`."""
     from ai.board_evaluator import BoardEvaluator
-    from ai.board_encoder import BoardEncoder
+    from ai.board_encoder import BoardEncoder, UNARY_V3, UNARY_V3_RAW
     from ai.agent import Agent
     from ai.bearoff import BearoffDB
+    from ai.numpy_inference import TORCH_INFERENCE
+    from ai.quantization import INT8_STATIC, quantization_calibration
 
     if device is None:
         device = torch.device("cpu")
     state_dict, meta = load_state_dict(path, device=device)
+    if encoder_version is not None and encoder_version != meta["encoder_version"]:
+        if {encoder_version, meta["encoder_version"]} != {UNARY_V3, UNARY_V3_RAW}:
+            raise ValueError(f"cannot load a {meta['encoder_version']} checkpoint "
+                             f"with encoder {encoder_version}")
+        meta = dict(meta, encoder_version=encoder_version)
     encoder = BoardEncoder(config, version=meta["encoder_version"])
     evaluator = BoardEvaluator(encoder.input_size, hidden_sizes=meta["hidden_sizes"],
-                               aux_heads=meta.get("aux_heads", 0)).to(device)
+                               aux_heads=meta.get("aux_heads", 0),
+                               fixed_features=encoder.fixed_features()).to(device)
     evaluator.load_state_dict(state_dict)
     evaluator.eval()
     bearoff = None
     if config.get_use_bearoff_db():
         bearoff = BearoffDB.load_or_build(config.get_bearoff_db_path())
-    return Agent(evaluator, encoder, bearoff=bearoff), meta
+    agent = Agent(evaluator, encoder, bearoff=bearoff)
+    if inference == INT8_STATIC:
+        agent.set_inference(inference, quantization_calibration(agent, config))
+    elif inference != TORCH_INFERENCE:
+        agent.set_inference(inference)
+    return agent, meta
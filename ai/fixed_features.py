@@ -0,0 +1,96 @@
+"""Non-trainable torch module deriving the unary_v3 smart features from the raw
+per-point encoding (docs/encoder_optimization_ideas.md #3).
+
+With encoder version `unary_v3_raw` the CPU side emits only the unary_v2 raw
+block; `FixedFeatures` sits in front of `BoardEvaluator`'s first layer and
+appends the 18 features batch-wise, on whatever device the network lives on.
+It holds only non-persistent buffers, so an evaluator with it has exactly the
+state_dict of a plain `unary_v3` evaluator and the two load each other's
+checkpoints.
+"""
+
+import torch
+import torch.nn as nn
+
+from ai.board_encoder import SMART_FEATURE_COUNT
+
+
+class FixedFeatures(nn.Module):
+    """raw (B, num_points * point_size) -> (B, raw + 18): the input unchanged,
+    followed by the features `BoardEncoder._encode_modern` computes for
+    unary_v3 (same order and normalization)."""
+
+    def __init__(self, board_size: int, pieces_per_player: int, home_size: int):
+        super().__init__()
+        self.board_size = board_size
+        self.pieces_per_player = pieces_per_player
+        self.home_size = home_size
+        self.num_points = board_size + 2
+        self.point_size = 3 + pieces_per_player
+        self.raw_size = self.num_points * self.point_size
+        self.output_size = self.raw_size + SMART_FEATURE_COUNT
+
+        slot = torch.arange(self.num_points, dtype=torch.float32)
+        inner = (slot >= 1) & (slot <= board_size)
+        our_home = inner & (slot >= board_size - home_size + 1)
+        opp_home = inner & ~our_home & (slot <= home_size)
+        borne = ~inner
+        for name, value in (
+            ("inner", inner), ("our_home", our_home), ("opp_home", opp_home), ("borne", borne),
+            ("our_distance", torch.where(inner, self.num_points - 1 - slot, 0.0)),
+            ("their_distance", torch.where(inner, slot, 0.0)),
+        ):
+            self.register_buffer(name, value.to(torch.float32), persistent=False)
+
+    def forward(self, raw: torch.Tensor) -> torch.Tensor:
+        points = raw.view(raw.shape[0], self.num_points, self.point_size)
+        theirs = points[..., 0]
+        captured_by_our = points[..., 1]
+        captured_by_their = points[..., 2]
+        count = points[..., 3:].sum(dim=-1)
+        ours = (count > 0).to(raw.dtype) * (1.0 - theirs)
+        our_count = ours * count + captured_by_their
+        their_count = theirs * count + captured_by_our
+
+        inner = self.inner
+        single = (count == 1).to(raw.dtype) * inner
+        held_ours = ours * (count >= 2).to(raw.dtype) * inner
+        held_theirs = theirs * (count >= 2).to(raw.dtype) * inner
+        our_pip = (our_count * self.our_distance).sum(dim=1)
+        their_pip = (their_count * self.their_distance).sum(dim=1)
+        our_borne = (our_count * self.borne).sum(dim=1)
+        their_borne = (their_count * self.borne).sum(dim=1)
+
+        # Divide (rather than multiply by a reciprocal) so float32 results are
+        # correctly rounded, like the encoder's float64 math cast to float32.
+        pip_norm = float(self.pieces_per_player * self.board_size)
+        ppp = float(self.pieces_per_player)
+        features = torch.stack([
+            our_pip / pip_norm,
+            their_pip / pip_norm,
+            (single * ours).sum(dim=1) / ppp,
+            (single * theirs).sum(dim=1) / ppp,
+            held_ours.sum(dim=1) / ppp,
+            held_theirs.sum(dim=1) / ppp,
+            (captured_by_their * inner).sum(dim=1) / ppp,
+            (captured_by_our * inner).sum(dim=1) / ppp,
+            (our_count * self.our_home).sum(dim=1) / ppp,
+            (their_count * self.opp_home).sum(dim=1) / ppp,
+            (our_count * self.opp_home).sum(dim=1) / ppp,
+            (their_count * self.our_home).sum(dim=1) / ppp,
+            our_borne / ppp,
+            their_borne / ppp,
+            self._longest_run(held_ours) / float(self.home_size),
+            self._longest_run(held_theirs) / float(self.home_size),
+            (our_pip - their_pip) / pip_norm,
+            (our_borne - their_borne) / ppp,
+        ], dim=1)
+        return torch.cat([raw, features], dim=1)
+
+    @staticmethod
+    def _longest_run(held: torch.Tensor) -> torch.Tensor:
+        """Longest run of consecutive 1s per row: the running count minus its
+        value at the most recent gap."""
+        total = held.cumsum(dim=1)
+        at_gap = torch.where(held > 0, torch.zeros_like(total), total).cummax(dim=1).values
+        return (total - at_gap).amax(dim=1)
@@ -0,0 +1,222 @@
+"""Central batched inference for parallel self-play.
+
+With `selfplay_inference_server: true` the self-play workers stop running the
+net themselves. Each worker writes its encoded leaf batch into its own
+shared-memory slot and rings a doorbell. One server process gathers every
+pending slot into a single forward pass and writes the values back. The
+server reads the trainer's weights (ai.shared_weights) before each batch; the
+workers' own evaluators go unused.
+
+Layout (`InferenceChannel`):
+- One request slot per worker: up to `max_rows` input rows, the same number
+  of output values, and a row count. A worker has at most one request in
+  flight, so each slot is a ring of depth one. Larger batches (2-ply) are
+  split into `max_rows` chunks by the client.
+- A shared `ready` semaphore is the doorbell, released once per request.
+- One `done` semaphore per worker is released when its values are ready.
+- A stop flag, set by `stop()` together with one extra doorbell release.
+
+The count is written before `ready` is released and cleared before `done` is
+released, and semaphore operations are full barriers, so the slot arrays need
+no further locking.
+
+Weights change between server batches, i.e. in the middle of worker games,
+whereas a local worker kept one set of weights for a whole game. The worker's
+EvalCache is cleared at the start of each game, so cached values are at most
+one game stale, the same lag local workers have.
+"""
+
+import time
+from multiprocessing import shared_memory
+from typing import Optional
+
+import numpy as np
+import torch
+
+from ai.shared_weights import SharedWeights
+
+_COUNT_BYTES = 8  # int64 row count per slot
+
+# Agent.inference of a worker whose leaf batches go to the server.
+SERVER_INFERENCE = "server"
+
+
+class InferenceChannel:
+    """Shared-memory request slots plus doorbell semaphores between
+    `num_workers` clients and one server. Create it in the trainer with a
+    multiprocessing context, pass it to the processes as an argument, and
+    `close(unlink=True)` it in the trainer once they have exited."""
+
+    def __init__(self, ctx, num_workers: int, input_size: int, max_rows: int = 2048):
+        if num_workers <= 0 or max_rows <= 0:
+            raise ValueError(f"InferenceChannel needs positive num_workers and max_rows, "
+                             f"got {num_workers} and {max_rows}")
+        self.num_workers = num_workers
+        self.input_size = input_size
+        self.max_rows = max_rows
+        size = (num_workers + 1) * _COUNT_BYTES + num_workers * max_rows * (input_size + 1) * 4
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self.ready = ctx.Semaphore(0)
+        self.done = [ctx.Semaphore(0) for _ in range(num_workers)]
+        self._map()
+        self._header[:] = 0
+
+    def _map(self) -> None:
+        buf = self._shm.buf
+        n, rows, width = self.num_workers, self.max_rows, self.input_size
+        self._header = np.ndarray((n + 1,), np.int64, buf, 0)
+        self.counts = self._header[:n]
+        offset = (n + 1) * _COUNT_BYTES
+        self.inputs = np.ndarray((n, rows, width), np.float32, buf, offset)
+        offset += n * rows * width * 4
+        self.outputs = np.ndarray((n, rows), np.float32, buf, offset)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ("_header", "counts", "inputs", "outputs"):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._map()
+
+    def stop(self) -> None:
+        """Make the server's `serve` return."""
+        self._header[self.num_workers] = 1
+        self.ready.release()
+
+    @property
+    def stopped(self) -> bool:
+        return bool(self._header[self.num_workers])
+
+    def close(self, unlink: bool = False) -> None:
+        del self._header, self.counts, self.inputs, self.outputs
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
+
+
+class InferenceClient:
+    """Agent backend that evaluates on the server, installed with
+    `agent.set_inference(SERVER_INFERENCE, backend=client)`:
+    (B, input_size) float32 -> (B, 1), in `max_rows` chunks."""
+
+    def __init__(self, channel: InferenceChannel, worker_id: int):
+        self.channel = channel
+        self.worker_id = worker_id
+        self.requests = 0
+
+    def forward(self, x: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        channel, wid = self.channel, self.worker_id
+        if out is None:
+            out = np.empty((len(x), 1), dtype=np.float32)
+        slot_in, slot_out = channel.inputs[wid], channel.outputs[wid]
+        for start in range(0, len(x), channel.max_rows):
+            rows = min(channel.max_rows, len(x) - start)
+            slot_in[:rows] = x[start:start + rows]
+            channel.counts[wid] = rows
+            channel.ready.release()
+            channel.done[wid].acquire()
+            out[start:start + rows, 0] = slot_out[:rows]
+            self.requests += 1
+        return out
+
+    __call__ = forward
+
+
+class InferenceServer:
+    """Serves an InferenceChannel's requests with `evaluator`, batching every
+    request pending at the time (optionally waiting up to `batch_wait_s` for
+    more workers to join a batch). Newly published `weights` are loaded
+    before each batch. `serve` returns once the channel is stopped."""
+
+    def __init__(self, channel: InferenceChannel, evaluator: torch.nn.Module,
+                 weights: SharedWeights, batch_wait_s: float = 0.0):
+        self.channel = channel
+        self.evaluator = evaluator
+        self.weights = weights
+        self.weights_version = weights.read_into(evaluator)
+        self.batch_wait_s = batch_wait_s
+        self.batch = np.empty((channel.num_workers * channel.max_rows, channel.input_size),
+                              dtype=np.float32)
+        self.batches = 0
+        self.requests = 0
+        self.rows = 0
+
+    def _gather(self) -> np.ndarray:
+        """Block for the doorbell, then return the workers with a pending request."""
+        channel = self.channel
+        channel.ready.acquire()
+        acquired = 1
+        if self.batch_wait_s > 0.0:
+            deadline = time.monotonic() + self.batch_wait_s
+            while acquired < channel.num_workers:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0.0 or not channel.ready.acquire(timeout=remaining):
+                    break
+                acquired += 1
+        pending = np.flatnonzero(channel.counts)
+        # A worker sets its count before releasing `ready`, so every pending
+        # request's release is either consumed already or about to arrive.
+        for _ in range(len(pending) - acquired):
+            channel.ready.acquire()
+        return pending
+
+    def serve_once(self) -> bool:
+        """Serve one batch. False once the channel is stopped."""
+        pending = self._gather()
+        if self.channel.stopped:
+            return False
+        self.weights_version = self.weights.read_into(self.evaluator, self.weights_version)
+        if len(pending) == 0:
+            return True
+        channel = self.channel
+        counts = channel.counts[pending].tolist()
+        total = 0
+        for wid, rows in zip(pending.tolist(), counts):
+            self.batch[total:total + rows] = channel.inputs[wid, :rows]
+            total += rows
+        with torch.no_grad():
+            values = self.evaluator(torch.from_numpy(self.batch[:total]))[:, 0].numpy()
+        total = 0
+        for wid, rows in zip(pending.tolist(), counts):
+            channel.outputs[wid, :rows] = values[total:total + rows]
+            total += rows
+            channel.counts[wid] = 0
+            channel.done[wid].release()
+        self.batches += 1
+        self.requests += len(counts)
+        self.rows += total
+        return True
+
+    def serve(self) -> None:
+        while self.serve_once():
+            pass
+
+
+def server_main(channel: InferenceChannel, weights: SharedWeights, config_path: str, hidden_sizes):
+    """Inference-server process entry point: builds the evaluator the workers
+    would have built and serves until the channel is stopped."""
+    from ai.board_encoder import BoardEncoder
+    from ai.board_evaluator import BoardEvaluator
+    from ai.checkpoint_io import ENCODER_VERSION_CURRENT
+    from config.config_loader import ConfigLoader
+
+    config = ConfigLoader(config_path)
+    torch.set_num_threads(config.get_inference_server_threads())
+    encoder = BoardEncoder(config, version=ENCODER_VERSION_CURRENT)
+    evaluator = BoardEvaluator(encoder.input_size, hidden_sizes=list(hidden_sizes),
+                               aux_heads=config.get_aux_heads(),
+                               fixed_features=encoder.fixed_features())
+    evaluator.eval()
+    server = InferenceServer(channel, evaluator, weights,
+                             batch_wait_s=config.get_inference_server_batch_wait_ms() / 1000.0)
+    try:
+        server.serve()
+    finally:
+        channel.close()
+        weights.close()
+        if server.batches:
+            print(f"Inference server: {server.requests} requests in {server.batches} batches, "
+                  f"{server.rows / server.batches:.0f} rows/batch", flush=True)
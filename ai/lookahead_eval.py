@@ -44,7 +44,7 @@ def _play_one_game(agent, config, flex_color, budget, rel, mb, md):
     while not game.is_over():
         current = game.current_player
         game.dice.roll()
-        moves = legal_moves(game.board, current, game.dice)
+        moves = legal_moves(game.board, current, game.dice, compact=True)
         if not moves:
             game.switch_turn()
             continue
@@ -53,6 +53,7 @@ def _play_one_game(agent, config, flex_color, budget, rel, mb, md):
             move, _ = agent.get_best_move(
                 game.board, moves, current,
                 time_budget_s=budget, relative_cutoff=rel, max_branch=mb, max_depth=md,
+                chance_pruning=config.get_search_chance_pruning(),
             )
             move_times.append(time.monotonic() - t)
             depth_hist[agent.last_search_depth] += 1
@@ -63,17 +64,28 @@ def _play_one_game(agent, config, flex_color, budget, rel, mb, md):
     return game.get_winner() == flex_color, dict(depth_hist), move_times
 
 
-def _worker(model_path, config_path, tasks, budget, rel, mb, md, result_q):
-    """Run a chunk of games in a subprocess, streaming one result per game to result_q."""
+def _worker(model_path, config_path, tasks, budget, rel, mb, md, result_q, search_workers=0):
+    """Run a chunk of games in a subprocess, streaming one result per game to result_q.
+    With `search_workers`, the agent searches through its own SearchPool."""
     import random
     torch.set_num_threads(1)
     config = ConfigLoader(config_path)
     agent, _ = load_agent_from_checkpoint(model_path, config, device=torch.device("cpu"))
-    for flex_color, seed in tasks:
-        random.seed(seed)
-        np.random.seed(seed)
-        won, depth_hist, move_times = _play_one_game(agent, config, flex_color, budget, rel, mb, md)
-        result_q.put({"win": won, "depth_hist": depth_hist, "move_times": move_times})
+    pool = None
+    if search_workers > 0:
+        from ai.parallel_search import SearchPool
+        pool = SearchPool(model_path, config_path, search_workers,
+                          cache_slots=max(1, config.get_play_eval_cache_size()))
+        pool.attach(agent)
+    try:
+        for flex_color, seed in tasks:
+            random.seed(seed)
+            np.random.seed(seed)
+            won, depth_hist, move_times = _play_one_game(agent, config, flex_color, budget, rel, mb, md)
+            result_q.put({"win": won, "depth_hist": depth_hist, "move_times": move_times})
+    finally:
+        if pool is not None:
+            pool.close()
 
 
 def _wilson_interval(wins: int, n: int, z: float = 1.96) -> Tuple[float, float]:
@@ -131,9 +143,13 @@ def _render_progress(done, total, flex_wins, depth_hist, elapsed) -> str:
     ])
 
 
-def evaluate_lookahead_selfplay(config, model_path, games_per_color=500, num_workers=None):
+def evaluate_lookahead_selfplay(config, model_path, games_per_color=500, num_workers=None,
+                                search_workers=0):
     """Validate the flexible time-budget search against fixed 2-ply via gold self-play.
 
+    With `search_workers`, each game worker searches through a SearchPool of
+    that many processes (ai.parallel_search), so both arms get the pool.
+
     Streams a live ASCII progress block (running win rate, depth histogram, ETA) as games
     complete, then prints a final summary with the Wilson CI, binomial p-value, full depth
     histogram, and flexible move-time stats.
@@ -154,8 +170,9 @@ def evaluate_lookahead_selfplay(config, model_path, games_per_color=500, num_wor
             seed += 1
     total = len(tasks)
 
+    pool_note = f" x {search_workers} search processes" if search_workers else ""
     print(f"Validating flexible search (budget={budget}s, relative_cutoff={rel}, max_branch={mb}, "
-          f"max_depth={md}) vs fixed 2-ply: {total} games on {num_workers} workers, model={model_path}",
+          f"max_depth={md}, chance_pruning={config.get_search_chance_pruning()}) vs fixed 2-ply: {total} games on {num_workers} workers{pool_note}, model={model_path}",
           flush=True)
 
     # Round-robin tasks into per-worker chunks.
@@ -168,7 +185,8 @@ def evaluate_lookahead_selfplay(config, model_path, games_per_color=500, num_wor
     result_q = ctx.Queue()
     procs = [
         ctx.Process(target=_worker,
-                    args=(model_path, "config/config.yml", chunk, budget, rel, mb, md, result_q))
+                    args=(model_path, "config/config.yml", chunk, budget, rel, mb, md, result_q,
+                          search_workers))
         for chunk in chunks
     ]
     for p in procs:
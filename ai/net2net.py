@@ -35,7 +35,8 @@ def widen_evaluator(evaluator, new_hidden_sizes, noise_std=1e-3, seed=0):
 
     rng = np.random.default_rng(seed)
     input_size = evaluator.layers[0].in_features
-    new_eval = BoardEvaluator(input_size, hidden_sizes=new_sizes)
+    new_eval = BoardEvaluator(input_size, hidden_sizes=new_sizes,
+                              fixed_features=evaluator.fixed_features)
 
     # Per hidden layer: which original unit each new unit copies.
     mappings = [np.concatenate([np.arange(o), rng.integers(0, o, size=n - o)])
@@ -48,7 +48,7 @@ def _play_one_game(white_agent, black_agent, config, white_la: int, black_la: in
     while not game.is_over():
         current = game.current_player
         game.dice.roll()
-        moves = legal_moves(game.board, current, game.dice)
+        moves = legal_moves(game.board, current, game.dice, compact=True)
         if not moves:
             game.switch_turn()
             continue
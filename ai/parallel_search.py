@@ -0,0 +1,402 @@
+"""Parallel root-split search for interactive play and eval-lookahead.
+
+`SearchPool` keeps `num_workers` spawned processes. Each has its own Agent,
+loaded from the same checkpoint. All of them, and the calling agent, read
+and fill one `SharedEvalCache` of net leaf values in shared memory. An Agent
+with `search_pool` set hands the pool two kinds of work, and
+`rollout_analysis` a third:
+
+- get_best_move's iterative deepening from depth 3. The calling agent
+  expands each root candidate's chance node itself: the replies per dice
+  outcome and their 1-ply pre-screen, kept in its _SearchMemo. Every
+  (candidate, dice outcome) pair then becomes a task, the opponent's
+  decision node one level down. Results are combined into the candidates'
+  expected values as Agent._chance_value does. With chance pruning, a
+  candidate's remaining outcomes are dropped once its upper bound falls to
+  the best finished candidate (Star1 at the root).
+- evaluate_moves at 2 ply (ranked moves). The candidate moves are split
+  into chunks, each scored by _evaluate_moves_2ply_batch.
+- Rollout rounds. The trials are split into chunks of antithetic pairs,
+  each played by rollout_analysis.rollout_values.
+
+The shared cache is a direct-mapped table written without locks. Each slot
+holds (key ^ data, data). A reader that races a writer sees a key mismatch,
+which is a miss, rather than another position's value.
+"""
+
+import math
+import multiprocessing as mp
+import queue
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+from ai.board_evaluator import WeightsWatch
+from domain.board import Board
+from domain.move import Move
+
+_F64 = struct.Struct("<d")
+_U64 = struct.Struct("<Q")
+_MASK64 = (1 << 64) - 1
+_PERSP_SALT = 0x9E3779B97F4A7C15  # keeps the two perspectives of a position apart
+_LIVENESS_POLL_S = 1.0  # how often a waiting search checks that the workers are alive
+
+
+class SharedEvalCache:
+    """EvalCache's interface (sync / get / put / clear / stats) over a shared
+    direct-mapped table of `slots` entries (rounded up to a power of two,
+    16 bytes each). A new entry replaces whatever hashed to its slot.
+
+    Create it in the parent, pass it to processes as an argument, and
+    `close(unlink=True)` it in the parent at the end. Hit and miss counts are
+    per process."""
+
+    def __init__(self, slots: int) -> None:
+        if slots <= 0:
+            raise ValueError(f"shared eval cache needs a positive slot count, got {slots}")
+        self.slots = 1 << (slots - 1).bit_length()
+        self._shm = shared_memory.SharedMemory(create=True, size=self.slots * 16)
+        self._map()
+        self._table[:] = 0
+        self._reset_local()
+
+    def _map(self) -> None:
+        self._table = np.ndarray((self.slots, 2), np.uint64, self._shm.buf)
+
+    def _reset_local(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._watch: Optional[WeightsWatch] = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ("_table", "_watch"):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._map()
+        self._reset_local()
+
+    @staticmethod
+    def _key(key: Tuple[int, bool]) -> int:
+        zobrist, persp = key
+        k = (zobrist ^ (_PERSP_SALT if persp else 0)) & _MASK64
+        return k or 1  # an empty slot reads as key 0
+
+    def sync(self, evaluator: torch.nn.Module) -> None:
+        """Clear the table when `evaluator`'s weights change. The first sync in
+        a process only records them: the other processes' entries stay."""
+        if self._watch is None or self._watch.module is not evaluator:
+            self._watch = WeightsWatch(evaluator)
+            self._watch.changed()
+        elif self._watch.changed():
+            self._table[:] = 0
+            self.invalidations += 1
+
+    def get(self, key: Tuple[int, bool]) -> Optional[float]:
+        k = self._key(key)
+        slot = k & (self.slots - 1)
+        check = int(self._table[slot, 0])
+        data = int(self._table[slot, 1])
+        if check ^ data != k:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return _F64.unpack(_U64.pack(data))[0]
+
+    def put(self, key: Tuple[int, bool], value: float) -> None:
+        k = self._key(key)
+        data = _U64.unpack(_F64.pack(value))[0]
+        slot = k & (self.slots - 1)
+        self._table[slot, 0] = k ^ data
+        self._table[slot, 1] = data
+
+    def clear(self) -> None:
+        self._table[:] = 0
+        self._reset_local()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": int(np.count_nonzero(self._table[:, 0] | self._table[:, 1])),
+            "capacity": self.slots,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+    def close(self, unlink: bool = False) -> None:
+        del self._table
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
+
+
+def _board_state(board: Board):
+    """The slot arrays of `board`: a pickled Board also carries its zobrist and
+    summary tables (~130 KB)."""
+    return (board.n, board.color, board.pinned, board.borne_off)
+
+
+def _restore_board(template: Board, state) -> Board:
+    board = Board(template.board_size, template.home_size, template.pieces_per_player)
+    n, color, pinned, borne_off = state
+    board.n = list(n)
+    board.color = list(color)
+    board.pinned = list(pinned)
+    board.borne_off = dict(borne_off)
+    board.recompute()
+    return board
+
+
+def _search_worker(model_path, config_path, inference, cache, task_q, result_q):
+    """Pool process: load the agent once, then serve tasks until a None."""
+    from ai.agent import _SearchMemo, _TimeoutError
+    from ai.checkpoint_io import load_agent_from_checkpoint
+    from ai.rollout_analysis import rollout_values
+    from config.config_loader import ConfigLoader
+
+    torch.set_num_threads(1)
+    config = ConfigLoader(config_path)
+    agent, _ = load_agent_from_checkpoint(model_path, config, device=torch.device("cpu"),
+                                          inference=inference)
+    agent.eval_cache = cache
+    template = Board.from_config(config)
+    memo, memo_search = None, None
+    while True:
+        task = task_q.get()
+        if task is None:
+            cache.close()
+            return
+        kind, search, task_id, state, color = task[:5]
+        try:
+            if kind == "rollout":
+                starts = [(_restore_board(template, s), c) for s, c in zip(state, color)]
+                result = rollout_values(agent, starts, *task[5:])
+            elif kind == "2ply":
+                board = _restore_board(template, state)
+                result = agent._evaluate_moves_2ply_batch(board, task[5], color)
+            else:
+                board = _restore_board(template, state)
+                move, replies, depth, params, window, memo_id = task[5:]
+                if memo_id != memo_search:
+                    # One memo per get_best_move call, across its depths.
+                    memo, memo_search = _SearchMemo(), memo_id
+                board.apply(move, color)
+                result = max(agent._expectimax(board, replies, -color, depth, *params,
+                                               window, memo))
+        except _TimeoutError:
+            result = None
+        result_q.put((search, task_id, result))
+
+
+class SearchPool:
+    """Persistent search processes for one checkpoint (see the module docstring).
+
+    Attach it with `attach(agent)`; the agent must evaluate with the same
+    checkpoint and inference backend. `close()` stops the processes."""
+
+    def __init__(self, model_path: str, config_path: str, num_workers: int,
+                 cache_slots: int = 1 << 20, inference: str = "torch") -> None:
+        if num_workers <= 0:
+            raise ValueError(f"search pool needs at least one worker, got {num_workers}")
+        ctx = mp.get_context("spawn")
+        self.num_workers = num_workers
+        self.cache = SharedEvalCache(cache_slots)
+        self._task_q = ctx.Queue()
+        self._result_q = ctx.Queue()
+        self._search = 0
+        self._memo, self._memo_id = None, 0
+        self._procs = [
+            ctx.Process(target=_search_worker,
+                        args=(model_path, config_path, inference, self.cache,
+                              self._task_q, self._result_q),
+                        daemon=True)
+            for _ in range(num_workers)
+        ]
+        for p in self._procs:
+            p.start()
+
+    def attach(self, agent) -> None:
+        """Make `agent` search through the pool and share its eval cache."""
+        agent.search_pool = self
+        agent.eval_cache = self.cache
+
+    def close(self) -> None:
+        for _ in self._procs:
+            self._task_q.put(None)
+        for p in self._procs:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+        self.cache.close(unlink=True)
+
+    def __enter__(self) -> "SearchPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _results(self, deadline: Optional[float]):
+        """Yield (task_id, result) of the current search; stale ones are skipped."""
+        from ai.agent import _TimeoutError
+        while True:
+            timeout = _LIVENESS_POLL_S
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.monotonic())
+                if timeout <= 0.0:
+                    raise _TimeoutError()
+            try:
+                search, task_id, result = self._result_q.get(timeout=timeout)
+            except queue.Empty:
+                dead = [p.pid for p in self._procs if not p.is_alive()]
+                if dead:
+                    raise RuntimeError(f"search pool worker(s) {dead} exited") from None
+                continue
+            if search == self._search:
+                if result is None:
+                    raise _TimeoutError()
+                yield task_id, result
+
+    def evaluate_moves_2ply(self, board: Board, possible_moves: List[Move], color: int) -> List[float]:
+        """Agent._evaluate_moves_2ply_batch, with the moves split across the pool."""
+        self._search += 1
+        state = _board_state(board)
+        chunk = -(-len(possible_moves) // (2 * self.num_workers))
+        starts = range(0, len(possible_moves), chunk)
+        for start in starts:
+            self._task_q.put(("2ply", self._search, start, state, color,
+                              possible_moves[start:start + chunk]))
+        scores = [0.0] * len(possible_moves)
+        pending = len(starts)
+        for start, result in self._results(None):
+            scores[start:start + len(result)] = result
+            pending -= 1
+            if pending == 0:
+                return scores
+
+    def rollout_values(self, starts: List[Tuple[Board, int]], trials: range, seed: int,
+                       truncate_plies: Optional[int] = None,
+                       luck_plies: Optional[int] = 0) -> np.ndarray:
+        """rollout_analysis.rollout_values, with the trials split across the pool."""
+        self._search += 1
+        states = [_board_state(board) for board, _ in starts]
+        colors = [color for _, color in starts]
+        pairs = -(-len(trials) // 2)
+        chunk = 2 * -(-pairs // self.num_workers)
+        offsets = range(0, len(trials), chunk)
+        for offset in offsets:
+            self._task_q.put(("rollout", self._search, offset, states, colors,
+                              trials[offset:offset + chunk], seed, truncate_plies,
+                              luck_plies))
+        values = np.empty((len(starts), len(trials)))
+        pending = len(offsets)
+        for offset, result in self._results(None):
+            values[:, offset:offset + result.shape[1]] = result
+            pending -= 1
+            if pending == 0:
+                return values
+
+    def search_root(self, agent, board: Board, candidates: List[Move], color: int, depth: int,
+                    beam_threshold: float, deadline: Optional[float],
+                    relative_cutoff: Optional[float], max_branch: Optional[int],
+                    chance_pruning: bool, memo, scores: List[float]) -> List[float]:
+        """Depth-`depth` scores of `candidates` (depth >= 3), as
+        agent._expectimax would return them at the root.
+
+        The finished prefix of the scores is appended to `scores` as it
+        completes, so the caller keeps it when _TimeoutError is raised."""
+        self._search += 1
+        if memo is not self._memo:
+            self._memo, self._memo_id = memo, self._memo_id + 1
+        state = _board_state(board)
+        params = (beam_threshold, deadline, relative_cutoff, max_branch)
+        count = len(candidates)
+        values: List[Optional[float]] = [None] * count
+        expected = [0.0] * count
+        remaining = [0.0] * count
+        outstanding = [0] * count
+        tasks = []  # (candidate, outcome, weight, replies), candidate-major
+        for c, move in enumerate(candidates):
+            token = board.apply(move, color)
+            try:
+                if board.has_won(color):
+                    values[c] = 1.0
+                    continue
+                node = agent._memo_chance_node(board, color, memo)
+            finally:
+                board.undo(token)
+            expected[c] = node.pass_value
+            remaining[c] = sum(node.weights)
+            for i, weight in enumerate(node.weights):
+                survivors = agent._prune_branches(node.replies[i], node.reply_1ply[i],
+                                                  beam_threshold, relative_cutoff, max_branch)
+                replies = [node.replies[i][j] for j in survivors]
+                previous = node.reply_scores[i]
+                if previous is not None:
+                    replies.sort(key=lambda m: -previous.get(m, 0.0))
+                tasks.append((c, i, weight, replies))
+                outstanding[c] += 1
+            if not node.weights:
+                values[c] = expected[c]
+
+        alpha = max((v for v in values if v is not None), default=-math.inf)
+        windows: Dict[int, Tuple[float, float]] = {}
+        next_task = 0
+        in_flight = 0
+
+        def finished_prefix():
+            while len(scores) < count and values[len(scores)] is not None:
+                scores.append(values[len(scores)])
+
+        def dispatch():
+            nonlocal next_task, in_flight
+            while next_task < len(tasks) and in_flight < 2 * self.num_workers:
+                c, i, weight, replies = tasks[next_task]
+                task_id = next_task
+                next_task += 1
+                if values[c] is not None:
+                    continue  # cut off while queued
+                window = None
+                if chance_pruning:
+                    # As in Agent._chance_value, with the outcomes not yet
+                    # finished counted at their best case.
+                    window = (-math.inf,
+                              1.0 - (alpha - expected[c] - (remaining[c] - weight)) / weight)
+                    windows[task_id] = window
+                self._task_q.put(("nply", self._search, task_id, state, color,
+                                  candidates[c], replies, depth - 1, params, window,
+                                  self._memo_id))
+                in_flight += 1
+
+        finished_prefix()
+        dispatch()
+        results = self._results(deadline) if in_flight else iter(())
+        for task_id, best_reply in results:
+            in_flight -= 1
+            c, i, weight, _ = tasks[task_id]
+            if values[c] is None:
+                expected[c] += weight * (1.0 - best_reply)
+                remaining[c] -= weight
+                outstanding[c] -= 1
+                window = windows.get(task_id)
+                if window is not None and (best_reply >= window[1]
+                                           or expected[c] + remaining[c] <= alpha):
+                    values[c] = expected[c] + remaining[c]  # upper bound, <= alpha
+                elif outstanding[c] == 0:
+                    values[c] = expected[c]
+                    alpha = max(alpha, values[c])
+                finished_prefix()
+            dispatch()
+            if in_flight == 0:
+                break
+        finished_prefix()
+        return scores
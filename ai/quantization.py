@@ -0,0 +1,302 @@
+"""Post-training int8 quantization of BoardEvaluator for CPU inference.
+
+Layers are quantized with per-output-channel int8 weights through torch's
+eager quantization (x86/fbgemm kernels), in one of two modes:
+
+- `int8_dynamic`: int8 weights. Each batch's input range is measured on the
+  fly, and the layer's output stays float. No calibration needed.
+- `int8_static`: weights and activations are int8, with activation ranges
+  from a calibration pass over encoded positions (`quantization_calibration`:
+  the seed pool when one exists, else leaves from greedy self-play). Linear
+  and ReLU are fused into one kernel.
+
+`layers` picks which Linear layers are quantized; the rest run float. The
+default is the first layer only. It holds ~70% of the multiply-adds, and its
+0/1 input quantizes almost exactly. The trained nets are hard to quantize
+further down: gold_v11's hidden activations reach ~100x their 99th percentile,
+so per-tensor int8 activations lose most of their resolution.
+Measured on gold_v11 (one thread, held-out self-play leaves):
+
+| variant | value MAE | p99 error | speed vs float32 torch (20 / 200 / 2000 rows) |
+|---|---|---|---|
+| int8_dynamic, layer 0 | 0.007 | 0.03 | 1.1x / 1.25x / 1.9x |
+| int8_static, layer 0 | 0.019 | 0.08 | 1.4x / 1.5x / 1.7x |
+| int8_dynamic, all layers | 0.028 | 0.10 | 1.1x / 1.9x / 1.9x |
+| int8_static, all layers | 0.10 | 0.33 | 0.9x / 1.8x / 2.4x |
+
+In 150 duplicate-dice pairs at 1-ply against float gold_v11, int8_dynamic
+(layer 0) scored 49% (z = -0.5); int8_static (layer 0) scored 33%
+(z = -6.6), so small value errors still cost games when they shift the
+move ranking.
+
+Select it per Agent with `Agent(..., inference=INT8_DYNAMIC)`. For
+int8_static also pass calibration rows, or use
+`load_agent_from_checkpoint(..., inference=...)`, which calibrates itself.
+`python main.py quantize-report` measures the error and the playing strength
+against the float model.
+"""
+
+import copy
+import os
+import random
+import warnings
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.ao.quantization import (
+    DeQuantStub, QConfig, QuantStub, convert, fuse_modules, get_default_qconfig, prepare,
+    quantize_dynamic,
+)
+from torch.ao.quantization.observer import FixedQParamsObserver
+from torch.ao.quantization.qconfig import per_channel_dynamic_qconfig
+
+from ai.board_evaluator import BoardEvaluator, WeightsWatch
+from domain.board import Board
+from domain.constants import BLACK, WHITE
+from domain.dice import Dice
+from domain.move_generation import legal_moves
+
+INT8_STATIC = "int8_static"
+INT8_DYNAMIC = "int8_dynamic"
+QUANTIZATION_MODES = (INT8_STATIC, INT8_DYNAMIC)
+DEFAULT_QUANTIZED_LAYERS = (0,)
+
+_CALIBRATION_CHUNK = 4096
+
+# Per quantized layer index: (input scale, zero point), (output scale, zero point).
+ActivationQParams = Dict[int, Tuple[Tuple[float, int], Tuple[float, int]]]
+
+
+class _Block(nn.Module):
+    """One Linear (+ ReLU) between quant/dequant stubs, which stay identities
+    unless the block is statically quantized."""
+
+    def __init__(self, linear: nn.Linear, relu: bool):
+        super().__init__()
+        self.quant = QuantStub()
+        self.linear = linear
+        self.relu = nn.ReLU() if relu else nn.Identity()
+        self.dequant = DeQuantStub()
+
+    def forward(self, x):
+        return self.dequant(self.relu(self.linear(self.quant(x))))
+
+
+class _Int8Mlp(nn.Module):
+    """BoardEvaluator.forward as a quantizable module: optional fixed features
+    (kept float), then one _Block per Linear, then the sigmoid."""
+
+    def __init__(self, evaluator: BoardEvaluator):
+        super().__init__()
+        self.fixed_features = evaluator.fixed_features
+        last = len(evaluator.layers) - 1
+        self.blocks = nn.ModuleList(_Block(copy.deepcopy(layer), relu=i < last)
+                                    for i, layer in enumerate(evaluator.layers))
+
+    def forward(self, x):
+        if self.fixed_features is not None:
+            x = self.fixed_features(x)
+        for block in self.blocks:
+            x = block(x)
+        return torch.sigmoid(x)
+
+
+def _fixed_qconfig(qconfig: QConfig, scale: float, zero_point: int) -> QConfig:
+    """`qconfig` with its activation observer pinned to (scale, zero_point)."""
+    observer = qconfig.activation()
+    return QConfig(activation=FixedQParamsObserver.with_args(
+        scale=scale, zero_point=zero_point, dtype=observer.dtype,
+        quant_min=observer.quant_min, quant_max=observer.quant_max), weight=qconfig.weight)
+
+
+def activation_qparams(module: nn.Module, layers: Sequence[int]) -> ActivationQParams:
+    """The activation scales a statically quantized `quantize_module` result
+    settled on, to pass back as `quantize_module(activation_qparams=...)`."""
+    qparams: ActivationQParams = {}
+    for i in layers:
+        block = module.blocks[i]
+        qparams[i] = ((float(block.quant.scale), int(block.quant.zero_point)),
+                      (float(block.linear.scale), int(block.linear.zero_point)))
+    return qparams
+
+
+def quantize_module(evaluator: BoardEvaluator, mode: str = INT8_DYNAMIC,
+                    calibration: Optional[np.ndarray] = None,
+                    layers: Sequence[int] = DEFAULT_QUANTIZED_LAYERS,
+                    activation_qparams: Optional[ActivationQParams] = None) -> nn.Module:
+    """An int8 copy of `evaluator`'s forward pass (CPU, eval mode) with the
+    Linear layers at indices `layers` quantized. int8_static needs
+    `calibration`, (N, input_size) float32 rows, or the `activation_qparams`
+    of an earlier quantization, which skip the calibration pass."""
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode: {mode!r} (expected one of {QUANTIZATION_MODES})")
+    layers = sorted(set(layers))
+    if not layers or layers[0] < 0 or layers[-1] >= len(evaluator.layers):
+        raise ValueError(f"layers must index the evaluator's {len(evaluator.layers)} Linear layers, got {layers}")
+    if mode == INT8_STATIC and activation_qparams is None and (
+            calibration is None or len(calibration) == 0):
+        raise ValueError("int8_static quantization needs calibration positions")
+
+    module = _Int8Mlp(evaluator).cpu().eval()
+    # torch.ao.quantization warns that it is moving to torchao, which is not a
+    # dependency here; the eager API is still what ships with torch.
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        warnings.simplefilter("ignore", UserWarning)
+        if mode == INT8_DYNAMIC:
+            return quantize_dynamic(
+                module, {f"blocks.{i}.linear": per_channel_dynamic_qconfig for i in layers},
+                dtype=torch.qint8)
+
+        qconfig = get_default_qconfig(torch.backends.quantized.engine)
+        for i in layers:
+            block = module.blocks[i]
+            if isinstance(block.relu, nn.ReLU):
+                fuse_modules(block, [["linear", "relu"]], inplace=True)
+            block.qconfig = qconfig
+            if activation_qparams is not None:
+                (in_scale, in_zero), (out_scale, out_zero) = activation_qparams[i]
+                block.quant.qconfig = _fixed_qconfig(qconfig, in_scale, in_zero)
+                block.linear.qconfig = _fixed_qconfig(qconfig, out_scale, out_zero)
+        prepare(module, inplace=True)
+        if activation_qparams is None:
+            with torch.no_grad():
+                for start in range(0, len(calibration), _CALIBRATION_CHUNK):
+                    module(torch.from_numpy(np.ascontiguousarray(
+                        calibration[start:start + _CALIBRATION_CHUNK], dtype=np.float32)))
+        return convert(module, inplace=True)
+
+
+class QuantizedEvaluator:
+    """Int8 inference backend for Agent: (B, input_size) float32 -> (B, 1).
+
+    Holds an int8 copy of `evaluator` and re-quantizes it whenever the float
+    weights change (WeightsWatch), so a worker's per-game `load_state_dict` is
+    picked up on the next call. int8_static calibrates once: later refreshes
+    re-quantize the weights but keep the first calibration's activation
+    scales (`activation_qparams`), so a self-play worker does not rerun the
+    calibration pass every game. Build a new evaluator to recalibrate.
+    """
+
+    def __init__(self, evaluator: BoardEvaluator, mode: str = INT8_DYNAMIC,
+                 calibration: Optional[np.ndarray] = None,
+                 layers: Sequence[int] = DEFAULT_QUANTIZED_LAYERS):
+        self.evaluator = evaluator
+        self.mode = mode
+        self.calibration = calibration
+        self.layers = tuple(layers)
+        self.module: Optional[nn.Module] = None
+        self.activation_qparams: Optional[ActivationQParams] = None
+        self._watch = WeightsWatch(evaluator)
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Re-quantize if the float weights changed since the last call."""
+        if not self._watch.changed():
+            return
+        self.module = quantize_module(self.evaluator, self.mode, self.calibration, self.layers,
+                                      self.activation_qparams)
+        if self.mode == INT8_STATIC and self.activation_qparams is None:
+            self.activation_qparams = activation_qparams(self.module, self.layers)
+
+    def forward(self, x: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        self.refresh()
+        with torch.no_grad():
+            values = self.module(torch.from_numpy(x)).numpy()
+        if out is None:
+            return values
+        np.copyto(out, values)
+        return out
+
+    __call__ = forward
+
+
+def self_play_positions(agent, config, games: int = 20, seed: int = 0,
+                        leaves_per_ply: int = 8) -> np.ndarray:
+    """Encoded leaf positions from greedy 1-ply games of `agent`: per ply, up
+    to `leaves_per_ply` random candidate afterstates, each encoded for the
+    side to move next, i.e. the rows a search feeds the net."""
+    rng = random.Random(seed)
+    sides = config.get_die_sides()
+    dice = Dice(sides)
+    leaves, persp = [], []
+    for _ in range(games):
+        board = Board.initial(config)
+        color = WHITE
+        while not (board.has_won(WHITE) or board.has_won(BLACK)):
+            dice.set(rng.randint(1, sides), rng.randint(1, sides))
+            moves = legal_moves(board, color, dice)
+            if moves:
+                for move in rng.sample(moves, min(leaves_per_ply, len(moves))):
+                    token = board.apply(move, color)
+                    leaves.append(board.clone())
+                    persp.append(color != WHITE)
+                    board.undo(token)
+                best, _ = agent.get_best_move(board, moves, color)
+                board.apply(best, color)
+            color = -color
+    return agent.board_encoder.encode_boards(leaves, persp)
+
+
+def seed_pool_positions(path: str, encoder, config) -> np.ndarray:
+    """Every seed-pool position (ai.seed_pool), encoded for its mover."""
+    from ai.seed_pool import SeedPool, board_from_arrays
+
+    pool = SeedPool(path)
+    boards = [board_from_arrays(pool.n[i], pool.color[i], pool.pinned[i],
+                                pool.bo_white[i], pool.bo_black[i], config)
+              for i in range(len(pool))]
+    return encoder.encode_boards(boards, pool.mover_is_white)
+
+
+def quantization_calibration(agent, config, games: int = 20, seed: int = 0) -> np.ndarray:
+    """Calibration rows for int8_static: the seed pool when it exists (the
+    positions self-play is steered towards), else `self_play_positions`."""
+    pool_path = config.get_selfplay_seed_pool_path()
+    if pool_path and os.path.exists(pool_path):
+        return seed_pool_positions(pool_path, agent.board_encoder, config)
+    return self_play_positions(agent, config, games=games, seed=seed)
+
+
+def quantization_report(evaluator: BoardEvaluator, quantized, positions: np.ndarray) -> Dict[str, float]:
+    """Value error of a quantized backend against the float evaluator on
+    held-out encoded positions."""
+    with torch.no_grad():
+        expected = evaluator(torch.from_numpy(positions)).numpy()[:, 0].astype(np.float64)
+    got = quantized(positions)[:, 0].astype(np.float64)
+    err = np.abs(got - expected)
+    return {
+        "positions": int(len(positions)),
+        "mae": float(err.mean()),
+        "p99_abs_error": float(np.quantile(err, 0.99)),
+        "max_abs_error": float(err.max()),
+        "mean_shift": float((got - expected).mean()),
+    }
+
+
+def run_quantization_report(config, model_path: str, mode: str = INT8_DYNAMIC,
+                            held_out_games: int = 10, pairs: int = 200,
+                            lookahead: int = 1, seed: int = 1000) -> Dict[str, float]:
+    """Quantize `model_path`, then print (and return) its value error on
+    held-out self-play leaves and a paired duplicate-dice match (ai.paired_eval)
+    of the int8 agent against the float one."""
+    from ai.checkpoint_io import load_agent_from_checkpoint
+    from ai.paired_eval import run_pairs, summarize
+
+    float_agent, _ = load_agent_from_checkpoint(model_path, config)
+    quant_agent, _ = load_agent_from_checkpoint(model_path, config, inference=mode)
+    held_out = self_play_positions(float_agent, config, games=held_out_games, seed=seed)
+    report = quantization_report(float_agent.board_evaluator, quant_agent.backend_evaluator, held_out)
+    print(f"{mode} vs float32 on {report['positions']} held-out leaves: "
+          f"MAE {report['mae']:.4f}, p99 {report['p99_abs_error']:.4f}, "
+          f"max {report['max_abs_error']:.4f}, mean shift {report['mean_shift']:+.4f}", flush=True)
+    if pairs > 0:
+        paired = summarize(run_pairs(quant_agent, float_agent, config,
+                                     [seed + k for k in range(pairs)], lookahead))
+        print(f"Paired eval ({paired['num_games']} games, {lookahead}-ply): int8 wins "
+              f"{paired['rate']:.2%} vs float, z = {paired['z']:+.2f} "
+              f"({paired['ties']} of {paired['num_pairs']} pairs tied)", flush=True)
+        report.update(paired_rate=paired["rate"], paired_z=paired["z"], paired_pairs=paired["num_pairs"])
+    return report
@@ -0,0 +1,218 @@
+"""Monte-Carlo rollout analysis of candidate moves.
+
+Each candidate move is valued by greedy 1-ply playouts from its afterstate,
+as `rollout_lab.rollout_value` plays them: a playout ends at a win, at an
+exact race (bear-off DB equity), or after `truncate_plies` plies, where the
+1-ply lookahead value (`Agent.position_values_lookahead`) stands in for the
+rest. Four things make the estimates cheap:
+
+- Common random numbers: trial t rolls the same dice stream for every
+  candidate, so their differences are far less noisy than their values.
+- Antithetic dice: odd trials roll the even trial's stream with each die
+  d turned into 7 - d. Each pair's mean is one sample.
+- Luck variance reduction: at every roll the net's value of the rolled
+  outcome minus its average over all 21 outcomes (`Agent.roll_values`) is
+  that roll's luck. Its expectation is zero whatever the net's errors, so
+  subtracting the playout's summed luck keeps the estimate unbiased. On
+  every roll it cut the variance ~10x, but its 21-outcome lookahead per
+  roll made the 1-ply playouts ~25x slower, so `luck_plies` defaults to 0.
+  Luck is spread evenly over a game's rolls: adjusting only the first few
+  removes next to nothing.
+- Racing: trials run in rounds, and after each round a candidate whose
+  paired difference to the leader is below zero by `z` standard errors is
+  dropped. The remaining trials go to the close contenders. The analysis is
+  anytime: `time_budget_s` stops it after the round in progress.
+
+All playouts of a round advance in lockstep, so each ply's move choices (and
+luck lookaheads) are one `evaluate_moves_many` batch. With a
+`parallel_search.SearchPool` the rounds' trials are split across its
+processes.
+"""
+
+import math
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ai.agent import _DICE_OUTCOMES, _DICE_WEIGHTS
+from ai.bearoff import exact_value_on_roll
+from domain.board import Board
+from domain.constants import WHITE
+from domain.dice import Dice
+from domain.move import Move
+from domain.move_generation import legal_moves
+
+_DIE_SIDES = 6
+_MAX_PLIES = 1000  # playouts still running here are truncated regardless
+_LUCK_BATCH = 32  # positions per roll_values call; each clones ~400 afterstates
+_OUTCOME_INDEX = {(i, j): o for o, (i, j, _) in enumerate(_DICE_OUTCOMES)}
+
+
+def rollout_values(agent, starts: Sequence[Tuple[Board, int]], trials: Sequence[int],
+                   seed: int, truncate_plies: Optional[int] = None,
+                   luck_plies: Optional[int] = 0) -> np.ndarray:
+    """Playout values of pre-roll (board, color) starts for the side to roll:
+    a (len(starts), len(trials)) array, adjusted for the luck of the first
+    `luck_plies` rolls (None: every roll).
+
+    Trial t rolls the dice stream seeded by (seed, t // 2), turned antithetic
+    for odd t, whatever the start, so results for the same trial ids are
+    reproducible and comparable across starts and calls."""
+    limit = _MAX_PLIES if truncate_plies is None else min(truncate_plies, _MAX_PLIES)
+    luck_limit = limit if luck_plies is None else luck_plies
+    boards: List[Board] = []
+    movers: List[int] = []
+    roots: List[int] = []
+    streams = []
+    antithetic: List[bool] = []
+    for board, color in starts:
+        for t in trials:
+            boards.append(board.clone())
+            movers.append(color)
+            roots.append(color)
+            streams.append(np.random.default_rng([seed, t // 2]))
+            antithetic.append(t % 2 == 1)
+    values = np.empty(len(boards))
+    luck = np.zeros(len(boards))
+    dice = Dice(_DIE_SIDES)
+
+    def finish(g: int, value: float) -> None:
+        # `value` is for the side to roll; the playout's value is for its root.
+        values[g] = (value if movers[g] == roots[g] else 1.0 - value) - luck[g]
+
+    active = list(range(len(boards)))
+    for ply in range(limit + 1):
+        rolling: List[int] = []
+        for g in active:
+            exact = exact_value_on_roll(boards[g], movers[g] == WHITE, agent.bearoff)
+            if exact is not None:
+                finish(g, exact)
+            else:
+                rolling.append(g)
+        if ply == limit:
+            positions = [(boards[g], movers[g]) for g in rolling]
+            for g, value in zip(rolling, agent.position_values_lookahead(positions)):
+                finish(g, value)
+            break
+        if not rolling:
+            break
+
+        outcome_values = None
+        if ply < luck_limit:
+            outcome_values = []
+            for start in range(0, len(rolling), _LUCK_BATCH):
+                outcome_values += agent.roll_values([(boards[g], movers[g])
+                                                     for g in rolling[start:start + _LUCK_BATCH]])
+        requests: List[Tuple[Board, List[Move], int]] = []
+        owners: List[int] = []
+        for k, g in enumerate(rolling):
+            d1, d2 = (int(d) for d in streams[g].integers(1, _DIE_SIDES + 1, size=2))
+            if antithetic[g]:
+                d1, d2 = _DIE_SIDES + 1 - d1, _DIE_SIDES + 1 - d2
+            if outcome_values is not None:
+                rolled = outcome_values[k][_OUTCOME_INDEX[(min(d1, d2), max(d1, d2))]]
+                roll_luck = rolled - float(np.dot(_DICE_WEIGHTS, outcome_values[k]))
+                luck[g] += roll_luck if movers[g] == roots[g] else -roll_luck
+            dice.set(d1, d2)
+            moves = legal_moves(boards[g], movers[g], dice, compact=True)
+            if moves:
+                requests.append((boards[g], moves, movers[g]))
+                owners.append(g)
+
+        won = set()
+        for g, (board, moves, color), scores in zip(owners, requests,
+                                                    agent.evaluate_moves_many(requests)):
+            board.apply(moves[int(np.argmax(scores))], color)
+            if board.has_won(color):
+                finish(g, 1.0)
+                won.add(g)
+        active = [g for g in rolling if g not in won]
+        for g in active:
+            movers[g] = -movers[g]
+    return values.reshape(len(starts), len(trials))
+
+
+@dataclass
+class MoveRollout:
+    move: Move
+    mean: float       # P(mover wins) after the move, averaged over its trials
+    stderr: float     # standard error of `mean`, from antithetic pair means
+    trials: int
+    rejected: bool    # dropped by the race before the analysis ended
+
+
+def analyze_moves(agent, board: Board, color: int, moves: List[Move],
+                  max_trials: int = 1296, round_trials: int = 72, z: float = 2.0,
+                  time_budget_s: Optional[float] = None,
+                  truncate_plies: Optional[int] = None,
+                  luck_plies: Optional[int] = 0, seed: int = 0,
+                  pool=None) -> List[MoveRollout]:
+    """Rollout values of `color`'s candidate `moves` on `board`, best first.
+
+    Every round plays `round_trials` more trials (an even number: antithetic
+    pairs) of each candidate still in the race, up to `max_trials`. A
+    candidate whose mean paired difference to the leader is below zero by
+    more than `z` standard errors leaves the race, from the second round on.
+    The race ends with one candidate left, at `max_trials`, or with the first
+    round finished after `time_budget_s`."""
+    if not moves:
+        return []
+    if round_trials <= 0 or round_trials % 2:
+        raise ValueError(f"round_trials must be a positive even number, got {round_trials}")
+    if max_trials < round_trials:
+        raise ValueError(f"max_trials ({max_trials}) must be at least round_trials ({round_trials})")
+    deadline = None if time_budget_s is None else time.monotonic() + time_budget_s
+
+    starts: List[Optional[Tuple[Board, int]]] = []
+    for move in moves:
+        after = board.clone()
+        after.apply(move, color)
+        starts.append(None if after.has_won(color) else (after, -color))
+    pairs: List[List[np.ndarray]] = [[] for _ in moves]
+    trials = [0] * len(moves)
+    alive = list(range(len(moves)))
+    next_trial = 0
+    rounds = 0
+    while True:
+        batch = range(next_trial, next_trial + round_trials)
+        rolled = [c for c in alive if starts[c] is not None]
+        if rolled:
+            if pool is not None:
+                values = pool.rollout_values([starts[c] for c in rolled], batch, seed,
+                                             truncate_plies, luck_plies)
+            else:
+                values = rollout_values(agent, [starts[c] for c in rolled], batch, seed,
+                                        truncate_plies, luck_plies)
+            for c, row in zip(rolled, values):
+                pairs[c].append((1.0 - row).reshape(-1, 2).mean(axis=1))
+        for c in alive:
+            if starts[c] is None:
+                pairs[c].append(np.ones(round_trials // 2))
+            trials[c] += round_trials
+        next_trial += round_trials
+        rounds += 1
+
+        if rounds >= 2 and len(alive) > 1:
+            samples = {c: np.concatenate(pairs[c]) for c in alive}
+            leader = max(alive, key=lambda c: samples[c].mean())
+            survivors = []
+            for c in alive:
+                diff = samples[c] - samples[leader]
+                bound = diff.mean() + z * diff.std(ddof=1) / math.sqrt(len(diff))
+                if c == leader or bound >= 0.0:
+                    survivors.append(c)
+            alive = survivors
+        if (len(alive) == 1 or next_trial + round_trials > max_trials
+                or (deadline is not None and time.monotonic() > deadline)):
+            break
+
+    results = []
+    for c, move in enumerate(moves):
+        samples = np.concatenate(pairs[c])
+        stderr = float(samples.std(ddof=1) / math.sqrt(len(samples))) if len(samples) > 1 else 0.0
+        results.append(MoveRollout(move, float(samples.mean()), stderr, trials[c],
+                                   c not in alive))
+    results.sort(key=lambda r: -r.mean)
+    return results
@@ -37,6 +37,7 @@ import torch
 
 from ai.bearoff import exact_value_on_roll
 from ai.checkpoint_io import load_agent_from_checkpoint
+from ai.rollout_analysis import rollout_values
 from domain.constants import WHITE
 from domain.dice import Dice
 from domain.move_generation import legal_moves
@@ -80,7 +81,7 @@ def state_search_value(agent, board, mover_color: int, move_plies: int = 1) -> f
     expected = 0.0
     for (d1, d2, weight) in _DICE_OUTCOMES:
         dice.set(d1, d2)
-        moves = legal_moves(board, mover_color, dice)
+        moves = legal_moves(board, mover_color, dice, compact=True)
         if moves:
             scores = agent.evaluate_moves(board, moves, mover_color, lookahead_plies=move_plies)
             expected += weight * max(scores)
@@ -110,7 +111,7 @@ def rollout_value(agent, board, mover_color: int, rng: np.random.Generator,
         d2 = int(rng.integers(1, _DIE_SIDES + 1))
         dice = Dice(_DIE_SIDES)
         dice.set(d1, d2)
-        moves = legal_moves(b, cur, dice)
+        moves = legal_moves(b, cur, dice, compact=True)
         if moves:
             move, _ = agent.get_best_move(b, moves, cur, lookahead_plies=1)
             b.apply(move, cur)
@@ -160,7 +161,7 @@ def mine_games(agent, config, num_games: int, sample_every: int,
                         v_search=v_search,
                     ))
             game.dice.roll()
-            moves = legal_moves(game.board, cur, game.dice)
+            moves = legal_moves(game.board, cur, game.dice, compact=True)
             if moves:
                 move, _ = agent.get_best_move(game.board, moves, cur, lookahead_plies=1)
                 game.board.apply(move, cur)
@@ -173,7 +174,8 @@ def label_positions(agent, positions: List[MinedPosition], rollouts_per_position
     """Label per position, mover's perspective.
 
     - `rollout`: mean of `rollouts_per_position` race-truncated playouts under
-      the 1-ply greedy policy (policy *evaluation* with exact endings).
+      the 1-ply greedy policy (policy *evaluation* with exact endings), played
+      in lockstep with antithetic dice (`rollout_analysis.rollout_values`).
     - `search2`: depth-2 expectimax state value (one step of policy
       *improvement*; deterministic, no MC noise)."""
     labels = np.empty(len(positions), dtype=np.float32)
@@ -181,10 +183,9 @@ def label_positions(agent, positions: List[MinedPosition], rollouts_per_position
         if label_mode == "search2":
             labels[i] = state_search_value(agent, pos.board, pos.mover_color, move_plies=2)
         else:
-            total = 0.0
-            for _ in range(rollouts_per_position):
-                total += rollout_value(agent, pos.board, pos.mover_color, rng)
-            labels[i] = total / rollouts_per_position
+            values = rollout_values(agent, [(pos.board, pos.mover_color)],
+                                    range(rollouts_per_position), seed=int(rng.integers(2 ** 32)))
+            labels[i] = values.mean()
     return labels
 
 
@@ -42,6 +42,7 @@ def board_from_arrays(n, color, pinned, bo_white, bo_black, config=None):
     board.color = [int(x) for x in color]
     board.pinned = [bool(x) for x in pinned]
     board.borne_off = {WHITE: int(bo_white), BLACK: int(bo_black)}
+    board.recompute()
     return board
 
 
@@ -13,28 +13,34 @@ import random
 import numpy as np
 import torch
 
-from ai.agent import Agent
+from ai.agent import Agent, EvalCache
 from ai.bearoff import BearoffDB, exact_value_on_roll
-from ai.board_encoder import BoardEncoder
+from ai.board_encoder import BoardEncoder, EncodingCache
 from ai.board_evaluator import BoardEvaluator
 from ai.checkpoint_io import ENCODER_VERSION_CURRENT
+from ai.inference_server import SERVER_INFERENCE, InferenceClient
+from ai.numpy_inference import TORCH_INFERENCE
+from ai.quantization import INT8_STATIC, quantization_calibration
 from config.config_loader import ConfigLoader
 from domain.constants import WHITE, BLACK
-from domain.move_generation import legal_moves
+from domain.move_generation import enable_move_cache, legal_moves
 from game.game import Game
 
 
 def select_self_play_move(agent, board, possible_moves, current_player, epsilon,
-                          exploration_temperature, twoply_margin=0.0, twoply_max_moves=4):
+                          exploration_temperature, twoply_margin=0.0, twoply_max_moves=4,
+                          scores=None):
     """Shared self-play move selection (workers and the trainer's local path).
 
     Greedy on 1-ply scores with ε-softmax exploration. When `twoply_margin > 0`
     and the greedy decision is ambiguous (runner-up within the margin of the
     best), the top `twoply_max_moves` candidates are re-scored at 2-ply and the
-    deep best is played (#90). Exploration stays on the 1-ply scores."""
+    deep best is played (#90). Exploration stays on the 1-ply scores, which
+    may be passed in as `scores` when they were computed in a batch."""
     if len(possible_moves) == 1:
         return possible_moves[0]
-    scores = agent.evaluate_moves(board, possible_moves, current_player)
+    if scores is None:
+        scores = agent.evaluate_moves(board, possible_moves, current_player)
     best_idx = int(np.argmax(scores))
     if np.random.random() < epsilon:
         s = np.array(scores, dtype=np.float64) / max(exploration_temperature, 1e-6)
@@ -52,6 +58,35 @@ def select_self_play_move(agent, board, possible_moves, current_player, epsilon,
     return possible_moves[best_idx]
 
 
+def _start_game(config, seed_pool, seeded_fraction, league_opponents, league_fraction):
+    """A new self-play Game, possibly seeded from the pool, plus its league
+    opponent and the color it plays (None, 0 for a pure self-play game)."""
+    game = Game(config)
+    if seed_pool is not None and seeded_fraction > 0.0 and random.random() < seeded_fraction:
+        game.board, game.player = seed_pool.sample(config)
+    opponent, opponent_color = None, 0
+    if league_opponents and league_fraction > 0.0 and random.random() < league_fraction:
+        opponent = league_opponents[random.randrange(len(league_opponents))]
+        opponent_color = WHITE if random.random() < 0.5 else -WHITE
+    return game, opponent, opponent_color
+
+
+def _trajectory(game, states, movers, exact_values, bootstrap_values, game_seconds):
+    winner = game.get_winner()
+    return {
+        "states": states,
+        "movers": movers,
+        "exact_values": exact_values,
+        "bootstrap_values": bootstrap_values,
+        "terminal_winner_white": (winner == WHITE),
+        "win_by_pin": bool(game.board.captured_starting(winner)),
+        "final_borne_off_white": int(game.board.borne_off[WHITE]),
+        "final_borne_off_black": int(game.board.borne_off[BLACK]),
+        "plies": len(movers),
+        "game_seconds": game_seconds,
+    }
+
+
 def play_one_game_record(agent, encoder, config, epsilon, exploration_temperature,
                          seed_pool=None, seeded_fraction=0.0,
                          league_opponents=None, league_fraction=0.0,
@@ -61,19 +96,16 @@ def play_one_game_record(agent, encoder, config, epsilon, exploration_temperatur
     - `movers`: is-white-to-move at each ply, length T.
     - `terminal_winner_white`: True if White won.
 
+    `encoder` is the BoardEncoder (or an EncodingCache over it) for the states.
+
     When `seed_pool` is set, a `seeded_fraction` share of games starts from a
     sampled high-residual position instead of the initial board (#83).
     When `league_opponents` is set, a `league_fraction` share of games has one
     randomly chosen side played by a random frozen opponent (1-ply greedy, no
     exploration) instead of the live net (#83 league play)."""
     t0 = time.perf_counter()
-    game = Game(config)
-    if seed_pool is not None and seeded_fraction > 0.0 and random.random() < seeded_fraction:
-        game.board, game.player = seed_pool.sample(config)
-    opponent, opponent_color = None, 0
-    if league_opponents and league_fraction > 0.0 and random.random() < league_fraction:
-        opponent = league_opponents[random.randrange(len(league_opponents))]
-        opponent_color = WHITE if random.random() < 0.5 else -WHITE
+    game, opponent, opponent_color = _start_game(config, seed_pool, seeded_fraction,
+                                                 league_opponents, league_fraction)
     twoply_margin = config.get_selfplay_2ply_margin()
     twoply_max_moves = config.get_selfplay_2ply_max_moves()
 
@@ -101,7 +133,7 @@ def play_one_game_record(agent, encoder, config, epsilon, exploration_temperatur
         is_white_to_move = current_player == WHITE
 
         game.dice.roll()
-        possible_moves = legal_moves(game.board, current_player, game.dice)
+        possible_moves = legal_moves(game.board, current_player, game.dice, compact=True)
         if not possible_moves:
             game.switch_turn()
         else:
@@ -121,38 +153,154 @@ def play_one_game_record(agent, encoder, config, epsilon, exploration_temperatur
         bootstrap_values.append(state_bootstrap_value())
 
         if game.is_over():
-            winner = game.get_winner()
-            return {
-                "states": states,
-                "movers": movers,
-                "exact_values": exact_values,
-                "bootstrap_values": bootstrap_values,
-                "terminal_winner_white": (winner == WHITE),
-                "win_by_pin": bool(game.board.captured_starting(winner)),
-                "final_borne_off_white": int(game.board.borne_off[WHITE]),
-                "final_borne_off_black": int(game.board.borne_off[BLACK]),
-                "plies": len(movers),
-                "game_seconds": time.perf_counter() - t0,
-            }
-
-
-def worker_main(worker_id, weight_q, traj_q, config_path, hidden_sizes, base_seed):
-    """Worker process entry point. Reads (weights, epsilon, exploration_temperature)
-    tuples from weight_q, plays one game per message, and pushes (worker_id, trajectory)
-    to traj_q. Stops on a None message."""
+            return _trajectory(game, states, movers, exact_values, bootstrap_values,
+                               time.perf_counter() - t0)
+
+
+class _LockstepGame:
+    """One game's state inside play_games_lockstep."""
+
+    __slots__ = ("game", "opponent", "opponent_color", "states", "movers",
+                 "exact_values", "bootstrap_values", "move")
+
+    def __init__(self, game, opponent, opponent_color):
+        self.game = game
+        self.opponent = opponent
+        self.opponent_color = opponent_color
+        self.states = []
+        self.movers = []
+        self.exact_values = []
+        self.bootstrap_values = []
+        self.move = None
+
+
+def _record_lockstep_states(agent, encoder, games, bootstrap_depth):
+    """Append each game's current state, its exact race value and, at
+    bootstrap_depth 2, its lookahead value (one batch over all games)."""
+    lookahead = []
+    for g in games:
+        board, player = g.game.board, g.game.current_player
+        g.states.append(encoder.encode_board(board, player == WHITE))
+        v = exact_value_on_roll(board, player == WHITE, agent.bearoff)
+        g.exact_values.append(float("nan") if v is None else float(v))
+        g.bootstrap_values.append(float("nan"))
+        if bootstrap_depth >= 2 and not g.game.is_over():
+            lookahead.append(g)
+    if lookahead:
+        values = agent.position_values_lookahead([(g.game.board, g.game.current_player)
+                                                  for g in lookahead])
+        for g, v in zip(lookahead, values):
+            g.bootstrap_values[-1] = v
+
+
+def play_games_lockstep(agent, encoder, config, epsilon, exploration_temperature, num_games,
+                        seed_pool=None, seeded_fraction=0.0,
+                        league_opponents=None, league_fraction=0.0,
+                        bootstrap_depth=1):
+    """Play `num_games` self-play games side by side and return their
+    trajectories (play_one_game_record's format) in the order they finish.
+
+    Every step advances all unfinished games by one ply. The candidate moves
+    of all games are scored in one batch (Agent.evaluate_moves_many), and at
+    bootstrap_depth 2 all lookahead values are computed in one batch
+    (Agent.position_values_lookahead). League moves and 2-ply escalations are
+    still per game. `game_seconds` is the batch's wall time split by plies."""
+    t0 = time.perf_counter()
+    twoply_margin = config.get_selfplay_2ply_margin()
+    twoply_max_moves = config.get_selfplay_2ply_max_moves()
+    active = [_LockstepGame(*_start_game(config, seed_pool, seeded_fraction,
+                                         league_opponents, league_fraction))
+              for _ in range(num_games)]
+    _record_lockstep_states(agent, encoder, active, bootstrap_depth)
+    finished = []
+
+    while active:
+        decisions = []
+        for g in active:
+            game = g.game
+            current_player = game.current_player
+            game.dice.roll()
+            possible_moves = legal_moves(game.board, current_player, game.dice, compact=True)
+            g.move = None
+            if not possible_moves:
+                continue
+            if g.opponent is not None and current_player == g.opponent_color:
+                g.move, _ = g.opponent.get_best_move(game.board, possible_moves,
+                                                     current_player, lookahead_plies=1)
+            elif len(possible_moves) == 1:
+                g.move = possible_moves[0]
+            else:
+                decisions.append((g, possible_moves))
+        requests = [(g.game.board, moves, g.game.current_player) for g, moves in decisions]
+        for (g, moves), scores in zip(decisions, agent.evaluate_moves_many(requests)):
+            g.move = select_self_play_move(agent, g.game.board, moves, g.game.current_player,
+                                           epsilon, exploration_temperature,
+                                           twoply_margin=twoply_margin,
+                                           twoply_max_moves=twoply_max_moves, scores=scores)
+        for g in active:
+            game = g.game
+            g.movers.append(game.current_player == WHITE)
+            if g.move is not None:
+                game.board.apply(g.move, game.current_player)
+            game.switch_turn()
+        _record_lockstep_states(agent, encoder, active, bootstrap_depth)
+        finished.extend(g for g in active if g.game.is_over())
+        active = [g for g in active if not g.game.is_over()]
+
+    seconds_per_ply = (time.perf_counter() - t0) / max(1, sum(len(g.movers) for g in finished))
+    return [_trajectory(g.game, g.states, g.movers, g.exact_values, g.bootstrap_values,
+                        seconds_per_ply * len(g.movers))
+            for g in finished]
+
+
+def worker_main(worker_id, control_q, traj_q, config_path, hidden_sizes, base_seed,
+                shared_weights, inference_channel=None):
+    """Worker process entry point. Reads (epsilon, exploration_temperature) tuples
+    from control_q, copies the latest `shared_weights` (ai.shared_weights) into its
+    evaluator, plays one game per message, and pushes (worker_id, trajectory) to
+    traj_q. Stops on a None message. With `selfplay_lockstep_games` K > 1 each
+    message plays K games in lockstep (play_games_lockstep) and pushes K
+    trajectories.
+
+    With an `inference_channel` (ai.inference_server) leaf batches are evaluated
+    by the inference server, which reads the shared weights itself."""
     torch.set_num_threads(1)
     config = ConfigLoader(config_path)
     encoder = BoardEncoder(config, version=ENCODER_VERSION_CURRENT)
-    # aux_heads must match the trainer's evaluator: workers receive its full
-    # state_dict (including aux keys) even though they never call the aux head.
+    # aux_heads must match the trainer's evaluator: the shared weights hold its
+    # full state_dict (including aux keys) even though workers never call the aux head.
     evaluator = BoardEvaluator(encoder.input_size, hidden_sizes=list(hidden_sizes),
-                               aux_heads=config.get_aux_heads())
+                               aux_heads=config.get_aux_heads(),
+                               fixed_features=encoder.fixed_features())
     evaluator.eval()
     bearoff = None
     if config.get_use_bearoff_db():
         # The trainer builds the DB before spawning workers; this only loads the cache.
         bearoff = BearoffDB.load_or_build(config.get_bearoff_db_path(), progress=False)
-    agent = Agent(evaluator, encoder, bearoff=bearoff)
+    encoding_cache = None
+    if config.get_encoding_cache_size() > 0:
+        # Encodings don't depend on the weights, so the cache lives across games
+        # and weight updates; it also serves the trajectory's state encodings.
+        encoding_cache = EncodingCache(encoder, config.get_encoding_cache_size())
+    eval_cache = None
+    if config.get_eval_cache_size() > 0:
+        # Cleared automatically when read_into copies in new weights.
+        eval_cache = EvalCache(config.get_eval_cache_size())
+    # The server evaluates with torch, so selfplay_inference_backend doesn't
+    # apply to its workers (the trainer says so when it starts the server).
+    inference = config.get_selfplay_inference_backend()
+    if inference_channel is not None:
+        inference = SERVER_INFERENCE
+    # int8_static is calibrated on positions played with the first real weights.
+    calibrate_int8 = inference == INT8_STATIC
+    agent = Agent(evaluator, encoder, bearoff=bearoff, encoding_cache=encoding_cache,
+                  eval_cache=eval_cache,
+                  inference=(TORCH_INFERENCE if inference in (INT8_STATIC, SERVER_INFERENCE)
+                             else inference))
+    if inference_channel is not None:
+        agent.set_inference(SERVER_INFERENCE,
+                            backend=InferenceClient(inference_channel, worker_id))
+    state_encoder = encoder if encoding_cache is None else encoding_cache
 
     seed_pool = None
     seeded_fraction = config.get_selfplay_seeded_fraction()
@@ -171,21 +319,43 @@ def worker_main(worker_id, weight_q, traj_q, config_path, hidden_sizes, base_see
             league_fraction = 0.0
 
     bootstrap_depth = config.get_bootstrap_depth()
+    lockstep_games = config.get_selfplay_lockstep_games()
+    if config.get_move_cache_size() > 0:
+        enable_move_cache(config.get_move_cache_size())
 
     seed = (base_seed + worker_id * 9176 + 7) & 0xFFFFFFFF
     random.seed(seed)
     np.random.seed(seed)
     torch.manual_seed(seed)
 
+    weights_version = -1
     while True:
-        msg = weight_q.get()
+        msg = control_q.get()
         if msg is None:
+            shared_weights.close()
             return
-        weights, epsilon, exploration_temperature = msg
-        evaluator.load_state_dict({k: torch.from_numpy(v) for k, v in weights.items()})
-        traj = play_one_game_record(agent, encoder, config, epsilon, exploration_temperature,
-                                    seed_pool=seed_pool, seeded_fraction=seeded_fraction,
-                                    league_opponents=league_opponents,
-                                    league_fraction=league_fraction,
-                                    bootstrap_depth=bootstrap_depth)
-        traj_q.put((worker_id, traj))
+        epsilon, exploration_temperature = msg
+        if inference_channel is None:
+            weights_version = shared_weights.read_into(evaluator, weights_version)
+        elif eval_cache is not None:
+            # The server's weights change without the local evaluator noticing.
+            eval_cache.clear()
+        if calibrate_int8:
+            agent.set_inference(INT8_STATIC, quantization_calibration(agent, config))
+            calibrate_int8 = False
+        if lockstep_games > 1:
+            trajs = play_games_lockstep(agent, state_encoder, config, epsilon,
+                                        exploration_temperature, lockstep_games,
+                                        seed_pool=seed_pool, seeded_fraction=seeded_fraction,
+                                        league_opponents=league_opponents,
+                                        league_fraction=league_fraction,
+                                        bootstrap_depth=bootstrap_depth)
+        else:
+            trajs = [play_one_game_record(agent, state_encoder, config, epsilon,
+                                          exploration_temperature,
+                                          seed_pool=seed_pool, seeded_fraction=seeded_fraction,
+                                          league_opponents=league_opponents,
+                                          league_fraction=league_fraction,
+                                          bootstrap_depth=bootstrap_depth)]
+        for traj in trajs:
+            traj_q.put((worker_id, traj))
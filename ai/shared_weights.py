@@ -0,0 +1,109 @@
+"""Weight broadcast from the trainer to its processes through shared memory.
+
+The trainer `publish`es its state_dict into one shared-memory segment. Worker
+processes (and the inference server) copy it out with `read_into` when they
+start a game, skipping the copy when the version is unchanged. Nothing is
+pickled.
+
+Consistency is a seqlock: a single writer bumps a sequence counter to odd,
+copies the tensors, and bumps it back to even. A reader copies the tensors
+between two reads of the counter and retries when they differ or are odd.
+This relies on stores and loads staying in program order between the counter
+and the data. x86-64 guarantees that; numpy offers no explicit fences, so on
+weaker memory models a torn read is possible in principle.
+"""
+
+import time
+from multiprocessing import shared_memory
+from typing import Dict, List, Tuple
+
+import numpy as np
+import torch
+
+_HEADER_BYTES = 64  # int64 sequence counter, padded to a cache line
+
+
+def _numpy_state(state_dict) -> Dict[str, np.ndarray]:
+    return {k: (v.detach().cpu().numpy() if isinstance(v, torch.Tensor) else np.asarray(v))
+            for k, v in state_dict.items()}
+
+
+class SharedWeights:
+    """A state_dict's tensors in one shared-memory segment behind a seqlock.
+
+    Create it in the trainer from the evaluator's state_dict (this publishes
+    version 1), pass it to processes as an argument, and `close(unlink=True)`
+    it in the trainer at the end. One process publishes; any number read.
+    """
+
+    def __init__(self, state_dict):
+        arrays = _numpy_state(state_dict)
+        spec: List[Tuple[str, Tuple[int, ...], str, int]] = []
+        offset = _HEADER_BYTES
+        for name, array in arrays.items():
+            spec.append((name, tuple(array.shape), array.dtype.str, offset))
+            offset += -(-array.nbytes // 8) * 8  # keep every tensor 8-byte aligned
+        self.spec = spec
+        self._shm = shared_memory.SharedMemory(create=True, size=offset)
+        self._map()
+        self._seq[0] = 0
+        self.publish(arrays)
+
+    def _map(self) -> None:
+        buf = self._shm.buf
+        self._seq = np.ndarray((1,), np.int64, buf, 0)
+        self.arrays = {name: np.ndarray(shape, np.dtype(dtype), buf, offset)
+                       for name, shape, dtype, offset in self.spec}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_seq"], state["arrays"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._map()
+
+    @property
+    def version(self) -> int:
+        """Number of completed publishes (odd sequence = one in progress)."""
+        return int(self._seq[0]) // 2
+
+    def publish(self, state_dict) -> int:
+        """Copy `state_dict` (torch or numpy values, same keys and shapes as at
+        construction) into the segment. Returns the new version."""
+        arrays = _numpy_state(state_dict)
+        self._seq[0] += 1
+        for name, dest in self.arrays.items():
+            np.copyto(dest, arrays[name])
+        self._seq[0] += 1
+        return self.version
+
+    def read_into(self, module: torch.nn.Module, have_version: int = -1,
+                  timeout_s: float = 10.0) -> int:
+        """Copy the latest weights into `module`'s tensors in place, unless
+        they are still `have_version`. Returns the version now held.
+
+        In-place copies bump the tensors' version counters, so WeightsWatch
+        users (EvalCache, NumpyEvaluator) see the change."""
+        targets = module.state_dict()
+        deadline = time.monotonic() + timeout_s
+        while True:
+            seq = int(self._seq[0])
+            if seq % 2 == 0:
+                if seq // 2 == have_version:
+                    return have_version
+                with torch.no_grad():
+                    for name, source in self.arrays.items():
+                        targets[name].copy_(torch.from_numpy(source))
+                if int(self._seq[0]) == seq:
+                    return seq // 2
+            if time.monotonic() > deadline:
+                raise TimeoutError("SharedWeights: no consistent read (writer stalled?)")
+            time.sleep(0)
+
+    def close(self, unlink: bool = False) -> None:
+        del self._seq, self.arrays
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
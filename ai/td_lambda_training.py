@@ -1,6 +1,6 @@
 import torch
 import torch.nn.functional as F
-from ai.agent import Agent, RandomAgent
+from ai.agent import Agent, EvalCache, RandomAgent
 from ai.bearoff import BearoffDB, exact_value_on_roll
 from ai.board_evaluator import BoardEvaluator
 from ai.board_encoder import BoardEncoder
@@ -11,7 +11,10 @@ from ai.checkpoint_io import (
     _migrate_state_dict,
     load_state_dict,
 )
+from ai.numpy_inference import TORCH_INFERENCE
+from ai.shared_weights import SharedWeights
 from domain.constants import WHITE, BLACK
+from domain.move_code import decode_move
 from domain.move_generation import legal_moves
 from game.game import Game
 from tqdm import tqdm
@@ -139,7 +142,10 @@ class TdLambdaTraining:
         self.bearoff = None
         if bool(self.config.get_use_bearoff_db()):
             self.bearoff = BearoffDB.load_or_build(self.config.get_bearoff_db_path())
-        self.agent = Agent(self.board_evaluator, self.board_encoder, bearoff=self.bearoff)
+        # The eval cache notices the optimizer's in-place weight updates and clears itself.
+        eval_cache = EvalCache(config.get_eval_cache_size()) if config.get_eval_cache_size() > 0 else None
+        self.agent = Agent(self.board_evaluator, self.board_encoder, bearoff=self.bearoff,
+                           eval_cache=eval_cache)
 
         # TD(Lambda) parameters
         self.lambda_start = self.config.get_lambda_start()
@@ -384,7 +390,7 @@ class TdLambdaTraining:
             while not game.is_over():
                 current_player = game.current_player
                 game.dice.roll()
-                possible_moves = legal_moves(game.board, current_player, game.dice)
+                possible_moves = legal_moves(game.board, current_player, game.dice, compact=True)
                 if not possible_moves:
                     game.switch_turn()
                     continue
@@ -445,7 +451,8 @@ class TdLambdaTraining:
                 encoder_version = ENCODER_VERSION_LEGACY
                 hidden_sizes = HIDDEN_SIZES_LEGACY
             gold_encoder = BoardEncoder(self.config, version=encoder_version)
-            gold_evaluator = BoardEvaluator(gold_encoder.input_size, hidden_sizes=hidden_sizes).to(self.device)
+            gold_evaluator = BoardEvaluator(gold_encoder.input_size, hidden_sizes=hidden_sizes,
+                                            fixed_features=gold_encoder.fixed_features()).to(self.device)
             gold_evaluator.load_state_dict(_migrate_state_dict(state_dict))
             gold_evaluator.eval()
             self.gold_agent = Agent(gold_evaluator, gold_encoder, bearoff=self.bearoff)
@@ -463,7 +470,7 @@ class TdLambdaTraining:
             while not game.is_over():
                 current_player = game.current_player
                 game.dice.roll()
-                possible_moves = legal_moves(game.board, current_player, game.dice)
+                possible_moves = legal_moves(game.board, current_player, game.dice, compact=True)
                 if not possible_moves:
                     game.switch_turn()
                     continue
@@ -666,9 +673,8 @@ class TdLambdaTraining:
         from ai.self_play_worker import worker_main
         return worker_main
 
-    def _send_weights_to_worker(self, weight_q):
-        weights = {k: v.detach().cpu().numpy().copy() for k, v in self.board_evaluator.state_dict().items()}
-        weight_q.put((weights, float(self.epsilon), float(self.exploration_temperature)))
+    def _send_game_to_worker(self, control_q):
+        control_q.put((float(self.epsilon), float(self.exploration_temperature)))
 
     def _play_one_game_local(self, verbose_log_file=None):
         """Self-play one full game in-process, collecting a trajectory dict matching the
@@ -697,7 +703,7 @@ class TdLambdaTraining:
                 is_white_to_move = current_player == WHITE
 
                 dice = game.dice.roll()
-                possible_moves = legal_moves(game.board, current_player, game.dice)
+                possible_moves = legal_moves(game.board, current_player, game.dice, compact=True)
 
                 move, score = None, None
                 if not possible_moves:
@@ -721,7 +727,7 @@ class TdLambdaTraining:
                     log_fh.write(f"Player: {current_player}\n")
                     log_fh.write(f"Dice: {dice}\n")
                     log_fh.write(f"Board:\n{game.board}\n")
-                    log_fh.write(f"Move chosen: {move}\n")
+                    log_fh.write(f"Move chosen: {move if move == 'pass' else decode_move(move, current_player)}\n")
                     if score is not None:
                         log_fh.write(f"Board score: {score}\n")
                     log_fh.write(f"Lambda value: {self.lambda_}.\n")
@@ -865,30 +871,59 @@ class TdLambdaTraining:
 
         ctx = mp.get_context("spawn")
         num_workers = self.num_self_play_workers
-        weight_qs = [ctx.Queue(maxsize=2) for _ in range(num_workers)]
+        control_qs = [ctx.Queue(maxsize=2) for _ in range(num_workers)]
         traj_q = ctx.Queue()
+        # Weights go out through shared memory (ai.shared_weights): published
+        # after every trajectory, copied in by the workers when a game starts.
+        shared_weights = SharedWeights(self.board_evaluator.state_dict())
 
         config_path = self.config.config_file
         base_seed = random.SystemRandom().randrange(0, 2**32)
         hidden_sizes = list(self.board_evaluator.hidden_sizes)
         worker_fn = self._get_worker_fn()
 
+        # Optional inference server (ai.inference_server): workers send it their
+        # leaf batches, and it picks up the shared weights before every batch.
+        channel, server = None, None
+        if self.config.get_selfplay_inference_server():
+            from ai.inference_server import InferenceChannel, server_main
+            backend = self.config.get_selfplay_inference_backend()
+            if backend != TORCH_INFERENCE:
+                print(f"selfplay_inference_server: the server evaluates with torch; "
+                      f"selfplay_inference_backend={backend} is ignored")
+            channel = InferenceChannel(ctx, num_workers, self.board_encoder.input_size,
+                                       self.config.get_inference_server_max_rows())
+            server = ctx.Process(target=server_main,
+                                 args=(channel, shared_weights, config_path, hidden_sizes),
+                                 daemon=True)
+            server.start()
+
         workers = []
         for wid in range(num_workers):
             p = ctx.Process(
                 target=worker_fn,
-                args=(wid, weight_qs[wid], traj_q, config_path, hidden_sizes, base_seed),
+                args=(wid, control_qs[wid], traj_q, config_path, hidden_sizes, base_seed,
+                      shared_weights, channel),
                 daemon=True,
             )
             p.start()
             workers.append(p)
 
-        def send_weights(wid):
-            self._send_weights_to_worker(weight_qs[wid])
+        # A worker message starts selfplay_lockstep_games games, so a worker
+        # gets its next message once all trajectories of the last one are in.
+        games_per_message = max(1, self.config.get_selfplay_lockstep_games())
+        outstanding = [games_per_message] * num_workers
+
+        def send_game(wid):
+            outstanding[wid] -= 1
+            if outstanding[wid] <= 0:
+                outstanding[wid] = games_per_message
+                self._send_game_to_worker(control_qs[wid])
 
         try:
             for wid in range(num_workers):
-                send_weights(wid)
+                outstanding[wid] = 1
+                send_game(wid)
 
             self.board_evaluator.train()
             num_epochs = self.config.get_num_epochs()
@@ -924,7 +959,8 @@ class TdLambdaTraining:
                     self._update_schedules(self.global_game_num - 1)
                     if self.state_save_every_games > 0 and self.global_game_num % self.state_save_every_games == 0:
                         self._save_training_state()
-                    send_weights(wid)
+                    shared_weights.publish(self.board_evaluator.state_dict())
+                    send_game(wid)
 
                 epoch_seconds = time.perf_counter() - epoch_start
                 epoch_games_per_second = games_per_epoch / epoch_seconds if epoch_seconds > 0 else 0.0
@@ -960,10 +996,17 @@ class TdLambdaTraining:
             self._save_training_state()
             print(f"Model saved to {self.model_save_path}")
         finally:
-            for q in weight_qs:
+            for q in control_qs:
                 try: q.put_nowait(None)
                 except Exception: pass
             for p in workers:
                 p.join(timeout=3)
                 if p.is_alive():
                     p.terminate()
+            if server is not None:
+                channel.stop()
+                server.join(timeout=3)
+                if server.is_alive():
+                    server.terminate()
+                channel.close(unlink=True)
+            shared_weights.close(unlink=True)
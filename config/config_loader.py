@@ -128,6 +128,9 @@ class ConfigLoader:
     def get_search_max_depth(self) -> int:
         return int(self.config.get("search_max_depth", 3))
 
+    def get_search_chance_pruning(self) -> bool:
+        return bool(self.config.get("search_chance_pruning", True))
+
     def get_eval_seed(self):
         return self.config.get("eval_seed")
 
@@ -194,6 +197,33 @@ class ConfigLoader:
     def get_use_bearoff_db(self):
         return bool(self.config.get("use_bearoff_db", True))
 
+    def get_move_cache_size(self):
+        return int(self.config.get("move_cache_size", 0))
+
+    def get_encoding_cache_size(self):
+        return int(self.config.get("encoding_cache_size", 0))
+
+    def get_eval_cache_size(self):
+        return int(self.config.get("eval_cache_size", 0))
+
+    def get_selfplay_inference_backend(self):
+        return str(self.config.get("selfplay_inference_backend", "torch"))
+
+    def get_selfplay_lockstep_games(self):
+        return int(self.config.get("selfplay_lockstep_games", 1))
+
+    def get_selfplay_inference_server(self):
+        return bool(self.config.get("selfplay_inference_server", False))
+
+    def get_inference_server_max_rows(self):
+        return int(self.config.get("inference_server_max_rows", 2048))
+
+    def get_inference_server_threads(self):
+        return int(self.config.get("inference_server_threads", 1))
+
+    def get_inference_server_batch_wait_ms(self):
+        return float(self.config.get("inference_server_batch_wait_ms", 0.0))
+
     def get_bearoff_db_path(self):
         # The bear-off DB depends only on the game rules (home_size, max_checkers,
         # format version) — never on the branch, code, or trained model. Cache it
@@ -220,6 +250,33 @@ class ConfigLoader:
     def get_play_eval_lookahead_plies(self):
         return int(self.config.get("play", {}).get("eval_lookahead_plies", 4))
 
+    def get_play_move_cache_size(self):
+        return int(self.config.get("play", {}).get("move_cache_size", 0))
+
+    def get_play_encoding_cache_size(self):
+        return int(self.config.get("play", {}).get("encoding_cache_size", 0))
+
+    def get_play_eval_cache_size(self):
+        return int(self.config.get("play", {}).get("eval_cache_size", 0))
+
+    def get_play_inference_backend(self):
+        return str(self.config.get("play", {}).get("inference_backend", "torch"))
+
+    def get_play_search_workers(self):
+        return int(self.config.get("play", {}).get("search_workers", 0))
+
+    def get_play_review_rollout_candidates(self):
+        return int(self.config.get("play", {}).get("review_rollout_candidates", 3))
+
+    def get_play_review_rollout_trials(self):
+        return int(self.config.get("play", {}).get("review_rollout_trials", 1296))
+
+    def get_play_review_rollout_time_budget_s(self):
+        return float(self.config.get("play", {}).get("review_rollout_time_budget_s", 20.0))
+
+    def get_play_review_rollout_luck_plies(self):
+        return int(self.config.get("play", {}).get("review_rollout_luck_plies", 0))
+
     def get_play_drill_correct_floor(self):
         return float(self.config.get("play", {}).get("drill_correct_floor", 0.01))
 
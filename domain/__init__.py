@@ -2,12 +2,13 @@ from domain.constants import WHITE, BLACK, color_name, other
 from domain.dice import Dice, Die
 from domain.move import HalfMove, Move
 from domain.board import Board
-from domain.move_generation import legal_moves
+from domain.packed_board import PackedBoard
+from domain.move_generation import legal_afterstates, legal_moves
 
 __all__ = [
     "WHITE", "BLACK", "color_name", "other",
     "Dice", "Die",
     "HalfMove", "Move",
-    "Board",
-    "legal_moves",
+    "Board", "PackedBoard",
+    "legal_moves", "legal_afterstates",
 ]
@@ -0,0 +1,316 @@
+"""Vectorized legal-move generation over a batch of boards.
+
+Boards are stacked as a (B, board_size + 2) int array of slot codes — the
+PackedBoard cell layout (domain.zobrist): sign = owner, low bits = owner
+count, PIN_FLAG = an opponent checker trapped underneath. For one color and
+one roll, `batch_afterstates` returns every legal afterstate of every board as
+flat arrays, with the same move set `domain.move_generation.legal_moves`
+produces board by board, but without building HalfMove / Move objects.
+`batch_has_won` and `zobrist_hashes` are Board.has_won and Board.zobrist
+for the same arrays. The agent's 2-ply evaluation
+(`ai.agent.Agent._evaluate_moves_2ply_batch`) generates every opponent
+reply with one `batch_afterstates` call per roll.
+
+Rules are replicated from the scalar generator, including its quirks:
+  * non-pasch: two-half pairs (either order must satisfy the bear-off home
+    rule), merged single-checker jumps, and rule-2 single-die moves;
+  * pasch: sources in non-decreasing iteration order, with the scalar
+    generator's persistent `*_is_possible` flags. A depth-k prefix is emitted
+    as a shorter move iff it precedes (lexicographically, in iteration order)
+    the first legal depth-(k+1) sequence of its board.
+
+Needs numpy, so unlike the rest of `domain` it is not re-exported from the
+package; import it as `domain.batch_move_generation`.
+"""
+
+from functools import lru_cache
+from itertools import chain
+from typing import Iterable, List, NamedTuple, Tuple
+
+import numpy as np
+
+from domain.board import Board
+from domain.constants import WHITE
+from domain.move import HalfMove, Move
+from domain.zobrist import CODE_OFFSET, CODE_SPAN, PIN_FLAG, STACK_MASK, slot_code, zobrist_keys
+
+MAX_HALVES = 4
+
+
+class BatchMoves(NamedTuple):
+    """All legal moves of a batch, one row per move, grouped by board_index."""
+    board_index: np.ndarray  # (M,) row of the input batch the move belongs to
+    cells: np.ndarray        # (M, S) afterstate slot codes
+    src: np.ndarray          # (M, 4) half-move sources, -1 padded
+    dst: np.ndarray          # (M, 4) half-move destinations, -1 padded
+
+    def __len__(self) -> int:
+        return len(self.board_index)
+
+    def move(self, i: int) -> Move:
+        """Materialize row i as a Move (for the chosen move only)."""
+        return Move(tuple(HalfMove(int(s), int(d))
+                          for s, d in zip(self.src[i], self.dst[i]) if s >= 0))
+
+
+def stack_cells(boards: Iterable) -> np.ndarray:
+    """(B, board_size + 2) slot codes for a sequence of Board / PackedBoard."""
+    boards = list(boards)
+    if boards and all(isinstance(b, Board) for b in boards):
+        shape = (len(boards), boards[0].board_size + 2)
+        size = shape[0] * shape[1]
+        n = np.fromiter(chain.from_iterable(b.n for b in boards), np.int16, size)
+        color = np.fromiter(chain.from_iterable(b.color for b in boards), np.int16, size)
+        pinned = np.fromiter(chain.from_iterable(b.pinned for b in boards), np.int16, size)
+        return (color * (n + PIN_FLAG * pinned)).reshape(shape)
+    rows = []
+    for b in boards:
+        if isinstance(b, Board):
+            rows.append([slot_code(b.n[i], b.color[i], b.pinned[i])
+                         for i in range(b.board_size + 2)])
+        else:
+            rows.append(b.cells)
+    return np.asarray(rows, dtype=np.int16)
+
+
+def batch_has_won(cells: np.ndarray, color: int, pieces_per_player: int) -> np.ndarray:
+    """(B,) bool, Board.has_won(color) for every row of `cells`."""
+    board_size = cells.shape[1] - 2
+    off = board_size + 1 if color == WHITE else 0
+    start = board_size if color == WHITE else 1
+    m = cells[:, start] * color
+    return (cells[:, off] * color >= pieces_per_player) | ((m > 0) & ((m & PIN_FLAG) != 0))
+
+
+def zobrist_hashes(cells: np.ndarray) -> List[int]:
+    """Board.zobrist of every row of `cells`."""
+    size = cells.shape[1]
+    keys = _zobrist_table(size)
+    idx = np.arange(size) * CODE_SPAN + CODE_OFFSET + cells
+    return np.bitwise_xor.reduce(keys[idx], axis=1).tolist()
+
+
+@lru_cache(maxsize=None)
+def _zobrist_table(size: int) -> np.ndarray:
+    return np.array(zobrist_keys(size), dtype=np.uint64)
+
+
+def batch_afterstates(cells: np.ndarray, color: int, d1: int, d2: int,
+                      home_size: int = 6) -> BatchMoves:
+    """Legal moves of `color` rolling (d1, d2) on every row of `cells`."""
+    cells = np.asarray(cells, dtype=np.int16)
+    if cells.ndim != 2:
+        raise ValueError(f"expected (B, board_size + 2) cells, got shape {cells.shape}")
+    geo = _Geometry(cells.shape[1] - 2, home_size, color)
+    if d1 == d2:
+        return _pasch(cells, geo, d1)
+    return _normal(cells, geo, d1, d2)
+
+
+# ---------- shared helpers ----------
+
+class _Geometry:
+    """Per-(board_size, home_size, color) index arrays."""
+
+    def __init__(self, board_size: int, home_size: int, color: int) -> None:
+        self.board_size = board_size
+        self.size = board_size + 2
+        self.color = color
+        idx = np.arange(self.size)
+        if color == WHITE:
+            self.home = (idx >= board_size - home_size + 1) & (idx <= board_size)
+        else:
+            self.home = (idx >= 1) & (idx <= home_size)
+        self.off = (idx == 0) | (idx == board_size + 1)
+        self.playable_not_home = ~self.home & ~self.off
+
+    def halves(self, die: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Structurally possible (src, dst) for one die, in iteration order
+        (the scalar generator's `_all_halves` / pasch loop order)."""
+        if self.color == WHITE:
+            src = np.arange(1, self.board_size + 2 - die)
+        else:
+            src = np.arange(self.board_size, die - 1, -1)
+        return src, src + self.color * die
+
+    def outside_delta(self, src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+        """Change of the mover's outside-home count for src -> dst (0 or -1)."""
+        return -(~self.home[src] & (self.home[dst] | self.off[dst])).astype(np.int16)
+
+
+def _owned(cells: np.ndarray, c: int) -> np.ndarray:
+    m = cells * c
+    return np.where(m > 0, m & STACK_MASK, 0)
+
+
+def _open(cells: np.ndarray, c: int) -> np.ndarray:
+    m = cells * c
+    return (m >= 0) | (m == -1)
+
+
+def _outside(cells: np.ndarray, geo: _Geometry) -> np.ndarray:
+    m = cells * geo.color
+    own = np.where(m > 0, m & STACK_MASK, 0)
+    trapped = (m < 0) & ((-m & PIN_FLAG) != 0)
+    return ((own + trapped) * geo.playable_not_home).sum(axis=1).astype(np.int16)
+
+
+def _apply(rows: np.ndarray, src: np.ndarray, dst: np.ndarray, geo: _Geometry) -> np.ndarray:
+    """Apply one half-move per row (already known to be legal); returns a copy."""
+    c = geo.color
+    out = rows.copy()
+    r = np.arange(len(rows))
+    s = rows[r, src]
+    d = rows[r, dst]
+    m = s * c
+    new_s = np.where((m & STACK_MASK) > 1, s - c, np.where(m & PIN_FLAG, -c, 0))
+    new_d = np.where(geo.off[dst] | (d * c > 0), d + c,
+                     np.where(d == 0, c, c * (1 + PIN_FLAG)))
+    out[r, src] = new_s
+    out[r, dst] = new_d
+    return out
+
+
+def _pad(halves: List[np.ndarray], rows: int) -> np.ndarray:
+    out = np.full((rows, MAX_HALVES), -1, dtype=np.int16)
+    for k, h in enumerate(halves):
+        out[:, k] = h
+    return out
+
+
+def _concat(parts: List[BatchMoves], size: int) -> BatchMoves:
+    parts = [p for p in parts if len(p.board_index)]
+    if not parts:
+        return BatchMoves(np.zeros(0, dtype=np.int64), np.zeros((0, size), dtype=np.int16),
+                          np.zeros((0, MAX_HALVES), dtype=np.int16),
+                          np.zeros((0, MAX_HALVES), dtype=np.int16))
+    board_index = np.concatenate([p.board_index for p in parts])
+    order = np.argsort(board_index, kind="stable")
+    return BatchMoves(board_index[order],
+                      np.concatenate([p.cells for p in parts])[order],
+                      np.concatenate([p.src for p in parts])[order],
+                      np.concatenate([p.dst for p in parts])[order])
+
+
+# ---------- non-pasch ----------
+
+def _normal(cells: np.ndarray, geo: _Geometry, d1: int, d2: int) -> BatchMoves:
+    c = geo.color
+    owned = _owned(cells, c)
+    is_open = _open(cells, c)
+    outside = _outside(cells, geo)
+    parts: List[BatchMoves] = []
+
+    src1, dst1 = geo.halves(d1)
+    src2, dst2 = geo.halves(d2)
+    valid1 = (owned[:, src1] > 0) & is_open[:, dst1]
+    valid2 = (owned[:, src2] > 0) & is_open[:, dst2]
+
+    # Two-half pairs: (B, K1, K2).
+    chained = (dst1[:, None] == src2[None, :]) | (dst2[None, :] == src1[:, None])
+    same_src = src1[:, None] == src2[None, :]
+    off1 = geo.off[dst1][:, None]
+    off2 = geo.off[dst2][None, :]
+    delta1 = geo.outside_delta(src1, dst1)[:, None]
+    delta2 = geo.outside_delta(src2, dst2)[None, :]
+    out3 = outside[:, None, None]
+    in_order_12 = (~off1 | (out3 == 0)) & (~off2 | (out3 + delta1 == 0))
+    in_order_21 = (~off2 | (out3 == 0)) & (~off1 | (out3 + delta2 == 0))
+    pair_ok = (valid1[:, :, None] & valid2[:, None, :] & ~chained
+               & (in_order_12 | in_order_21)
+               & (~same_src | (owned[:, src1] >= 2)[:, :, None]))
+    b, k1, k2 = np.nonzero(pair_ok)
+    if len(b):
+        after = _apply(_apply(cells[b], src1[k1], dst1[k1], geo), src2[k2], dst2[k2], geo)
+        parts.append(BatchMoves(b, after, _pad([src1[k1], src2[k2]], len(b)),
+                                _pad([dst1[k1], dst2[k2]], len(b))))
+
+    # Merged single-checker jumps.
+    srcm, dstm = geo.halves(d1 + d2)
+    if len(srcm):
+        mid1 = srcm + c * d1
+        mid2 = srcm + c * d2
+        out2 = outside[:, None]
+        home_ok = (~geo.off[dstm][None, :] | (out2 == 0)
+                   | (out2 + geo.outside_delta(srcm, mid1)[None, :] == 0)
+                   | (out2 + geo.outside_delta(srcm, mid2)[None, :] == 0))
+        merged_ok = ((owned[:, srcm] > 0) & is_open[:, dstm]
+                     & (is_open[:, mid1] | is_open[:, mid2]) & home_ok)
+        b, k = np.nonzero(merged_ok)
+        if len(b):
+            after = _apply(cells[b], srcm[k], dstm[k], geo)
+            parts.append(BatchMoves(b, after, _pad([srcm[k]], len(b)), _pad([dstm[k]], len(b))))
+
+    # Rule 2: a single die is a move when playing it leaves the other unplayable.
+    parts.append(_rule_2(cells, geo, outside, src1, dst1, valid1, d2))
+    parts.append(_rule_2(cells, geo, outside, src2, dst2, valid2, d1))
+    return _concat(parts, geo.size)
+
+
+def _rule_2(cells: np.ndarray, geo: _Geometry, outside: np.ndarray,
+            src: np.ndarray, dst: np.ndarray, valid: np.ndarray, other_die: int) -> BatchMoves:
+    c = geo.color
+    ok = valid & (~geo.off[dst][None, :] | (outside[:, None] == 0))
+    b, k = np.nonzero(ok)
+    if not len(b):
+        return _concat([], geo.size)
+    after = _apply(cells[b], src[k], dst[k], geo)
+    new_outside = outside[b] + geo.outside_delta(src[k], dst[k])
+    srco, dsto = geo.halves(other_die)
+    playable = ((_owned(after[:, srco], c) > 0) & _open(after[:, dsto], c)
+                & (~geo.off[dsto][None, :] | (new_outside[:, None] == 0)))
+    emit = ~playable.any(axis=1)
+    n = int(emit.sum())
+    return BatchMoves(b[emit], after[emit], _pad([src[k][emit]], n), _pad([dst[k][emit]], n))
+
+
+# ---------- pasch (doubles) ----------
+
+def _pasch(cells: np.ndarray, geo: _Geometry, die: int) -> BatchMoves:
+    c = geo.color
+    src, dst = geo.halves(die)
+    span = len(src) + 1
+
+    # Frontier of legal sequences of the current depth: board, afterstate,
+    # outside count, last iteration position, and the positions taken so far.
+    board = np.arange(len(cells))
+    rows = cells
+    outside = _outside(cells, geo)
+    last = np.zeros(len(cells), dtype=np.int64)
+    taken: List[np.ndarray] = []
+    levels = []
+    for _depth in range(MAX_HALVES):
+        can = ((_owned(rows[:, src], c) > 0) & _open(rows[:, dst], c)
+               & (~geo.off[dst][None, :] | (outside[:, None] == 0))
+               & (np.arange(len(src))[None, :] >= last[:, None]))
+        r, k = np.nonzero(can)
+        if not len(r):
+            break
+        rows = _apply(rows[r], src[k], dst[k], geo)
+        outside = outside[r] + geo.outside_delta(src[k], dst[k])
+        board = board[r]
+        last = k
+        taken = [t[r] for t in taken] + [k]
+        # Lexicographic key of the sequence in iteration order; positions are
+        # shifted by one so a shorter prefix sorts before its extensions.
+        key = np.zeros(len(r), dtype=np.int64)
+        for t in taken:
+            key = key * span + t + 1
+        levels.append((board, rows, list(taken), key))
+
+    parts: List[BatchMoves] = []
+    for depth, (b, after, seq, key) in enumerate(levels):
+        if depth + 1 < len(levels):
+            # Emit a shorter sequence only if it precedes its board's first
+            # legal longer sequence (the scalar generator's sticky flags).
+            nb, _, _, nkey = levels[depth + 1]
+            first_longer = np.full(len(cells), np.iinfo(np.int64).max, dtype=np.int64)
+            np.minimum.at(first_longer, nb, nkey // span)
+            keep = key < first_longer[b]
+        else:
+            keep = np.ones(len(b), dtype=bool)
+        n = int(keep.sum())
+        parts.append(BatchMoves(b[keep], after[keep],
+                                _pad([src[t[keep]] for t in seq], n),
+                                _pad([dst[t[keep]] for t in seq], n)))
+    return _concat(parts, geo.size)
@@ -1,15 +1,21 @@
-from typing import List, Tuple
+from typing import List, Tuple, Union
 
 from domain.constants import WHITE, BLACK, color_name
 from domain.move import HalfMove, Move
+from domain.move_code import HALF_BITS, HALF_MASK, SRC_BITS, SRC_MASK
+from domain.summary import (
+    PINS, RACE_MASK, blots_lane, lane, outside_lane, pips_lane, summary_table,
+)
+from domain.zobrist import CODE_OFFSET, CODE_SPAN, PIN_FLAG, STACK_MASK, slot_code, zobrist_keys
 
 
 # An UndoToken is a list of half-undo entries:
 #   (src, n_src_before, color_src_before, pinned_src_before,
 #    dst, n_dst_before, color_dst_before, pinned_dst_before,
-#    moved_color)
-# We carry the moved color so undo can decrement `borne_off` correctly.
-UndoToken = List[Tuple[int, int, int, bool, int, int, int, bool, int]]
+#    moved_color, zobrist_before, summary_before)
+# We carry the moved color so undo can decrement `borne_off` correctly, and the
+# previous hash / summary so undo restores them without recomputing.
+UndoToken = List[Tuple[int, int, int, bool, int, int, int, bool, int, int, int]]
 
 
 class Board:
@@ -28,12 +34,20 @@ class Board:
     The pinned color is always -color[i]. Pop removes the top owner; if the last
     owner is popped and a pin existed, the trapped checker becomes a regular
     blot (color flips, pinned cleared). Push onto a single-opponent blot pins.
+
+    `zobrist` is the position's Zobrist hash (see domain.zobrist) and
+    `summary` packs the aggregate counters behind count_outside_home,
+    pip_count, blot_count, pin_count and is_pure_race (see domain.summary).
+    Both are maintained incrementally by set_point / apply_half / undo_half;
+    code that writes the slot arrays directly must call recompute() afterwards.
     """
 
     __slots__ = (
         "board_size", "home_size", "pieces_per_player",
         "n", "color", "pinned",
         "borne_off",
+        "zobrist", "_zkeys",
+        "summary", "_stable",
     )
 
     def __init__(self, board_size: int = 24, home_size: int = 6,
@@ -46,6 +60,12 @@ class Board:
         self.color: List[int] = [0] * size
         self.pinned: List[bool] = [False] * size
         self.borne_off = {WHITE: 0, BLACK: 0}
+        if pieces_per_player > STACK_MASK:
+            raise ValueError(f"pieces_per_player={pieces_per_player} exceeds {STACK_MASK}")
+        self._zkeys = zobrist_keys(size)
+        self.zobrist = 0
+        self._stable = summary_table(board_size, home_size)
+        self.summary = 0
 
     # --- construction helpers ---
 
@@ -66,6 +86,9 @@ class Board:
 
     def set_point(self, i: int, color: int, n: int, pinned: bool = False) -> None:
         """Replace slot i's state. Test / setup helper."""
+        idx = self._slot_index(i)
+        self.zobrist ^= self._zkeys[idx]
+        self.summary -= self._stable[idx]
         if n == 0:
             self.n[i] = 0
             self.color[i] = 0
@@ -74,6 +97,25 @@ class Board:
             self.n[i] = n
             self.color[i] = color
             self.pinned[i] = pinned
+        idx = self._slot_index(i)
+        self.zobrist ^= self._zkeys[idx]
+        self.summary += self._stable[idx]
+
+    def recompute(self) -> None:
+        """Rebuild the incrementally-maintained state from the slot arrays.
+        Needed only after writing n / color / pinned directly."""
+        z = 0
+        summary = 0
+        for i in range(self.board_size + 2):
+            idx = self._slot_index(i)
+            z ^= self._zkeys[idx]
+            summary += self._stable[idx]
+        self.zobrist = z
+        self.summary = summary
+
+    def _slot_index(self, i: int) -> int:
+        """Index of slot i's current code in the zobrist / summary tables."""
+        return i * CODE_SPAN + CODE_OFFSET + slot_code(self.n[i], self.color[i], self.pinned[i])
 
     def clone(self) -> "Board":
         b = Board(self.board_size, self.home_size, self.pieces_per_player)
@@ -81,6 +123,8 @@ class Board:
         b.color = self.color[:]
         b.pinned = self.pinned[:]
         b.borne_off = dict(self.borne_off)
+        b.zobrist = self.zobrist
+        b.summary = self.summary
         return b
 
     # --- inspection (all O(1)) ---
@@ -118,80 +162,122 @@ class Board:
         square, just frozen). Borne-off checkers are not counted (they're
         beyond home, effectively "done").
         """
-        total = 0
-        for i in range(1, self.board_size + 1):
-            if self.is_home(c, i):
-                continue
-            if self.n[i] > 0 and self.color[i] == c:
-                total += self.n[i]
-            if self.pinned[i] and self.color[i] == -c:
-                total += 1
-        return total
+        return lane(self.summary, outside_lane(c))
+
+    def pip_count(self, c: int) -> int:
+        """c's total distance to bear off (trapped checkers included)."""
+        return lane(self.summary, pips_lane(c))
+
+    def blot_count(self, c: int) -> int:
+        """c's single, unpinned checkers — the ones the opponent can pin."""
+        return lane(self.summary, blots_lane(c))
+
+    def pin_count(self) -> int:
+        return lane(self.summary, PINS)
+
+    def is_pure_race(self) -> bool:
+        """No pins anywhere and every checker inside its owner's home: the
+        sides can never interact again (ai.bearoff's exact-race condition)."""
+        return not self.summary & RACE_MASK
 
     # --- mutation ---
 
     def apply_half(self, src: int, dst: int, c: int) -> tuple:
         """Apply (src -> dst) for color c. Returns an undo entry."""
+        n = self.n
+        color = self.color
+        pinned = self.pinned
+        n_src = n[src]; c_src = color[src]; p_src = pinned[src]
+        n_dst = n[dst]; c_dst = color[dst]; p_dst = pinned[dst]
         undo = (
-            src, self.n[src], self.color[src], self.pinned[src],
-            dst, self.n[dst], self.color[dst], self.pinned[dst],
-            c,
+            src, n_src, c_src, p_src,
+            dst, n_dst, c_dst, p_dst,
+            c, self.zobrist, self.summary,
         )
 
+        # Table indices of the old and new slot codes, for the hash / summary
+        # update at the end.
+        base_src = src * CODE_SPAN + CODE_OFFSET
+        base_dst = dst * CODE_SPAN + CODE_OFFSET
+        old_src = base_src + c_src * (n_src + PIN_FLAG * p_src)
+        old_dst = base_dst + c_dst * (n_dst + PIN_FLAG * p_dst)
+
         # Pop owner at src.
-        self.n[src] -= 1
-        if self.n[src] == 0:
-            if self.pinned[src]:
-                # Last owner left; the previously-pinned opponent is now a blot.
-                self.color[src] = -self.color[src]
-                self.n[src] = 1
-                self.pinned[src] = False
-            else:
-                self.color[src] = 0
+        if n_src > 1:
+            n[src] = n_src - 1
+            new_src = old_src - c_src
+        elif p_src:
+            # Last owner left; the previously-pinned opponent is now a blot.
+            color[src] = -c_src
+            pinned[src] = False
+            new_src = base_src - c_src
+        else:
+            n[src] = 0
+            color[src] = 0
+            new_src = base_src
 
         # Push at dst.
         if dst == 0 or dst == self.board_size + 1:
             # Bear off — destination is the goal slot.
             self.borne_off[c] += 1
-            self.n[dst] += 1
-            self.color[dst] = c
+            n[dst] = n_dst + 1
+            color[dst] = c
             # pinned[dst] stays False (no pin in bear-off slot)
-        elif self.n[dst] == 0:
-            self.n[dst] = 1
-            self.color[dst] = c
-            self.pinned[dst] = False
-        elif self.color[dst] == c:
-            self.n[dst] += 1
-        elif self.n[dst] == 1 and not self.pinned[dst]:
+            new_dst = base_dst + c * (n_dst + 1)
+        elif n_dst == 0:
+            n[dst] = 1
+            color[dst] = c
+            pinned[dst] = False
+            new_dst = base_dst + c
+        elif c_dst == c:
+            n[dst] = n_dst + 1
+            new_dst = old_dst + c
+        elif n_dst == 1 and not p_dst:
             # Land on a single opponent blot: pin.
-            self.color[dst] = c
-            self.n[dst] = 1
-            self.pinned[dst] = True
+            color[dst] = c
+            pinned[dst] = True
+            new_dst = base_dst + c * (1 + PIN_FLAG)
         else:
             raise ValueError(
                 f"illegal apply_half src={src} dst={dst} c={c}: "
-                f"dst state n={self.n[dst]} color={self.color[dst]} pinned={self.pinned[dst]}"
+                f"dst state n={n_dst} color={c_dst} pinned={p_dst}"
             )
 
+        zk = self._zkeys
+        self.zobrist ^= zk[old_src] ^ zk[new_src] ^ zk[old_dst] ^ zk[new_dst]
+        st = self._stable
+        self.summary += st[new_src] - st[old_src] + st[new_dst] - st[old_dst]
         return undo
 
     def undo_half(self, entry: tuple) -> None:
         (src, n_src, c_src, p_src,
          dst, n_dst, c_dst, p_dst,
-         moved_color) = entry
+         moved_color, zobrist, summary) = entry
         if dst == 0 or dst == self.board_size + 1:
             self.borne_off[moved_color] -= 1
-        self.n[src] = n_src
-        self.color[src] = c_src
-        self.pinned[src] = p_src
-        self.n[dst] = n_dst
-        self.color[dst] = c_dst
-        self.pinned[dst] = p_dst
-
-    def apply(self, move: Move, c: int) -> UndoToken:
+        n = self.n
+        color = self.color
+        pinned = self.pinned
+        n[src] = n_src
+        color[src] = c_src
+        pinned[src] = p_src
+        n[dst] = n_dst
+        color[dst] = c_dst
+        pinned[dst] = p_dst
+        self.zobrist = zobrist
+        self.summary = summary
+
+    def apply(self, move: Union[Move, int], c: int) -> UndoToken:
+        """Apply a Move, or a domain.move_code integer, for color c."""
         token: UndoToken = []
-        for h in move.halves:
-            token.append(self.apply_half(h.src, h.dst, c))
+        if type(move) is int:
+            while move:
+                src = move & SRC_MASK
+                token.append(self.apply_half(src, src + c * ((move & HALF_MASK) >> SRC_BITS), c))
+                move >>= HALF_BITS
+            return token
+        for src, dst in move.halves:
+            token.append(self.apply_half(src, dst, c))
         return token
 
     def undo(self, token: UndoToken) -> None:
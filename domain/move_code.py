@@ -0,0 +1,43 @@
+"""Compact integer encoding of a Move.
+
+A move code packs up to four halves into one int, one 16-bit lane per half
+in play order, each lane holding `src | die << 8`. Sources are never 0 (the
+slot-0 bear-off is only ever a destination) and dice are never 0, so an empty
+lane terminates the move and the empty code 0 never collides with a real move.
+
+The color is not stored: the destination is `src + color * die`, so decoding
+needs the mover's color. Codes are what `legal_moves(..., compact=True)`
+emits; Move objects are materialized from them only when needed.
+"""
+
+from typing import Iterator, Tuple
+
+from domain.move import HalfMove, Move
+
+HALF_BITS = 16
+HALF_MASK = (1 << HALF_BITS) - 1
+SRC_BITS = 8
+SRC_MASK = (1 << SRC_BITS) - 1
+
+
+def half_code(src: int, die: int) -> int:
+    return src | die << SRC_BITS
+
+
+def iter_halves(code: int, color: int) -> Iterator[Tuple[int, int]]:
+    """(src, dst) pairs of a move code, in play order."""
+    while code:
+        src = code & SRC_MASK
+        yield src, src + color * ((code & HALF_MASK) >> SRC_BITS)
+        code >>= HALF_BITS
+
+
+def encode_move(move: Move, color: int) -> int:
+    code = 0
+    for k, (src, dst) in enumerate(move.halves):
+        code |= half_code(src, (dst - src) * color) << (k * HALF_BITS)
+    return code
+
+
+def decode_move(code: int, color: int) -> Move:
+    return Move(tuple(HalfMove(src, dst) for src, dst in iter_halves(code, color)))
@@ -1,253 +1,371 @@
-from typing import List
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Union
 
 from domain.board import Board
 from domain.constants import WHITE
 from domain.dice import Dice
 from domain.move import HalfMove, Move
+from domain.move_code import HALF_BITS, half_code
 
 
-def legal_moves(board: Board, color: int, dice: Dice) -> List[Move]:
+def legal_moves(board: Board, color: int, dice: Dice,
+                compact: bool = False) -> Union[List[Move], List[int]]:
     """Public entry point. Returns all legal Moves for (color, dice) on board.
-    Matches the semantics of domain.possible_moves.PossibleMoves.find_moves."""
-    if dice.is_pasch():
-        return _pasch_moves(board, color, dice.die1.value)
-    return _normal_moves(board, color, dice.die1.value, dice.die2.value)
+    Matches the semantics of domain.possible_moves.PossibleMoves.find_moves.
+
+    With compact=True the same moves, in the same order, are returned as
+    domain.move_code integers instead of Move objects.
+
+    When the process-wide move cache is enabled (enable_move_cache), results
+    are served from it. The dice are keyed in the order given, because the
+    order of half-moves within each Move follows it (die1's half first), and
+    play matches moves by that order."""
+    d1 = dice.die1.value
+    d2 = dice.die2.value
+    cache = _move_cache
+    if cache is None:
+        return _generate(board, color, d1, d2, compact)
+
+    key = (board.zobrist, board.board_size, board.home_size, color, d1, d2, compact)
+    entries = cache.entries
+    cached = entries.get(key)
+    if cached is not None:
+        entries.move_to_end(key)
+        cache.hits += 1
+        return list(cached)
+    cache.misses += 1
+    moves = _generate(board, color, d1, d2, compact)
+    entries[key] = tuple(moves)
+    if len(entries) > cache.capacity:
+        entries.popitem(last=False)
+    return moves
 
 
-# ---------- helpers shared by pasch and non-pasch ----------
+def _generate(board: Board, color: int, d1: int, d2: int, compact: bool) -> list:
+    if d1 == d2:
+        return _pasch_moves(board, color, d1, compact)
+    return _normal_moves(board, color, d1, d2, compact)
 
-def _all_halves(board: Board, color: int, die_value: int) -> List[HalfMove]:
-    """All structurally-possible (src, dst) pairs for one die value.
 
-    Validity (source owned, destination open, home rule) is checked separately
-    by callers — matches the old `PossibleMoves.generate_half_moves` layering.
+# ---------- result cache ----------
+
+class MoveCache:
+    """Bounded LRU of legal_moves results, keyed by (zobrist hash, board
+    geometry, color, dice in the caller's order, compact).
+
+    Positions are identified by Board.zobrist, so boards whose slot arrays
+    were written directly must be recompute()d before move generation (as
+    ai.seed_pool does). Cached results are stored as tuples and handed out
+    as fresh lists, so callers may mutate what they get back.
     """
-    bsize = board.board_size
-    if color == WHITE:
-        from_range = range(1, bsize + 2 - die_value)
-    else:
-        from_range = range(die_value, bsize + 1)
-    return [HalfMove(i, i + color * die_value) for i in from_range]
 
+    __slots__ = ("capacity", "entries", "hits", "misses")
 
-def _is_valid_half(board: Board, color: int, h: HalfMove) -> bool:
-    return (board.n[h.src] > 0
-            and board.color[h.src] == color
-            and board.is_open_for(h.dst, color))
+    def __init__(self, capacity: int) -> None:
+        if capacity <= 0:
+            raise ValueError(f"move cache capacity must be positive, got {capacity}")
+        self.capacity = capacity
+        self.entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
 
+    def clear(self) -> None:
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
 
-def _is_bear_off(board: Board, h: HalfMove) -> bool:
-    return h.dst == 0 or h.dst == board.board_size + 1
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
 
 
-def _outside_delta(board: Board, color: int, src: int, dst: int) -> int:
-    if board.is_home(color, src):
-        return 0
-    if board.is_home(color, dst) or board.is_off_board(dst):
-        return -1
-    return 0
+_move_cache: Optional[MoveCache] = None
 
 
-def _is_half_legal_with_home(board: Board, color: int, h: HalfMove,
-                             outside: int) -> bool:
-    if _is_bear_off(board, h):
-        return outside == 0
-    return True
+def enable_move_cache(capacity: int) -> MoveCache:
+    """Turn on the process-wide legal_moves cache (replacing any existing one).
+    Per-process by design: each self-play worker / play session owns its own."""
+    global _move_cache
+    _move_cache = MoveCache(capacity)
+    return _move_cache
 
 
-def _is_pair_legal_in_order(board: Board, color: int,
-                            first: HalfMove, second: HalfMove,
-                            outside: int) -> bool:
-    if not _is_half_legal_with_home(board, color, first, outside):
-        return False
-    after = outside + _outside_delta(board, color, first.src, first.dst)
-    return _is_half_legal_with_home(board, color, second, after)
+def disable_move_cache() -> None:
+    global _move_cache
+    _move_cache = None
 
 
-def _is_pair_legal(board: Board, color: int,
-                   h1: HalfMove, h2: HalfMove, outside: int) -> bool:
-    """Either order must be legal w.r.t. the bear-off home rule."""
-    if _is_pair_legal_in_order(board, color, h1, h2, outside):
-        return True
-    return _is_pair_legal_in_order(board, color, h2, h1, outside)
+def move_cache() -> Optional[MoveCache]:
+    """The active cache, or None when caching is off."""
+    return _move_cache
+
+
+def legal_afterstates(board: Board, color: int, dice: Dice) -> Dict[int, Move]:
+    """Unique positions reachable with (color, dice), keyed by the resulting
+    board's zobrist hash, with the first Move (in legal_moves order) that
+    reaches each one as its representative.
+
+    legal_moves already avoids transpositions (pasch sources are enumerated in
+    non-decreasing order, chained pairs are left to the merged-jump pass), so
+    in practice this is a one-to-one relabelling; it exists for callers that
+    want positions keyed by hash (caches, transposition-aware search) and as
+    the guard that keeps that property tested."""
+    afterstates: Dict[int, Move] = {}
+    for move in legal_moves(board, color, dice):
+        token = board.apply(move, color)
+        afterstates.setdefault(board.zobrist, move)
+        board.undo(token)
+    return afterstates
+
+
+# ---------- precomputed tables ----------
+#
+# Everything about a half-move that does not depend on the position is
+# computed once per (board_size, home_size, color, die) and shared: the
+# HalfMove object itself, whether it bears off, its effect on the mover's
+# outside-home count, and its move_code lane. The generators below only read
+# the board.
+
+# (src, dst, bears_off, outside_delta, HalfMove, half code)
+_Half = Tuple[int, int, bool, int, HalfMove, int]
+# (half, mid1, mid2, outside_delta via mid1, outside_delta via mid2)
+_Merged = Tuple[_Half, int, int, int, int]
+
+
+def _is_home(board_size: int, home_size: int, color: int, i: int) -> bool:
+    if color == WHITE:
+        return board_size - home_size + 1 <= i <= board_size
+    return 1 <= i <= home_size
+
+
+def _outside_delta(board_size: int, home_size: int, color: int, src: int, dst: int) -> int:
+    """Change of the mover's outside-home count for src -> dst (0 or -1)."""
+    if _is_home(board_size, home_size, color, src):
+        return 0
+    if (_is_home(board_size, home_size, color, dst)
+            or dst == 0 or dst == board_size + 1):
+        return -1
+    return 0
+
+
+@lru_cache(maxsize=None)
+def _half_table(board_size: int, home_size: int, color: int, die: int) -> Tuple[_Half, ...]:
+    """All structurally-possible half-moves for one die, in generation order.
+
+    Validity (source owned, destination open, home rule) is checked separately
+    by callers — matches the old `PossibleMoves.generate_half_moves` layering.
+    """
+    if color == WHITE:
+        from_range = range(1, board_size + 2 - die)
+    else:
+        from_range = range(die, board_size + 1)
+    table = []
+    for src in from_range:
+        dst = src + color * die
+        table.append((src, dst, dst == 0 or dst == board_size + 1,
+                      _outside_delta(board_size, home_size, color, src, dst),
+                      HalfMove(src, dst), half_code(src, die)))
+    return tuple(table)
+
+
+@lru_cache(maxsize=None)
+def _merged_table(board_size: int, home_size: int, color: int,
+                  d1: int, d2: int) -> Tuple[_Merged, ...]:
+    """Single-checker jumps using both dice, with their two possible midpoints."""
+    table = []
+    for half in _half_table(board_size, home_size, color, d1 + d2):
+        src = half[0]
+        mid1 = src + color * d1
+        mid2 = src + color * d2
+        table.append((half, mid1, mid2,
+                      _outside_delta(board_size, home_size, color, src, mid1),
+                      _outside_delta(board_size, home_size, color, src, mid2)))
+    return tuple(table)
+
+
+@lru_cache(maxsize=None)
+def _pasch_table(board_size: int, home_size: int, color: int, die: int) -> Tuple[_Half, ...]:
+    """_half_table in the pasch scan order: away from the mover's start point."""
+    table = _half_table(board_size, home_size, color, die)
+    return table if color == WHITE else table[::-1]
+
+
+def _valid_halves(board: Board, color: int, table: Tuple[_Half, ...]) -> List[_Half]:
+    """Halves whose source is owned by color and destination is open for it."""
+    n = board.n
+    col = board.color
+    pinned = board.pinned
+    return [h for h in table
+            if n[h[0]] > 0 and col[h[0]] == color
+            and (n[h[1]] == 0 or col[h[1]] == color or (n[h[1]] == 1 and not pinned[h[1]]))]
 
 
 # ---------- non-pasch ----------
 
-def _normal_moves(board: Board, color: int, d1: int, d2: int) -> List[Move]:
+def _normal_moves(board: Board, color: int, d1: int, d2: int, compact: bool) -> list:
+    bsize = board.board_size
+    hsize = board.home_size
     outside = board.count_outside_home(color)
-    moves: List[Move] = []
+    moves: list = []
 
-    halves1 = _all_halves(board, color, d1)
-    halves2 = _all_halves(board, color, d2)
+    valid1 = _valid_halves(board, color, _half_table(bsize, hsize, color, d1))
+    valid2 = _valid_halves(board, color, _half_table(bsize, hsize, color, d2))
 
     # Two-half pairs (skip mergeable chains; they're handled separately).
-    for h1 in halves1:
-        if not _is_valid_half(board, color, h1):
-            continue
-        for h2 in halves2:
-            if not _is_valid_half(board, color, h2):
-                continue
-            if h1.dst == h2.src or h2.dst == h1.src:
+    # Either order must be legal w.r.t. the bear-off home rule.
+    n = board.n
+    for h1 in valid1:
+        src1, dst1, off1, delta1, hm1, code1 = h1
+        for src2, dst2, off2, delta2, hm2, code2 in valid2:
+            if dst1 == src2 or dst2 == src1:
                 continue
-            if not _is_pair_legal(board, color, h1, h2, outside):
+            if not (((not off1 or outside == 0) and (not off2 or outside + delta1 == 0))
+                    or ((not off2 or outside == 0) and (not off1 or outside + delta2 == 0))):
                 continue
-            if h1.src == h2.src:
+            if src1 == src2 and n[src1] < 2:
                 # Same source — need two owning checkers there.
-                if board.n[h1.src] < 2 or board.color[h1.src] != color:
-                    continue
-            moves.append(Move((h1, h2)))
+                continue
+            moves.append(code1 | code2 << HALF_BITS if compact else Move((hm1, hm2)))
 
     # Merged single-half jumps (one checker uses both dice).
-    merged_halves = _all_halves(board, color, d1 + d2)
-    for h in merged_halves:
-        if not _is_valid_half(board, color, h):
+    col = board.color
+    pinned = board.pinned
+    for (src, dst, off, _delta, hm, code), mid1, mid2, via1, via2 in _merged_table(
+            bsize, hsize, color, d1, d2):
+        if not (n[src] > 0 and col[src] == color and board.is_open_for(dst, color)):
             continue
-        mid1 = h.src + color * d1
-        mid2 = h.src + color * d2
-        if not (board.is_open_for(mid1, color) or board.is_open_for(mid2, color)):
+        if not (n[mid1] == 0 or col[mid1] == color or (n[mid1] == 1 and not pinned[mid1])
+                or n[mid2] == 0 or col[mid2] == color or (n[mid2] == 1 and not pinned[mid2])):
             continue
-        if not _is_merged_legal_with_home(board, color, h, outside, mid1, mid2):
+        # Bear-off with outside > 0 is only legal if one of the two split paths
+        # (via mid1 or mid2) brings the last outside checker home first.
+        if off and outside != 0 and outside + via1 != 0 and outside + via2 != 0:
             continue
-        moves.append(Move((h,)))
+        moves.append(code if compact else Move((hm,)))
 
     # Rule 2: emit single-die move when playing it makes the other die unplayable.
-    _emit_rule_2(board, color, moves, halves1, d2, outside)
-    _emit_rule_2(board, color, moves, halves2, d1, outside)
+    _emit_rule_2(board, color, moves, valid1, _half_table(bsize, hsize, color, d2),
+                 outside, compact)
+    _emit_rule_2(board, color, moves, valid2, _half_table(bsize, hsize, color, d1),
+                 outside, compact)
 
     return moves
 
 
-def _is_merged_legal_with_home(board: Board, color: int, h: HalfMove,
-                               outside: int, mid1: int, mid2: int) -> bool:
-    if not _is_bear_off(board, h):
-        return True
-    if outside == 0:
-        return True
-    # Bear-off with outside > 0 is only legal if one of the two split paths
-    # (via mid1 or mid2) is itself a legal pair-order.
-    via1a = HalfMove(h.src, mid1)
-    via1b = HalfMove(mid1, h.dst)
-    if _is_pair_legal_in_order(board, color, via1a, via1b, outside):
-        return True
-    via2a = HalfMove(h.src, mid2)
-    via2b = HalfMove(mid2, h.dst)
-    return _is_pair_legal_in_order(board, color, via2a, via2b, outside)
-
-
-def _emit_rule_2(board: Board, color: int, moves: List[Move],
-                 halves: List[HalfMove], other_die: int, outside: int) -> None:
+def _emit_rule_2(board: Board, color: int, moves: list, valid: List[_Half],
+                 other_table: Tuple[_Half, ...], outside: int, compact: bool) -> None:
     """For each individually valid hm whose application leaves the other die
     with no legal half-move, emit Move((hm,))."""
-    for hm in halves:
-        if not _is_valid_half(board, color, hm):
-            continue
-        if not _is_half_legal_with_home(board, color, hm, outside):
+    n = board.n
+    col = board.color
+    pinned = board.pinned
+    for src, dst, off, _delta, hm, code in valid:
+        if off and outside != 0:
             continue
-        delta = _outside_delta(board, color, hm.src, hm.dst)
-        entry = board.apply_half(hm.src, hm.dst, color)
+        entry = board.apply_half(src, dst, color)
         try:
-            new_outside = outside + delta
-            other_halves = _all_halves(board, color, other_die)
+            new_outside = board.count_outside_home(color)
             has_legal_other = False
-            for oh in other_halves:
-                if (_is_valid_half(board, color, oh)
-                        and _is_half_legal_with_home(board, color, oh, new_outside)):
+            for osrc, odst, ooff, _d, _h, _c in other_table:
+                if (n[osrc] > 0 and col[osrc] == color
+                        and (n[odst] == 0 or col[odst] == color
+                             or (n[odst] == 1 and not pinned[odst]))
+                        and (not ooff or new_outside == 0)):
                     has_legal_other = True
                     break
             if not has_legal_other:
-                moves.append(Move((hm,)))
+                moves.append(code if compact else Move((hm,)))
         finally:
             board.undo_half(entry)
 
 
 # ---------- pasch (doubles) ----------
 
-def _pasch_moves(board: Board, color: int, die_value: int) -> List[Move]:
+def _pasch_moves(board: Board, color: int, die_value: int, compact: bool) -> list:
     """Up to 4 half-moves of the same die value. Replicates the 4-nested-loop
     in domain.possible_moves.PaschGenerator faithfully, including the
     persistent `_is_possible` flags that gate emission of shorter sequences."""
-    delta = color * die_value
-    bsize = board.board_size
+    table = _pasch_table(board.board_size, board.home_size, color, die_value)
+    count = len(table)
 
-    if color == WHITE:
-        first_start = 1
-        last_start = bsize - die_value + 2  # exclusive
-    else:
-        first_start = bsize
-        last_start = die_value - 1  # exclusive (range steps by -1)
-
-    size = bsize + 2
+    size = board.board_size + 2
     movable = [board.movable_count(i, color) for i in range(size)]
     is_open = [board.is_open_for(i, color) for i in range(size)]
     outside_count = board.count_outside_home(color)
 
-    possible_moves: List[Move] = []
+    def emit(*halves: _Half) -> None:
+        if compact:
+            code = 0
+            for k, h in enumerate(halves):
+                code |= h[5] << (k * HALF_BITS)
+            possible_moves.append(code)
+        else:
+            possible_moves.append(Move(tuple(h[4] for h in halves)))
+
+    possible_moves: list = []
     second_is_possible = False
     third_is_possible = False
     fourth_is_possible = False
 
-    for first in range(first_start, last_start, color):
-        if not _can_step(first, delta, movable, is_open, bsize, outside_count):
+    for i1 in range(count):
+        first = table[i1]
+        if not _can_step(first, movable, is_open, outside_count):
             continue
-        outside_after_first = outside_count + _outside_delta(
-            board, color, first, first + delta)
-        movable[first] -= 1
-        movable[first + delta] += 1
+        outside_after_first = outside_count + first[3]
+        movable[first[0]] -= 1
+        movable[first[1]] += 1
 
-        for second in range(first, last_start, color):
-            if not _can_step(second, delta, movable, is_open, bsize, outside_after_first):
+        for i2 in range(i1, count):
+            second = table[i2]
+            if not _can_step(second, movable, is_open, outside_after_first):
                 continue
             second_is_possible = True
-            outside_after_second = outside_after_first + _outside_delta(
-                board, color, second, second + delta)
-            movable[second] -= 1
-            movable[second + delta] += 1
+            outside_after_second = outside_after_first + second[3]
+            movable[second[0]] -= 1
+            movable[second[1]] += 1
 
-            for third in range(second, last_start, color):
-                if not _can_step(third, delta, movable, is_open, bsize, outside_after_second):
+            for i3 in range(i2, count):
+                third = table[i3]
+                if not _can_step(third, movable, is_open, outside_after_second):
                     continue
                 third_is_possible = True
-                outside_after_third = outside_after_second + _outside_delta(
-                    board, color, third, third + delta)
-                movable[third] -= 1
-                movable[third + delta] += 1
+                outside_after_third = outside_after_second + third[3]
+                movable[third[0]] -= 1
+                movable[third[1]] += 1
 
-                for fourth in range(third, last_start, color):
-                    if not _can_step(fourth, delta, movable, is_open, bsize, outside_after_third):
+                for i4 in range(i3, count):
+                    fourth = table[i4]
+                    if not _can_step(fourth, movable, is_open, outside_after_third):
                         continue
                     fourth_is_possible = True
-                    possible_moves.append(Move(tuple(
-                        HalfMove(p, p + delta)
-                        for p in (first, second, third, fourth)
-                    )))
+                    emit(first, second, third, fourth)
 
                 if not fourth_is_possible:
-                    possible_moves.append(Move(tuple(
-                        HalfMove(p, p + delta)
-                        for p in (first, second, third)
-                    )))
-                movable[third] += 1
-                movable[third + delta] -= 1
+                    emit(first, second, third)
+                movable[third[0]] += 1
+                movable[third[1]] -= 1
 
             if not third_is_possible:
-                possible_moves.append(Move(tuple(
-                    HalfMove(p, p + delta) for p in (first, second)
-                )))
-            movable[second] += 1
-            movable[second + delta] -= 1
+                emit(first, second)
+            movable[second[0]] += 1
+            movable[second[1]] -= 1
 
         if not second_is_possible:
-            possible_moves.append(Move((HalfMove(first, first + delta),)))
-        movable[first] += 1
-        movable[first + delta] -= 1
+            emit(first)
+        movable[first[0]] += 1
+        movable[first[1]] -= 1
 
     return possible_moves
 
 
-def _can_step(point_index: int, delta: int, movable, is_open,
-              bsize: int, outside_count: int) -> bool:
-    dest = point_index + delta
-    if (dest == 0 or dest == bsize + 1) and outside_count > 0:
+def _can_step(half: _Half, movable, is_open, outside_count: int) -> bool:
+    if half[2] and outside_count > 0:
         return False
-    return movable[point_index] > 0 and is_open[dest]
+    return movable[half[0]] > 0 and is_open[half[1]]
@@ -0,0 +1,220 @@
+from typing import List, Tuple, Union
+
+from domain.board import Board
+from domain.constants import WHITE, BLACK, color_name
+from domain.move import Move
+from domain.move_code import iter_halves
+from domain.summary import RACE_MASK, lane, outside_lane, summary_table
+from domain.zobrist import CODE_OFFSET, CODE_SPAN, PIN_FLAG, STACK_MASK, slot_code, zobrist_keys
+
+
+# Undo entry: (src, code_src_before, dst, code_dst_before, zobrist_before, summary_before).
+PackedUndoToken = List[Tuple[int, int, int, int, int, int]]
+
+
+class PackedBoard:
+    """Compact Plakoto state: one signed small int per slot.
+
+    Same slot layout as Board (0 = Black's bear-off, 1..board_size playable,
+    board_size+1 = White's bear-off), but each slot is a single slot code
+    (domain.zobrist): sign = owner color, low bits = owner count, PIN_FLAG set
+    iff an opponent checker is trapped underneath. Bear-off slots hold
+    color * borne-off count, so `borne_off` is derived rather than stored.
+
+    Supports the Board mutation / win-condition API (apply, undo, has_won,
+    count_outside_home) and keeps the same incrementally-maintained `zobrist`
+    hash and `summary` counters, so a PackedBoard and the Board it was packed
+    from hash identically.
+    Instances hash and compare by position; don't mutate one while it is used
+    as a dict key — use key() for a frozen snapshot.
+    """
+
+    __slots__ = (
+        "board_size", "home_size", "pieces_per_player",
+        "cells",
+        "zobrist", "_zkeys",
+        "summary", "_stable",
+    )
+
+    def __init__(self, board_size: int = 24, home_size: int = 6,
+                 pieces_per_player: int = 15) -> None:
+        if pieces_per_player > STACK_MASK:
+            raise ValueError(f"pieces_per_player={pieces_per_player} exceeds {STACK_MASK}")
+        self.board_size = board_size
+        self.home_size = home_size
+        self.pieces_per_player = pieces_per_player
+        self.cells: List[int] = [0] * (board_size + 2)
+        self._zkeys = zobrist_keys(board_size + 2)
+        self.zobrist = 0
+        self._stable = summary_table(board_size, home_size)
+        self.summary = 0
+
+    # --- conversion ---
+
+    @classmethod
+    def from_board(cls, board: Board) -> "PackedBoard":
+        p = cls(board.board_size, board.home_size, board.pieces_per_player)
+        p.cells = [slot_code(board.n[i], board.color[i], board.pinned[i])
+                   for i in range(board.board_size + 2)]
+        p.zobrist = board.zobrist
+        p.summary = board.summary
+        return p
+
+    def to_board(self) -> Board:
+        b = Board(self.board_size, self.home_size, self.pieces_per_player)
+        for i, code in enumerate(self.cells):
+            if code:
+                mag = code if code > 0 else -code
+                b.set_point(i, WHITE if code > 0 else BLACK, mag & STACK_MASK,
+                            pinned=bool(mag & PIN_FLAG))
+        b.borne_off = self.borne_off
+        return b
+
+    def clone(self) -> "PackedBoard":
+        p = PackedBoard(self.board_size, self.home_size, self.pieces_per_player)
+        p.cells = self.cells[:]
+        p.zobrist = self.zobrist
+        p.summary = self.summary
+        return p
+
+    def key(self) -> Tuple[int, ...]:
+        return tuple(self.cells)
+
+    def recompute(self) -> None:
+        """Rebuild `zobrist` / `summary` from `cells`; needed only after writing
+        cells directly."""
+        zk = self._zkeys
+        st = self._stable
+        z = 0
+        summary = 0
+        for i, code in enumerate(self.cells):
+            idx = i * CODE_SPAN + CODE_OFFSET + code
+            z ^= zk[idx]
+            summary += st[idx]
+        self.zobrist = z
+        self.summary = summary
+
+    def __eq__(self, other: object) -> bool:
+        return (isinstance(other, PackedBoard)
+                and self.home_size == other.home_size
+                and self.pieces_per_player == other.pieces_per_player
+                and self.cells == other.cells)
+
+    def __hash__(self) -> int:
+        return self.zobrist
+
+    # --- inspection ---
+
+    @property
+    def borne_off(self) -> dict:
+        return {WHITE: self.cells[self.board_size + 1], BLACK: -self.cells[0]}
+
+    def owner(self, i: int) -> int:
+        code = self.cells[i]
+        return (code > 0) - (code < 0)
+
+    def count(self, i: int) -> int:
+        code = self.cells[i]
+        return (code if code > 0 else -code) & STACK_MASK
+
+    def is_pinned(self, i: int) -> bool:
+        code = self.cells[i]
+        return bool((code if code > 0 else -code) & PIN_FLAG)
+
+    def is_home(self, c: int, i: int) -> bool:
+        if c == WHITE:
+            return self.board_size - self.home_size + 1 <= i <= self.board_size
+        return 1 <= i <= self.home_size
+
+    def count_outside_home(self, c: int) -> int:
+        """Same semantics as Board.count_outside_home: trapped checkers count
+        toward their own color, borne-off checkers don't count."""
+        return lane(self.summary, outside_lane(c))
+
+    def is_pure_race(self) -> bool:
+        return not self.summary & RACE_MASK
+
+    # --- mutation ---
+
+    def apply_half(self, src: int, dst: int, c: int) -> tuple:
+        """Apply (src -> dst) for color c. Returns an undo entry."""
+        cells = self.cells
+        s = cells[src]
+        d = cells[dst]
+        m = s * c
+        if m <= 0:
+            raise ValueError(f"illegal apply_half src={src} dst={dst} c={c}: src code {s}")
+
+        # Pop owner at src; the last owner leaving a pin frees the trapped blot.
+        if m & STACK_MASK > 1:
+            new_s = s - c
+        elif m & PIN_FLAG:
+            new_s = -c
+        else:
+            new_s = 0
+
+        # Push at dst.
+        if dst == 0 or dst == self.board_size + 1:
+            new_d = d + c
+        elif d == 0:
+            new_d = c
+        elif d * c > 0:
+            new_d = d + c
+        elif d == -c:
+            new_d = c * (1 + PIN_FLAG)
+        else:
+            raise ValueError(f"illegal apply_half src={src} dst={dst} c={c}: dst code {d}")
+
+        undo = (src, s, dst, d, self.zobrist, self.summary)
+        cells[src] = new_s
+        cells[dst] = new_d
+        base_src = src * CODE_SPAN + CODE_OFFSET
+        base_dst = dst * CODE_SPAN + CODE_OFFSET
+        zk = self._zkeys
+        self.zobrist ^= (zk[base_src + s] ^ zk[base_src + new_s]
+                         ^ zk[base_dst + d] ^ zk[base_dst + new_d])
+        st = self._stable
+        self.summary += (st[base_src + new_s] - st[base_src + s]
+                         + st[base_dst + new_d] - st[base_dst + d])
+        return undo
+
+    def undo_half(self, entry: tuple) -> None:
+        src, s, dst, d, zobrist, summary = entry
+        self.cells[src] = s
+        self.cells[dst] = d
+        self.zobrist = zobrist
+        self.summary = summary
+
+    def apply(self, move: Union[Move, int], c: int) -> PackedUndoToken:
+        """Apply a Move, or a domain.move_code integer, for color c."""
+        halves = iter_halves(move, c) if type(move) is int else move.halves
+        return [self.apply_half(src, dst, c) for src, dst in halves]
+
+    def undo(self, token: PackedUndoToken) -> None:
+        for entry in reversed(token):
+            self.undo_half(entry)
+
+    # --- win conditions ---
+
+    def has_won(self, c: int) -> bool:
+        return self.all_borne_off(c) or self.captured_starting(c)
+
+    def all_borne_off(self, c: int) -> bool:
+        slot = self.board_size + 1 if c == WHITE else 0
+        return self.cells[slot] * c >= self.pieces_per_player
+
+    def captured_starting(self, c: int) -> bool:
+        start = self.board_size if c == WHITE else 1
+        m = self.cells[start] * c
+        return m > 0 and bool(m & PIN_FLAG)
+
+    def __repr__(self) -> str:
+        lines = []
+        for i in range(self.board_size + 1, -1, -1):
+            n = self.count(i)
+            owner = color_name(self.owner(i)) if n > 0 else "."
+            label = f"{i:2d}: {owner}{n}"
+            if self.is_pinned(i):
+                label += f" (pin:{color_name(-self.owner(i))})"
+            lines.append(label)
+        return "\n".join(lines)
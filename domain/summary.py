@@ -0,0 +1,92 @@
+"""Per-position aggregate counters, maintained incrementally by the boards.
+
+Every aggregate is a sum of per-slot contributions, and a slot's contribution
+depends only on (slot, slot code). The counters are therefore kept as one
+Python int holding fixed-width lanes, and a half-move updates all of them at
+once by adding the new codes' table entries and subtracting the old ones:
+
+    summary += table[new_src] - table[old_src] + table[new_dst] - table[old_dst]
+
+All lanes are non-negative and bounded, so lane arithmetic never borrows across
+lanes once the four terms are summed.
+
+Lanes (see `lane`):
+  OUTSIDE_W / OUTSIDE_B   checkers outside their own home (trapped checkers
+                          count for their own color; borne-off ones don't)
+  PIPS_W / PIPS_B         pip count (distance to the bear-off slot)
+  PINS                    number of pinned points
+  BLOTS_W / BLOTS_B       single unpinned checkers (open to being pinned)
+"""
+
+from functools import lru_cache
+from typing import List
+
+from domain.constants import WHITE
+from domain.zobrist import CODE_OFFSET, CODE_SPAN, PIN_FLAG, STACK_MASK
+
+LANE_BITS = 16
+LANE_MASK = (1 << LANE_BITS) - 1
+
+OUTSIDE_W, OUTSIDE_B, PIPS_W, PIPS_B, PINS, BLOTS_W, BLOTS_B = range(7)
+
+# A pure race has no pins and nothing outside its owner's home.
+RACE_MASK = ((LANE_MASK << (OUTSIDE_W * LANE_BITS))
+             | (LANE_MASK << (OUTSIDE_B * LANE_BITS))
+             | (LANE_MASK << (PINS * LANE_BITS)))
+
+
+def lane(summary: int, index: int) -> int:
+    return (summary >> (index * LANE_BITS)) & LANE_MASK
+
+
+def outside_lane(c: int) -> int:
+    return OUTSIDE_W if c == WHITE else OUTSIDE_B
+
+
+def pips_lane(c: int) -> int:
+    return PIPS_W if c == WHITE else PIPS_B
+
+
+def blots_lane(c: int) -> int:
+    return BLOTS_W if c == WHITE else BLOTS_B
+
+
+@lru_cache(maxsize=None)
+def summary_table(board_size: int, home_size: int) -> List[int]:
+    """Contribution of code `k` at slot `i`, at `i * CODE_SPAN + CODE_OFFSET + k`
+    (the zobrist key layout). Bear-off slots contribute nothing."""
+    if STACK_MASK * board_size > LANE_MASK:
+        raise ValueError(f"board_size={board_size} overflows a {LANE_BITS}-bit pip lane")
+
+    def is_home(c: int, i: int) -> bool:
+        if c == WHITE:
+            return board_size - home_size + 1 <= i <= board_size
+        return 1 <= i <= home_size
+
+    def dist(c: int, i: int) -> int:
+        return board_size + 1 - i if c == WHITE else i
+
+    def add(total: int, index: int, amount: int) -> int:
+        return total + (amount << (index * LANE_BITS))
+
+    table = [0] * ((board_size + 2) * CODE_SPAN)
+    for i in range(1, board_size + 1):
+        base = i * CODE_SPAN + CODE_OFFSET
+        for k in range(-STACK_MASK - PIN_FLAG, STACK_MASK + PIN_FLAG + 1):
+            mag = k if k > 0 else -k
+            n = mag & STACK_MASK
+            if n == 0:
+                continue
+            c = 1 if k > 0 else -1
+            total = add(0, pips_lane(c), n * dist(c, i))
+            if not is_home(c, i):
+                total = add(total, outside_lane(c), n)
+            if mag & PIN_FLAG:
+                total = add(total, PINS, 1)
+                total = add(total, pips_lane(-c), dist(-c, i))
+                if not is_home(-c, i):
+                    total = add(total, outside_lane(-c), 1)
+            elif n == 1:
+                total = add(total, blots_lane(c), 1)
+            table[base + k] = total
+    return table
@@ -0,0 +1,48 @@
+"""Zobrist keys and the per-slot integer code they are indexed by.
+
+A slot's full state (owner color, owner count, pinned flag) packs into one
+signed small int, the *slot code*:
+
+    code = color * (n + PIN_FLAG * pinned)      0 for an empty slot
+
+The sign is the owner's color, the low bits the owner count and PIN_FLAG marks
+a trapped opponent checker underneath. The same code is the per-slot storage of
+`domain.packed_board.PackedBoard`, so both board representations hash
+identically.
+
+A position's Zobrist hash is the XOR of one 64-bit key per (slot, code). The
+key for an empty slot is 0, so the empty board hashes to 0 and updating a slot
+is two XORs (old code out, new code in).
+"""
+
+import random
+from functools import lru_cache
+from typing import List
+
+PIN_FLAG = 64
+STACK_MASK = PIN_FLAG - 1          # owner count lives in the low bits
+CODE_OFFSET = 2 * PIN_FLAG         # shifts the signed code into a table index
+CODE_SPAN = 2 * CODE_OFFSET        # table entries per slot
+
+_SEED = 0x7A5B_1D0C
+
+
+def slot_code(n: int, color: int, pinned: bool) -> int:
+    if n == 0:
+        return 0
+    return color * (n + PIN_FLAG * pinned)
+
+
+@lru_cache(maxsize=None)
+def zobrist_keys(num_slots: int) -> List[int]:
+    """Flat key table: the key of code `k` at slot `i` is at
+    `i * CODE_SPAN + CODE_OFFSET + k`. Deterministic across processes so hashes
+    can be compared between self-play workers and the trainer."""
+    rng = random.Random(_SEED)
+    keys = [0] * (num_slots * CODE_SPAN)
+    for i in range(num_slots):
+        base = i * CODE_SPAN + CODE_OFFSET
+        for k in range(-STACK_MASK - PIN_FLAG, STACK_MASK + PIN_FLAG + 1):
+            if k != 0:
+                keys[base + k] = rng.getrandbits(64)
+    return keys
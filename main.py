@@ -10,13 +10,13 @@ import numpy as np
 import torch
 
 from ai.board_evaluator import BoardEvaluator
-from ai.board_encoder import BoardEncoder
+from ai.board_encoder import BoardEncoder, EncodingCache
 from ai.checkpoint_io import load_agent_from_checkpoint, load_state_dict, ENCODER_VERSION_CURRENT
 from config.config_loader import ConfigLoader
 from ai.td_lambda_training import TdLambdaTraining
 from domain.move_generation import legal_moves
 from game.game import Game
-from ai.agent import RandomAgent
+from ai.agent import EvalCache, RandomAgent
 from domain.constants import WHITE, BLACK
 
 
@@ -285,7 +285,8 @@ def train_ai(config, num_epochs_override=None):
     device = torch.device("cpu")
     board_encoder = BoardEncoder(config, version=ENCODER_VERSION_CURRENT)
     board_evaluator = BoardEvaluator(board_encoder.input_size, hidden_sizes=config.get_hidden_sizes(),
-                                     aux_heads=config.get_aux_heads()).to(device)
+                                     aux_heads=config.get_aux_heads(),
+                                     fixed_features=board_encoder.fixed_features()).to(device)
 
     model_save_path = config.get_model_save_path()
     if os.path.exists(model_save_path):
@@ -542,17 +543,40 @@ def _prompt_dice_mode():
 
 
 def play_against_ai(config, model_load_path="trained_model.pth", load_name=None):
-    from play import loop, persistence
-    from play.session import PlaySession
-
     device = torch.device("cpu")
+    search_pools = []
 
     def agent_loader(path: str):
         if not os.path.exists(path):
             raise FileNotFoundError(path)
-        agent, _ = load_agent_from_checkpoint(path, config, device=device)
+        agent, _ = load_agent_from_checkpoint(path, config, device=device,
+                                              inference=config.get_play_inference_backend())
+        if config.get_play_encoding_cache_size() > 0:
+            agent.encoding_cache = EncodingCache(agent.board_encoder,
+                                                 config.get_play_encoding_cache_size())
+        if config.get_play_search_workers() > 0:
+            from ai.parallel_search import SearchPool
+            pool = SearchPool(path, config.config_file, config.get_play_search_workers(),
+                              cache_slots=max(1, config.get_play_eval_cache_size()),
+                              inference=config.get_play_inference_backend())
+            pool.attach(agent)
+            search_pools.append(pool)
+        elif config.get_play_eval_cache_size() > 0:
+            agent.eval_cache = EvalCache(config.get_play_eval_cache_size())
         return agent
 
+    try:
+        _play_session(config, model_load_path, load_name, agent_loader)
+    finally:
+        for pool in search_pools:
+            pool.close()
+
+
+def _play_session(config, model_load_path, load_name, agent_loader):
+    from domain.move_generation import enable_move_cache
+    from play import loop, persistence
+    from play.session import PlaySession
+
     if load_name is not None:
         save_path = persistence.resolve_path(load_name)
         if not save_path.exists():
@@ -596,6 +620,9 @@ def play_against_ai(config, model_load_path="trained_model.pth", load_name=None)
             eval_depth=eval_depth,
         )
 
+    if config.get_play_move_cache_size() > 0:
+        enable_move_cache(config.get_play_move_cache_size())
+
     _print_human_record()
     final_session = loop.run(session, loop.StdIO(), agent_loader=agent_loader)
 
@@ -889,6 +916,7 @@ def main():
     elif mode in ('eval-lookahead',):
         total_games = 1000
         num_workers = None
+        search_workers = 0
         args = sys.argv[2:]
         i = 0
         while i < len(args):
@@ -903,6 +931,16 @@ def main():
                     return
                 i += 2
                 continue
+            if arg == "--search-workers" and i + 1 < len(args):
+                try:
+                    search_workers = int(args[i + 1])
+                    if search_workers < 0:
+                        raise ValueError
+                except ValueError:
+                    print("Invalid --search-workers. Please provide a non-negative integer.")
+                    return
+                i += 2
+                continue
             if not arg.startswith("--"):
                 try:
                     total_games = int(arg)
@@ -921,6 +959,7 @@ def main():
         evaluate_lookahead_selfplay(
             config, config.get_gold_model_path(),
             games_per_color=games_per_color, num_workers=num_workers,
+            search_workers=search_workers,
         )
     elif mode == 'rollout-lab':
         opts = {
@@ -1097,6 +1136,35 @@ def main():
             print(f"Unknown race-calibration argument: {arg}")
             return
         race_calibration(config, model_load_path=model_path, num_states=num_states)
+    elif mode == 'quantize-report':
+        from ai.quantization import INT8_DYNAMIC, QUANTIZATION_MODES, run_quantization_report
+        opts = {"--games": 10, "--pairs": 200, "--lookahead": 1}
+        model_path = config.get_gold_model_path()
+        quant_mode = INT8_DYNAMIC
+        args = sys.argv[2:]
+        i = 0
+        while i < len(args):
+            arg = args[i]
+            if arg == "--model" and i + 1 < len(args):
+                model_path = args[i + 1]
+                i += 2
+                continue
+            if arg == "--mode" and i + 1 < len(args) and args[i + 1] in QUANTIZATION_MODES:
+                quant_mode = args[i + 1]
+                i += 2
+                continue
+            if arg in opts and i + 1 < len(args):
+                try:
+                    opts[arg] = int(args[i + 1])
+                except ValueError:
+                    print(f"Invalid value for {arg}: {args[i + 1]}")
+                    return
+                i += 2
+                continue
+            print(f"Unknown quantize-report argument: {arg}")
+            return
+        run_quantization_report(config, model_path, mode=quant_mode, held_out_games=opts["--games"],
+                                pairs=opts["--pairs"], lookahead=opts["--lookahead"])
     elif mode in ('human-stats',):
         analyze_human_games()
     elif mode in ('human-graph',):
@@ -211,6 +211,7 @@ def _ai_turn(session: PlaySession, io: IO) -> None:
         relative_cutoff=session.config.get_search_relative_cutoff(),
         max_branch=session.config.get_search_max_branch(),
         max_depth=session.config.get_search_max_depth(),
+        chance_pruning=session.config.get_search_chance_pruning(),
     )
     io.output(renderer.format_ai_played(session, move, score))
     session.commit_move(move)
@@ -226,7 +227,7 @@ def _post_game(session: PlaySession, io: IO) -> Action:
     if session.log_path is None:
         session.log_path = persistence.log_game(session)
     while True:
-        line = io.input("[u/undo, h/history, review [N], drill [N], save <n>, q] > ")
+        line = io.input("[u/undo, h/history, review [N] [rollout], drill [N], save <n>, q] > ")
         cmd = parser.parse_command(line)
         if isinstance(cmd, parser.Undo):
             popped = session.undo_to_my_decision(cmd.n)
@@ -236,7 +237,7 @@ def _post_game(session: PlaySession, io: IO) -> Action:
             io.output(renderer.format_history(session))
             continue
         if isinstance(cmd, parser.Review):
-            _handle_review(session, io, cmd.threshold)
+            _handle_review(session, io, cmd.threshold, cmd.rollout)
             continue
         if isinstance(cmd, parser.Drill):
             _handle_drill(session, io, cmd.threshold)
@@ -249,9 +250,9 @@ def _post_game(session: PlaySession, io: IO) -> Action:
                 return Action("quit")
             continue
         if isinstance(cmd, parser.Help):
-            io.output("post-game: u/undo [N], h/history, review [N], drill [N], save <name>, q/quit")
+            io.output("post-game: u/undo [N], h/history, review [N] [rollout], drill [N], save <name>, q/quit")
             continue
-        io.output("post-game accepts: u/undo, h/history, review [N], drill [N], save <n>, q/quit")
+        io.output("post-game accepts: u/undo, h/history, review [N] [rollout], drill [N], save <n>, q/quit")
 
 
 # ---- command helpers ------------------------------------------------------
@@ -322,6 +323,7 @@ def _collect_blunders(session: PlaySession, threshold: float) -> list:
                     "best_score": best_score,
                     "gap": best_score - played_score,
                     "player_is_white": replay.current_player() == WHITE,
+                    "board": replay.game.board.clone(),
                 })
 
         replay.commit_move(snap.move_played)
@@ -441,6 +443,7 @@ def _blunders_from_cache(session: PlaySession, analysis: list) -> list:
                 "played_score": float(entry["playedScore"]),
                 "best_move": _move_from_pairs(entry["bestMove"]),
                 "best_score": float(entry["bestScore"]),
+                "board": replay.game.board.clone(),
             })
         replay.set_dice(*snap.dice_for_this_ply)
         if snap.was_pass:
@@ -450,7 +453,28 @@ def _blunders_from_cache(session: PlaySession, analysis: list) -> list:
     return out
 
 
-def _handle_review(session: PlaySession, io: IO, threshold: float) -> None:
+def _rollout_check(session: PlaySession, b: dict) -> str:
+    """Roll out a blunder's played move against the best (and the top-ranked
+    moves, when the ranking is at hand) and render the result."""
+    from ai.rollout_analysis import analyze_moves
+
+    config = session.config
+    top = config.get_play_review_rollout_candidates()
+    candidates = [move for move, _ in b.get("ranked", [])[:top]]
+    for move in (b["best_move"], b["played_move"]):
+        if move not in candidates:
+            candidates.append(move)
+    results = analyze_moves(
+        session.agent, b["board"], session.human_color, candidates,
+        max_trials=config.get_play_review_rollout_trials(),
+        time_budget_s=config.get_play_review_rollout_time_budget_s(),
+        luck_plies=config.get_play_review_rollout_luck_plies(),
+        pool=getattr(session.agent, "search_pool", None),
+    )
+    return renderer.format_rollout_block(results, b["played_move"])
+
+
+def _handle_review(session: PlaySession, io: IO, threshold: float, rollout: bool = False) -> None:
     if len(session.history) <= 1:
         io.output("no plies to review")
         return
@@ -469,6 +493,8 @@ def _handle_review(session: PlaySession, io: IO, threshold: float) -> None:
                 b["played_move"], b["played_score"],
                 b["best_move"], b["best_score"],
             ))
+            if rollout:
+                io.output(_rollout_check(session, b))
         if not blunders:
             io.output(f"No blunders found above {threshold*100:.0f}% threshold — well played!")
         else:
@@ -484,6 +510,8 @@ def _handle_review(session: PlaySession, io: IO, threshold: float) -> None:
             b["played_move"], b["played_score"],
             b["best_move"], b["best_score"],
         ))
+        if rollout:
+            io.output(_rollout_check(session, b))
 
     if not blunders:
         io.output(f"No blunders found above {threshold*100:.0f}% threshold — well played!")
@@ -41,6 +41,7 @@ class Help:
 @dataclass(frozen=True)
 class Review:
     threshold: float  # fraction, e.g. 0.10 for 10%
+    rollout: bool = False  # re-check each blunder with Monte-Carlo rollouts
 
 
 @dataclass(frozen=True)
@@ -63,7 +64,7 @@ Command = Union[PlayMove, Undo, History, Eval, Save, Load, Review, Drill, Help,
 
 _UNDO_RE = re.compile(r"^(?:undo|u)\s*(\d+)?$")
 _EVAL_RE = re.compile(r"^(?:eval|e)(?:\s*(\S+))?$")
-_REVIEW_RE = re.compile(r"^review(?:\s+(\d+))?$")
+_REVIEW_RE = re.compile(r"^review(?:\s+(\d+))?(\s+rollout)?$")
 _DRILL_RE = re.compile(r"^drill(?:\s+(\d+))?$")
 
 
@@ -112,7 +113,7 @@ def parse_command(line: str) -> Command:
         pct = int(m.group(1)) if m.group(1) is not None else 10
         if pct < 1:
             return Unparseable(f"review threshold must be >= 1%, got {pct}")
-        return Review(threshold=pct / 100)
+        return Review(threshold=pct / 100, rollout=m.group(2) is not None)
 
     m = _DRILL_RE.match(lower)
     if m:
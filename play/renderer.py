@@ -154,3 +154,14 @@ def format_blunder_block(
         f"  Played: {played_move}  ({played_score*100:.1f}%)",
         f"  Best:   {best_move}  ({best_score*100:.1f}%)",
     ])
+
+
+def format_rollout_block(results, played_move) -> str:
+    """Rollout estimates (ai.rollout_analysis.MoveRollout), best first, with a
+    95% interval; moves dropped early by the race are marked."""
+    lines = ["  Rollouts:"]
+    for r in results:
+        note = f"{r.trials} trials" + (", dropped" if r.rejected else "")
+        marker = "  <- played" if r.move == played_move else ""
+        lines.append(f"    {r.mean*100:5.1f}% ±{1.96*r.stderr*100:4.1f}  {r.move}  ({note}){marker}")
+    return "\n".join(lines)
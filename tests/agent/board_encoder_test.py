@@ -1,9 +1,16 @@
+import random
 import unittest
 import numpy as np
 from domain.board import Board
 from domain.constants import WHITE, BLACK
+from domain.dice import Dice
+from domain.move_generation import legal_moves
+from domain.batch_move_generation import batch_afterstates, stack_cells
+from domain.packed_board import PackedBoard
 from config.config_loader import ConfigLoader
-from ai.board_encoder import BoardEncoder, LEGACY_V1, UNARY_V2, UNARY_V3
+from ai.board_encoder import (
+    BoardEncoder, EncodingCache, LEGACY_V1, UNARY_V2, UNARY_V3,
+)
 
 CONFIG_PATH = "config-test.yml"
 
@@ -71,5 +78,174 @@ class TestBoardEncoder(unittest.TestCase):
         np.testing.assert_array_equal(encoded, np.zeros(encoder.input_size, dtype=np.float32))
 
 
+def _game_positions(config, seed, games=2):
+    """Positions along a few random games, with a random perspective each."""
+    rng = random.Random(seed)
+    dice = Dice(6)
+    boards, persp = [], []
+    for _ in range(games):
+        board = Board.initial(config)
+        color = WHITE
+        while not (board.has_won(WHITE) or board.has_won(BLACK)):
+            boards.append(board.clone())
+            persp.append(rng.random() < 0.5)
+            dice.set(rng.randint(1, 6), rng.randint(1, 6))
+            moves = legal_moves(board, color, dice)
+            if moves:
+                board.apply(rng.choice(moves), color)
+            color = -color
+    return boards, persp
+
+
+class TestEncodeBoards(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.config = ConfigLoader(CONFIG_PATH)
+        cls.boards, cls.persp = _game_positions(cls.config, seed=11)
+
+    def _assert_bit_exact(self, version):
+        encoder = BoardEncoder(self.config, version=version)
+        expected = np.stack([encoder.encode_board(b, p) for b, p in zip(self.boards, self.persp)])
+        got = encoder.encode_boards(self.boards, self.persp)
+        self.assertEqual(got.dtype, np.float32)
+        np.testing.assert_array_equal(got.view(np.uint32), expected.view(np.uint32))
+
+    def test_matches_scalar_legacy_v1(self):
+        self._assert_bit_exact(LEGACY_V1)
+
+    def test_matches_scalar_unary_v2(self):
+        self._assert_bit_exact(UNARY_V2)
+
+    def test_matches_scalar_unary_v3(self):
+        self._assert_bit_exact(UNARY_V3)
+
+    def test_packed_boards_and_single_flag(self):
+        encoder = BoardEncoder(self.config, version=UNARY_V3)
+        packed = [PackedBoard.from_board(b) for b in self.boards]
+        for flag in (True, False):
+            expected = np.stack([encoder.encode_board(b, flag) for b in self.boards])
+            np.testing.assert_array_equal(encoder.encode_boards(packed, flag), expected)
+
+    def test_writes_into_out_buffer(self):
+        encoder = BoardEncoder(self.config, version=UNARY_V3)
+        out = np.full((len(self.boards), encoder.input_size), 7.0, dtype=np.float32)
+        result = encoder.encode_boards(self.boards, self.persp, out=out)
+        self.assertIs(result, out)
+        np.testing.assert_array_equal(out, encoder.encode_boards(self.boards, self.persp))
+        with self.assertRaises(ValueError):
+            encoder.encode_boards(self.boards, self.persp, out=out[:, :-1])
+
+    def test_empty_batch(self):
+        encoder = BoardEncoder(self.config, version=LEGACY_V1)
+        self.assertEqual(encoder.encode_boards([], True).shape, (0, encoder.input_size))
+
+    def test_sparse_matches_dense(self):
+        for version in (LEGACY_V1, UNARY_V2, UNARY_V3):
+            encoder = BoardEncoder(self.config, version=version)
+            dense = encoder.encode_boards(self.boards, self.persp)
+            indices, offsets, extra = encoder.encode_sparse(self.boards, self.persp)
+            raw = dense[:, :encoder.input_size - extra.shape[1]]
+            ends = list(offsets[1:]) + [len(indices)]
+            for row, start, end in zip(raw, offsets, ends):
+                np.testing.assert_array_equal(indices[start:end], np.flatnonzero(row))
+            np.testing.assert_array_equal(extra, dense[:, raw.shape[1]:])
+
+
+class TestEncodeAfterstates(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.config = ConfigLoader(CONFIG_PATH)
+        boards, _ = _game_positions(cls.config, seed=23, games=1)
+        cls.parents = stack_cells(boards[::4])
+
+    def _assert_matches_encode_boards(self, version):
+        encoder = BoardEncoder(self.config, version=version)
+        for color, d1, d2 in ((WHITE, 6, 3), (BLACK, 2, 2)):
+            replies = batch_afterstates(self.parents, color, d1, d2, self.config.get_home_size())
+            # Parent rows themselves (a pass) have nothing to patch.
+            cells = np.concatenate([replies.cells, self.parents[:3]])
+            index = np.concatenate([replies.board_index, np.arange(3)])
+            for persp in (True, False):
+                expected = encoder.encode_boards(cells, persp)
+                got = encoder.encode_afterstates(self.parents, index, cells, persp)
+                np.testing.assert_array_equal(got.view(np.uint32), expected.view(np.uint32))
+
+    def test_matches_encode_boards_legacy_v1(self):
+        self._assert_matches_encode_boards(LEGACY_V1)
+
+    def test_matches_encode_boards_unary_v2(self):
+        self._assert_matches_encode_boards(UNARY_V2)
+
+    def test_matches_encode_boards_unary_v3(self):
+        self._assert_matches_encode_boards(UNARY_V3)
+
+    def test_writes_into_out_buffer_and_handles_empty(self):
+        encoder = BoardEncoder(self.config, version=UNARY_V3)
+        index = np.array([2, 0, 2])
+        out = np.full((3, encoder.input_size), 7.0, dtype=np.float32)
+        result = encoder.encode_afterstates(self.parents, index, self.parents[index], True, out=out)
+        self.assertIs(result, out)
+        np.testing.assert_array_equal(out, encoder.encode_boards(self.parents[index], True))
+        empty = encoder.encode_afterstates(self.parents, index[:0], self.parents[:0], False)
+        self.assertEqual(empty.shape, (0, encoder.input_size))
+
+
+class TestEncodingCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.config = ConfigLoader(CONFIG_PATH)
+        cls.boards, cls.persp = _game_positions(cls.config, seed=5)
+        cls.encoder = BoardEncoder(cls.config, version=UNARY_V3)
+
+    def test_rows_match_encoder_and_are_read_only(self):
+        cache = EncodingCache(self.encoder, capacity=1000)
+        board, persp = self.boards[7], self.persp[7]
+        first = cache.encode_board(board, persp)
+        again = cache.encode_board(board.clone(), persp)
+        self.assertIs(again, first)
+        np.testing.assert_array_equal(first, self.encoder.encode_board(board, persp))
+        self.assertFalse(first.flags.writeable)
+        with self.assertRaises(ValueError):
+            first[0] = 1.0
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_batch_with_partial_hits(self):
+        cache = EncodingCache(self.encoder, capacity=1000)
+        cache.encode_boards(self.boards[::2], self.persp[::2])
+        got = cache.encode_boards(self.boards, self.persp)
+        self.assertTrue(got.flags.writeable)
+        np.testing.assert_array_equal(got, self.encoder.encode_boards(self.boards, self.persp))
+        keys = [(b.zobrist, p) for b, p in zip(self.boards, self.persp)]
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], sum(key in set(keys[::2]) for key in keys))
+        self.assertEqual(stats["size"], len(set(keys)))
+
+    def test_perspective_is_part_of_the_key(self):
+        cache = EncodingCache(self.encoder, capacity=10)
+        board = self.boards[12]
+        white = cache.encode_board(board, True)
+        black = cache.encode_board(board, False)
+        self.assertEqual(cache.misses, 2)
+        np.testing.assert_array_equal(black, self.encoder.encode_board(board, False))
+        self.assertFalse(np.array_equal(white, black))
+
+    def test_evicts_least_recently_used(self):
+        cache = EncodingCache(self.encoder, capacity=2)
+        a, b, c = self.boards[3], self.boards[9], self.boards[15]
+        row_a = cache.encode_board(a, True)
+        cache.encode_board(b, True)
+        cache.encode_board(a, True)
+        cache.encode_board(c, True)
+        self.assertEqual(cache.stats()["size"], 2)
+        self.assertIn((a.zobrist, True), cache.entries)
+        self.assertNotIn((b.zobrist, True), cache.entries)
+        # Evicted or not, a row handed out earlier keeps its contents.
+        np.testing.assert_array_equal(row_a, self.encoder.encode_board(a, True))
+
+    def test_rejects_non_positive_capacity(self):
+        with self.assertRaises(ValueError):
+            EncodingCache(self.encoder, capacity=0)
+
+
 if __name__ == "__main__":
     unittest.main()
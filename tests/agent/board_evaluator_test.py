@@ -53,5 +53,63 @@ class TestBoardEvaluator(unittest.TestCase):
             self.assertTrue(torch.any(param != 0), "Weights should not be initialized to zero")
 
 
+class TestForwardSparse(unittest.TestCase):
+    def setUp(self):
+        from domain.board import Board
+        from domain.constants import WHITE
+        from domain.dice import Dice
+        from domain.move_generation import legal_moves
+        self.config = ConfigLoader(str(Path(__file__).resolve().parents[2] / "config-test.yml"))
+        board = Board.initial(self.config)
+        dice = Dice(6)
+        dice.set(6, 4)
+        self.boards = []
+        for move in legal_moves(board, WHITE, dice):
+            token = board.apply(move, WHITE)
+            self.boards.append(board.clone())
+            board.undo(token)
+        self.persp = [i % 2 == 0 for i in range(len(self.boards))]
+
+    def _assert_matches_dense(self, version):
+        from ai.board_encoder import BoardEncoder
+        torch.manual_seed(0)
+        encoder = BoardEncoder(self.config, version=version)
+        model = BoardEvaluator(encoder.input_size, hidden_sizes=[32, 16]).eval()
+        dense = torch.from_numpy(encoder.encode_boards(self.boards, self.persp))
+        indices, offsets, extra = encoder.encode_sparse(self.boards, self.persp)
+        with torch.no_grad():
+            expected = model(dense)
+            got = model.forward_sparse(torch.from_numpy(indices), torch.from_numpy(offsets),
+                                       torch.from_numpy(extra))
+        torch.testing.assert_close(got, expected, rtol=0, atol=1e-6)
+
+    def test_matches_dense_forward_all_versions(self):
+        for version in ("legacy_unary_v1", "unary_v2", "unary_v3"):
+            with self.subTest(version=version):
+                self._assert_matches_dense(version)
+
+    def test_cached_weight_follows_updates(self):
+        from ai.board_encoder import BoardEncoder
+        encoder = BoardEncoder(self.config, version="unary_v3")
+        model = BoardEvaluator(encoder.input_size, hidden_sizes=[32, 16]).eval()
+        sparse = [torch.from_numpy(a) for a in encoder.encode_sparse(self.boards, True)]
+        dense = torch.from_numpy(encoder.encode_boards(self.boards, True))
+        with torch.no_grad():
+            model.forward_sparse(*sparse)
+            model.layers[0].weight.mul_(0.5)
+            torch.testing.assert_close(model.forward_sparse(*sparse), model(dense), rtol=0, atol=1e-6)
+            other = BoardEvaluator(encoder.input_size, hidden_sizes=[32, 16])
+            model.load_state_dict(other.state_dict())
+            torch.testing.assert_close(model.forward_sparse(*sparse), model(dense), rtol=0, atol=1e-6)
+
+    def test_gradients_reach_first_layer(self):
+        from ai.board_encoder import BoardEncoder
+        encoder = BoardEncoder(self.config, version="unary_v3")
+        model = BoardEvaluator(encoder.input_size, hidden_sizes=[32, 16])
+        sparse = [torch.from_numpy(a) for a in encoder.encode_sparse(self.boards, True)]
+        model.forward_sparse(*sparse).sum().backward()
+        self.assertTrue(torch.any(model.layers[0].weight.grad != 0))
+
+
 if __name__ == '__main__':
     unittest.main()
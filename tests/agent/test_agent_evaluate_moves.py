@@ -1,9 +1,11 @@
 import unittest
+from unittest import mock
+import numpy as np
 import torch
 from pathlib import Path
 
-from ai.agent import Agent
-from ai.board_encoder import BoardEncoder
+from ai.agent import Agent, EvalCache, InferenceBuffers
+from ai.board_encoder import BoardEncoder, EncodingCache
 from config.config_loader import ConfigLoader
 from domain.board import Board
 from domain.constants import WHITE, BLACK
@@ -193,6 +195,195 @@ class Test2PlyMatchesNPlyDepth2(unittest.TestCase):
         board.set_point(3, BLACK, 1)
         self._assert_paths_agree(board, WHITE, 2, 5)
 
+    def test_repeated_afterstates_and_replies_share_leaves(self):
+        board = Board.from_config(self.config)
+        board_size = self.config.get_board_size()
+        board.set_point(board_size + 1, WHITE, 13)
+        board.borne_off[WHITE] = 13
+        board.set_point(20, WHITE, 1)
+        board.set_point(23, WHITE, 1)
+        board.set_point(0, BLACK, 14)
+        board.borne_off[BLACK] = 14
+        board.set_point(3, BLACK, 1)
+        dice = Dice(self.config.get_die_sides())
+        dice.set(2, 5)
+        moves = legal_moves(board, WHITE, dice)
+
+        rows = []
+        evaluate_inputs = self.agent._evaluate_inputs
+        with mock.patch.object(self.agent, "_evaluate_inputs",
+                               side_effect=lambda n: rows.append(n) or evaluate_inputs(n)):
+            scores = self.agent._evaluate_moves_2ply_batch(board, moves, WHITE)
+            repeated = self.agent._evaluate_moves_2ply_batch(board, moves + moves[::-1], WHITE)
+        self.assertEqual(repeated, scores + scores[::-1])
+        self.assertEqual(rows[0], rows[1])
+
+
+class TestEncodingCacheAgent(unittest.TestCase):
+    def test_cached_search_matches_uncached(self):
+        config_path = Path(__file__).resolve().parents[2] / "config-test.yml"
+        config = ConfigLoader(str(config_path))
+        encoder = BoardEncoder(config)
+        evaluator = PositionDependentEvaluator(encoder.input_size)
+        cache = EncodingCache(encoder, capacity=100000)
+        plain = Agent(evaluator, encoder)
+        cached = Agent(evaluator, encoder, encoding_cache=cache)
+        board = Board.from_config(config)
+        board.set_point(5, WHITE, 2)
+        board.set_point(10, WHITE, 1)
+        board.set_point(15, WHITE, 1)
+        board.set_point(8, BLACK, 1)
+        board.set_point(12, BLACK, 1)
+        board.set_point(20, BLACK, 2)
+        dice = Dice(config.get_die_sides())
+        dice.set(2, 4)
+        moves = legal_moves(board, WHITE, dice)
+
+        expected = plain._evaluate_moves_nply(board, moves, WHITE, depth=2, beam_threshold=10.0)
+        for _ in range(2):
+            self.assertEqual(
+                cached._evaluate_moves_nply(board, moves, WHITE, depth=2, beam_threshold=10.0),
+                expected)
+        stats = cache.stats()
+        self.assertGreaterEqual(stats["hits"], stats["misses"])
+        self.assertEqual(cached.position_value_lookahead(board, BLACK),
+                         plain.position_value_lookahead(board, BLACK))
+
+
+class TestEvalCache(unittest.TestCase):
+    def setUp(self):
+        config_path = Path(__file__).resolve().parents[2] / "config-test.yml"
+        self.config = ConfigLoader(str(config_path))
+        self.encoder = BoardEncoder(self.config)
+        self.evaluator = PositionDependentEvaluator(self.encoder.input_size)
+        self.board = Board.from_config(self.config)
+        self.board.set_point(5, WHITE, 2)
+        self.board.set_point(10, WHITE, 1)
+        self.board.set_point(15, WHITE, 1)
+        self.board.set_point(8, BLACK, 1)
+        self.board.set_point(12, BLACK, 1)
+        self.board.set_point(20, BLACK, 2)
+        dice = Dice(self.config.get_die_sides())
+        dice.set(2, 4)
+        self.moves = legal_moves(self.board, WHITE, dice)
+
+    def _searches(self, agent):
+        return [
+            agent._evaluate_moves_batch(self.board, self.moves, WHITE),
+            agent._evaluate_moves_2ply_batch(self.board, self.moves, WHITE),
+            agent._evaluate_moves_nply(self.board, self.moves, WHITE, depth=2, beam_threshold=10.0),
+            [agent.position_value_lookahead(self.board, BLACK)],
+        ]
+
+    def _assert_scores_close(self, got, expected):
+        for got_scores, expected_scores in zip(got, expected):
+            self.assertEqual(len(got_scores), len(expected_scores))
+            for g, e in zip(got_scores, expected_scores):
+                self.assertAlmostEqual(g, e, places=6)
+
+    def test_cached_scores_match_uncached_at_every_depth(self):
+        expected = self._searches(Agent(self.evaluator, self.encoder))
+        cache = EvalCache(100000)
+        agent = Agent(self.evaluator, self.encoder, eval_cache=cache)
+        self._assert_scores_close(self._searches(agent), expected)
+        misses = cache.misses
+        self._assert_scores_close(self._searches(agent), expected)
+        self.assertEqual(cache.misses, misses)  # second pass is served from the cache
+        self.assertGreater(cache.hits, 0)
+
+    def test_weight_change_invalidates(self):
+        cache = EvalCache(100000)
+        agent = Agent(self.evaluator, self.encoder, eval_cache=cache)
+        before = agent._evaluate_moves_2ply_batch(self.board, self.moves, WHITE)
+        with torch.no_grad():
+            self.evaluator.w.mul_(-1.0)
+        after = agent._evaluate_moves_2ply_batch(self.board, self.moves, WHITE)
+        self.assertEqual(cache.invalidations, 1)
+        self.assertNotEqual(before, after)
+        fresh = Agent(self.evaluator, self.encoder)._evaluate_moves_2ply_batch(self.board, self.moves, WHITE)
+        self._assert_scores_close([after], [fresh])
+
+    def test_load_state_dict_invalidates(self):
+        cache = EvalCache(100000)
+        agent = Agent(self.evaluator, self.encoder, eval_cache=cache)
+        agent._evaluate_moves_batch(self.board, self.moves, WHITE)
+        self.evaluator.load_state_dict(self.evaluator.state_dict())
+        agent._evaluate_moves_batch(self.board, self.moves, WHITE)
+        self.assertEqual(cache.invalidations, 1)
+        self.assertEqual(cache.hits, 0)
+
+    def test_backend_switch_clears_cache(self):
+        cache = EvalCache(100000)
+        agent = Agent(self.evaluator, self.encoder, eval_cache=cache)
+        agent._evaluate_moves_batch(self.board, self.moves, WHITE)
+        self.assertGreater(cache.stats()["size"], 0)
+
+        def constant_backend(x, out):
+            out.fill(0.25)
+        agent.set_inference("constant", backend=constant_backend)
+        self.assertEqual(cache.stats()["size"], 0)
+        fresh = Agent(self.evaluator, self.encoder)
+        fresh.set_inference("constant", backend=constant_backend)
+        self.assertEqual(agent._evaluate_moves_batch(self.board, self.moves, WHITE),
+                         fresh._evaluate_moves_batch(self.board, self.moves, WHITE))
+
+    def test_evicts_least_recently_used(self):
+        cache = EvalCache(2)
+        cache.put((1, True), 0.1)
+        cache.put((2, True), 0.2)
+        self.assertEqual(cache.get((1, True)), 0.1)
+        cache.put((3, True), 0.3)
+        self.assertIsNone(cache.get((2, True)))
+        self.assertEqual(cache.stats()["size"], 2)
+        with self.assertRaises(ValueError):
+            EvalCache(0)
+
+
+class TestInferenceBuffers(unittest.TestCase):
+    def test_views_share_memory_and_grow(self):
+        buffers = InferenceBuffers(4, capacity=2)
+        x = buffers.inputs(2)
+        x[:] = 1.0
+        self.assertEqual(buffers.input_tensor(2).sum().item(), 8.0)
+        self.assertTrue(np.shares_memory(x, buffers.inputs(1)))
+        grown = buffers.inputs(3)
+        self.assertEqual(grown.shape, (3, 4))
+        self.assertTrue(grown.flags.c_contiguous)
+        self.assertEqual(buffers.capacity, 4)
+        self.assertEqual(buffers.outputs(3).shape, (3, 1))
+        buffers.inputs(9)
+        self.assertEqual(buffers.capacity, 9)
+        with self.assertRaises(ValueError):
+            InferenceBuffers(4, capacity=0)
+
+    def test_reused_buffers_match_fresh_agent(self):
+        config_path = Path(__file__).resolve().parents[2] / "config-test.yml"
+        config = ConfigLoader(str(config_path))
+        encoder = BoardEncoder(config)
+        evaluator = PositionDependentEvaluator(encoder.input_size)
+        board = Board.from_config(config)
+        board.set_point(5, WHITE, 2)
+        board.set_point(10, WHITE, 1)
+        board.set_point(15, WHITE, 1)
+        board.set_point(8, BLACK, 1)
+        board.set_point(12, BLACK, 1)
+        board.set_point(20, BLACK, 2)
+        dice = Dice(config.get_die_sides())
+        dice.set(2, 4)
+        moves = legal_moves(board, WHITE, dice)
+        agent = Agent(evaluator, encoder)
+        # Small batches first, then a 2-ply batch that grows the buffers, then
+        # small batches again from the grown buffers.
+        searches = [
+            lambda a: a._evaluate_moves_batch(board, moves, WHITE),
+            lambda a: a._evaluate_moves_2ply_batch(board, moves, WHITE),
+            lambda a: a._evaluate_moves_nply(board, moves, WHITE, depth=2, beam_threshold=10.0),
+            lambda a: [a.position_value_lookahead(board, BLACK)],
+        ]
+        for search in searches + searches:
+            self.assertEqual(search(agent), search(Agent(evaluator, encoder)))
+        self.assertGreater(agent.buffers.capacity, 64)
+
 
 class TestAgentNPly(unittest.TestCase):
     def setUp(self):
@@ -264,6 +455,53 @@ class TestAgentNPly(unittest.TestCase):
         self.assertEqual(repr(self.board), board_repr_before)
 
 
+class TestChancePruning(unittest.TestCase):
+    """Star1 cutoffs must not change the chosen move or its score; the other
+    root scores may only come back as upper bounds below the best."""
+
+    @classmethod
+    def setUpClass(cls):
+        from ai.checkpoint_io import load_agent_from_checkpoint
+        config = ConfigLoader(str(Path(__file__).resolve().parents[2] / "config-test.yml"))
+        cls.agent, _ = load_agent_from_checkpoint("models/gold_v1.pth", config,
+                                                  device=torch.device("cpu"))
+        cls.board = Board.from_config(config)
+        cls.board.set_point(5, WHITE, 2)
+        cls.board.set_point(10, WHITE, 1)
+        cls.board.set_point(15, WHITE, 1)
+        cls.board.set_point(8, BLACK, 1)
+        cls.board.set_point(12, BLACK, 1)
+        cls.board.set_point(20, BLACK, 2)
+        dice = Dice(config.get_die_sides())
+        dice.set(2, 4)
+        cls.moves = legal_moves(cls.board, WHITE, dice, compact=True)
+
+    def _search(self, chance_pruning):
+        calls = []
+        many = self.agent.evaluate_moves_many
+        self.agent.evaluate_moves_many = lambda requests: calls.append(1) or many(requests)
+        try:
+            scores = self.agent._evaluate_moves_nply(
+                self.board, self.moves, WHITE, depth=3, beam_threshold=0.08,
+                relative_cutoff=0.08, max_branch=2, chance_pruning=chance_pruning)
+        finally:
+            del self.agent.evaluate_moves_many
+        return scores, len(calls)
+
+    def test_depth3_best_move_is_exact(self):
+        board_before = repr(self.board)
+        exact, exact_calls = self._search(False)
+        pruned, pruned_calls = self._search(True)
+        self.assertEqual(repr(self.board), board_before)
+        best = int(np.argmax(exact))
+        self.assertEqual(int(np.argmax(pruned)), best)
+        self.assertAlmostEqual(pruned[best], exact[best], places=6)
+        for got, want in zip(pruned, exact):
+            self.assertGreaterEqual(got, want - 1e-6)
+            self.assertLessEqual(got, pruned[best] + 1e-6)
+        self.assertLess(pruned_calls, exact_calls)
+
+
 class TestPruneBranches(unittest.TestCase):
     def test_relative_cutoff_keeps_moves_within_fraction(self):
         moves = ["a", "b", "c", "d"]
@@ -342,6 +580,49 @@ class TestLastSearchDepth(unittest.TestCase):
         agent.get_best_move(self.board, moves, WHITE, time_budget_s=-1.0)
         self.assertEqual(agent.last_search_depth, 1)
 
+    def test_deadline_mid_depth_keeps_finished_candidates(self):
+        import ai.agent as agent_module
+        moves = self._setup_multi_move()
+        agent = Agent(PositionDependentEvaluator(self.encoder.input_size), self.encoder)
+        first, _ = agent.get_best_move(self.board, moves, WHITE, time_budget_s=60.0,
+                                       relative_cutoff=0.5, max_branch=3, max_depth=2)
+        (depth3_first,) = agent._evaluate_moves_nply(self.board, [first], WHITE, depth=3,
+                                                     beam_threshold=0.08, relative_cutoff=0.5,
+                                                     max_branch=3)
+        # The deadline "expires" at the second root chance node of depth 3.
+        chance_value = agent._chance_value
+        calls = {"n": 0}
+
+        def interrupting_chance_value(board, color, depth, *args):
+            if depth == 3:
+                calls["n"] += 1
+                if calls["n"] == 2:
+                    raise agent_module._TimeoutError()
+            return chance_value(board, color, depth, *args)
+
+        agent._chance_value = interrupting_chance_value
+        board_repr_before = repr(self.board)
+        move, score = agent.get_best_move(self.board, moves, WHITE, time_budget_s=60.0,
+                                          relative_cutoff=0.5, max_branch=3, max_depth=3)
+        self.assertEqual(repr(self.board), board_repr_before)
+        self.assertEqual(agent.last_search_depth, 2)
+        self.assertEqual(agent.last_search_partial, 1)
+        self.assertEqual(move, first)
+        self.assertAlmostEqual(score, depth3_first, places=6)
+
+    def test_memo_reuse_matches_fresh_search(self):
+        import ai.agent as agent_module
+        moves = self._setup_multi_move()
+        agent = Agent(PositionDependentEvaluator(self.encoder.input_size), self.encoder)
+        args = (0.08, None, 0.5, 3)
+        for window in (None, (-np.inf, np.inf)):
+            fresh = agent._expectimax(self.board, moves, WHITE, 3, *args, window, None)
+            memo = agent_module._SearchMemo()
+            agent._expectimax(self.board, moves, WHITE, 2, *args, window, memo)
+            reused = agent._expectimax(self.board, moves, WHITE, 3, *args, window, memo)
+            self.assertGreaterEqual(memo.hits, len(moves))
+            np.testing.assert_allclose(reused, fresh, rtol=0, atol=1e-6)
+
     def test_board_restored_when_timeout_fires_deep_in_recursion(self):
         """Regression: a _TimeoutError raised inside a nested depth-2 frame must still
         undo every applied move as it unwinds (try/finally), leaving the board pristine."""
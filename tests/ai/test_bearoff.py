@@ -3,7 +3,8 @@ import unittest
 
 import numpy as np
 
-from ai.bearoff import BearoffDB, exact_value_on_roll, race_state
+from ai.bearoff import BearoffDB, exact_value_on_roll, exact_values_on_roll, race_state
+from domain.batch_move_generation import stack_cells
 from domain.board import Board
 from domain.constants import BLACK, WHITE
 from domain.dice import Dice
@@ -172,6 +173,23 @@ class TestRaceDetector(unittest.TestCase):
         board.set_point(24, WHITE, 1)
         self.assertIsNone(exact_value_on_roll(board, True, None))
 
+    def test_batched_exact_values_match_scalar(self):
+        db = _build_small_db()
+        race = Board()
+        race.set_point(24, WHITE, 1)
+        race.set_point(22, WHITE, 2)
+        race.set_point(3, BLACK, 1)
+        pinned = Board()
+        pinned.set_point(24, WHITE, 1)
+        pinned.set_point(5, BLACK, 2)
+        pinned.set_point(20, WHITE, 1, pinned=True)
+        boards = [race, Board.initial(), pinned]
+        for persp in (True, False):
+            values = exact_values_on_roll(stack_cells(boards), persp, db, home_size=6)
+            self.assertAlmostEqual(values[0], exact_value_on_roll(race, persp, db), places=12)
+            self.assertTrue(np.isnan(values[1:]).all())
+        self.assertTrue(np.isnan(exact_values_on_roll(stack_cells([race]), True, None, 6)).all())
+
 
 class TestAgentBearoffHook(unittest.TestCase):
     def test_one_ply_scores_use_exact_db_values(self):
@@ -0,0 +1,102 @@
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+import torch
+
+from ai.board_encoder import BoardEncoder, UNARY_V2, UNARY_V3, UNARY_V3_RAW
+from ai.board_evaluator import BoardEvaluator
+from ai.checkpoint_io import load_agent_from_checkpoint, save_checkpoint
+from ai.fixed_features import FixedFeatures
+from config.config_loader import ConfigLoader
+from domain.board import Board
+from domain.constants import BLACK, WHITE
+from domain.dice import Dice
+from domain.move_generation import legal_moves
+
+
+def _positions(config, seed, games=2):
+    rng = random.Random(seed)
+    dice = Dice(6)
+    boards = []
+    for _ in range(games):
+        board = Board.initial(config)
+        color = WHITE
+        while not (board.has_won(WHITE) or board.has_won(BLACK)):
+            boards.append(board.clone())
+            dice.set(rng.randint(1, 6), rng.randint(1, 6))
+            moves = legal_moves(board, color, dice)
+            if moves:
+                board.apply(rng.choice(moves), color)
+            color = -color
+    return boards
+
+
+class TestFixedFeatures(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.config = ConfigLoader("config-test.yml")
+        cls.boards = _positions(cls.config, seed=3)
+        cls.persp = [i % 3 != 0 for i in range(len(cls.boards))]
+
+    def test_raw_version_emits_unary_v2_layout(self):
+        raw = BoardEncoder(self.config, version=UNARY_V3_RAW)
+        v2 = BoardEncoder(self.config, version=UNARY_V2)
+        self.assertEqual(raw.input_size, v2.input_size)
+        np.testing.assert_array_equal(raw.encode_board(self.boards[10], False),
+                                      v2.encode_board(self.boards[10], False))
+
+    def test_matches_python_smart_features(self):
+        raw_encoder = BoardEncoder(self.config, version=UNARY_V3_RAW)
+        v3_encoder = BoardEncoder(self.config, version=UNARY_V3)
+        module = raw_encoder.fixed_features()
+        raw = torch.from_numpy(raw_encoder.encode_boards(self.boards, self.persp))
+        expected = np.stack([v3_encoder.encode_board(b, p) for b, p in zip(self.boards, self.persp)])
+        got = module(raw).numpy()
+        self.assertEqual(got.shape, expected.shape)
+        np.testing.assert_array_equal(got, expected)
+
+    def test_has_no_persistent_state(self):
+        module = FixedFeatures(24, 15, 6)
+        self.assertEqual(module.state_dict(), {})
+        self.assertEqual(list(module.parameters()), [])
+
+    def test_evaluators_share_checkpoints(self):
+        raw_encoder = BoardEncoder(self.config, version=UNARY_V3_RAW)
+        v3_encoder = BoardEncoder(self.config, version=UNARY_V3)
+        torch.manual_seed(0)
+        v3_eval = BoardEvaluator(v3_encoder.input_size, hidden_sizes=[32, 16]).eval()
+        raw_eval = BoardEvaluator(raw_encoder.input_size, hidden_sizes=[32, 16],
+                                  fixed_features=raw_encoder.fixed_features()).eval()
+        self.assertEqual(raw_eval.state_dict().keys(), v3_eval.state_dict().keys())
+        raw_eval.load_state_dict(v3_eval.state_dict())
+        with torch.no_grad():
+            expected = v3_eval(torch.from_numpy(v3_encoder.encode_boards(self.boards, self.persp)))
+            got = raw_eval(torch.from_numpy(raw_encoder.encode_boards(self.boards, self.persp)))
+        torch.testing.assert_close(got, expected, rtol=0, atol=1e-6)
+
+    def test_load_unary_v3_checkpoint_as_raw(self):
+        torch.manual_seed(1)
+        evaluator = BoardEvaluator(BoardEncoder(self.config, version=UNARY_V3).input_size,
+                                   hidden_sizes=[16])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.pth")
+            save_checkpoint(path, evaluator, self.config)
+            v3_agent, _ = load_agent_from_checkpoint(path, self.config)
+            raw_agent, meta = load_agent_from_checkpoint(path, self.config,
+                                                         encoder_version=UNARY_V3_RAW)
+            with self.assertRaises(ValueError):
+                load_agent_from_checkpoint(path, self.config, encoder_version=UNARY_V2)
+        self.assertEqual(meta["encoder_version"], UNARY_V3_RAW)
+        board = self.boards[20]
+        dice = Dice(6)
+        dice.set(5, 3)
+        moves = legal_moves(board, WHITE, dice)
+        np.testing.assert_allclose(raw_agent.evaluate_moves(board, moves, WHITE),
+                                   v3_agent.evaluate_moves(board, moves, WHITE), rtol=0, atol=1e-6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import multiprocessing as mp
+import threading
+import unittest
+
+import numpy as np
+import torch
+
+from ai.agent import Agent
+from ai.board_encoder import BoardEncoder
+from ai.board_evaluator import BoardEvaluator
+from ai.checkpoint_io import ENCODER_VERSION_CURRENT
+from ai.inference_server import (SERVER_INFERENCE, InferenceChannel, InferenceClient,
+                                 InferenceServer, server_main)
+from ai.shared_weights import SharedWeights
+from config.config_loader import ConfigLoader
+from domain.board import Board
+from domain.constants import WHITE
+from domain.dice import Dice
+from domain.move_generation import legal_moves
+
+
+class TestInferenceServer(unittest.TestCase):
+    def setUp(self):
+        self.ctx = mp.get_context("spawn")
+        self.input_size = 12
+        torch.manual_seed(0)
+        self.evaluator = BoardEvaluator(self.input_size, hidden_sizes=[8]).eval()
+        self.channel = InferenceChannel(self.ctx, num_workers=3, input_size=self.input_size,
+                                        max_rows=4)
+        self.weights = SharedWeights(self.evaluator.state_dict())
+        self.server = InferenceServer(self.channel, BoardEvaluator(self.input_size, [8]).eval(),
+                                      self.weights)
+        self.thread = threading.Thread(target=self.server.serve, daemon=True)
+        self.thread.start()
+        self.rng = np.random.default_rng(0)
+
+    def tearDown(self):
+        self.channel.stop()
+        self.thread.join(timeout=5)
+        self.assertFalse(self.thread.is_alive())
+        self.channel.close(unlink=True)
+        self.weights.close(unlink=True)
+
+    def _expected(self, evaluator, x):
+        with torch.no_grad():
+            return evaluator(torch.from_numpy(x)).numpy()
+
+    def test_client_matches_local_forward_across_chunks(self):
+        client = InferenceClient(self.channel, worker_id=1)
+        x = self.rng.random((10, self.input_size), dtype=np.float32)
+        out = np.empty((10, 1), dtype=np.float32)
+        self.assertIs(client(x, out=out), out)
+        np.testing.assert_allclose(out, self._expected(self.evaluator, x), rtol=0, atol=1e-6)
+        self.assertEqual(client.requests, 3)  # max_rows=4
+
+    def test_concurrent_clients_are_batched_per_slot(self):
+        inputs = [self.rng.random((n, self.input_size), dtype=np.float32) for n in (1, 4, 3)]
+        results = [None] * 3
+
+        def run(wid):
+            client = InferenceClient(self.channel, wid)
+            results[wid] = [client(inputs[wid]) for _ in range(20)]
+
+        threads = [threading.Thread(target=run, args=(wid,)) for wid in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=10)
+        for wid in range(3):
+            expected = self._expected(self.evaluator, inputs[wid])
+            for got in results[wid]:
+                np.testing.assert_allclose(got, expected, rtol=0, atol=1e-6)
+        self.assertEqual(self.server.requests, 60)
+        self.assertLessEqual(self.server.batches, 60)
+
+    def test_weight_update_applies_to_later_requests(self):
+        client = InferenceClient(self.channel, worker_id=0)
+        x = self.rng.random((3, self.input_size), dtype=np.float32)
+        client(x)
+        torch.manual_seed(1)
+        other = BoardEvaluator(self.input_size, hidden_sizes=[8]).eval()
+        self.weights.publish(other.state_dict())
+        np.testing.assert_allclose(client(x), self._expected(other, x), rtol=0, atol=1e-6)
+
+    def test_rejects_empty_channel(self):
+        with self.assertRaises(ValueError):
+            InferenceChannel(self.ctx, num_workers=0, input_size=4)
+
+
+class TestServerProcess(unittest.TestCase):
+    def test_server_main_serves_a_spawned_process(self):
+        config = ConfigLoader("config-test.yml")
+        encoder = BoardEncoder(config, version=ENCODER_VERSION_CURRENT)
+        torch.manual_seed(0)
+        evaluator = BoardEvaluator(encoder.input_size, hidden_sizes=[16],
+                                   aux_heads=config.get_aux_heads()).eval()
+        ctx = mp.get_context("spawn")
+        channel = InferenceChannel(ctx, num_workers=1, input_size=encoder.input_size, max_rows=64)
+        weights = SharedWeights(evaluator.state_dict())
+        server = ctx.Process(target=server_main, args=(channel, weights, "config-test.yml", [16]),
+                             daemon=True)
+        server.start()
+        try:
+            x = np.random.default_rng(1).random((100, encoder.input_size), dtype=np.float32)
+            got = InferenceClient(channel, 0)(x)
+            with torch.no_grad():
+                expected = evaluator(torch.from_numpy(x)).numpy()
+            np.testing.assert_allclose(got, expected, rtol=0, atol=1e-6)
+
+            # An agent whose backend is the client scores moves as a local one.
+            board = Board.initial(config)
+            dice = Dice(config.get_die_sides())
+            dice.set(6, 1)
+            moves = legal_moves(board, WHITE, dice, compact=True)
+            agent = Agent(evaluator, encoder)
+            agent.set_inference(SERVER_INFERENCE, backend=InferenceClient(channel, 0))
+            self.assertEqual(agent.inference, SERVER_INFERENCE)
+            np.testing.assert_allclose(agent.evaluate_moves(board, moves, WHITE),
+                                       Agent(evaluator, encoder).evaluate_moves(board, moves, WHITE),
+                                       rtol=0, atol=1e-6)
+        finally:
+            channel.stop()
+            server.join(timeout=10)
+            self.assertEqual(server.exitcode, 0)
+            channel.close(unlink=True)
+            weights.close(unlink=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import math
+import random
+import unittest
+
+import numpy as np
+import torch
+
+from ai.checkpoint_io import load_agent_from_checkpoint
+from ai.self_play_worker import play_games_lockstep, play_one_game_record
+from config.config_loader import ConfigLoader
+from domain.board import Board
+from domain.constants import BLACK, WHITE
+from domain.dice import Dice
+from domain.move_generation import legal_moves
+
+
+class TestLockstepSelfPlay(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.config = ConfigLoader("config-test.yml")  # use_bearoff_db: false
+        cls.agent, _ = load_agent_from_checkpoint(
+            "models/gold_v1.pth", cls.config, device=torch.device("cpu"))
+        cls.encoder = cls.agent.board_encoder
+
+    def _seed(self, seed):
+        random.seed(seed)
+        np.random.seed(seed)
+
+    def _positions(self, seed, count):
+        rng = random.Random(seed)
+        dice = Dice(6)
+        board = Board.initial(self.config)
+        color = WHITE
+        positions = []
+        while len(positions) < count and not (board.has_won(WHITE) or board.has_won(BLACK)):
+            positions.append((board.clone(), color))
+            dice.set(rng.randint(1, 6), rng.randint(1, 6))
+            moves = legal_moves(board, color, dice)
+            if moves:
+                board.apply(rng.choice(moves), color)
+            color = -color
+        return positions
+
+    def test_evaluate_moves_many_matches_single_requests(self):
+        dice = Dice(6)
+        requests = []
+        for k, (board, color) in enumerate(self._positions(3, 12)):
+            dice.set(1 + k % 6, 1 + (k * 5) % 6)
+            moves = legal_moves(board, color, dice)
+            if moves:
+                requests.append((board, moves, color))
+        batched = self.agent.evaluate_moves_many(requests)
+        for (board, moves, color), scores in zip(requests, batched):
+            np.testing.assert_allclose(scores, self.agent.evaluate_moves(board, moves, color),
+                                       rtol=0, atol=1e-6)
+        self.assertEqual(self.agent.evaluate_moves_many([]), [])
+
+    def test_position_values_lookahead_matches_single_positions(self):
+        positions = self._positions(4, 8)
+        batched = self.agent.position_values_lookahead(positions)
+        for (board, color), value in zip(positions, batched):
+            self.assertAlmostEqual(value, self.agent.position_value_lookahead(board, color), places=6)
+
+    def test_single_lockstep_game_replays_play_one_game_record(self):
+        for depth in (1, 2):
+            self._seed(11)
+            expected = play_one_game_record(self.agent, self.encoder, self.config, epsilon=0.0,
+                                            exploration_temperature=1.0, bootstrap_depth=depth)
+            self._seed(11)
+            (got,) = play_games_lockstep(self.agent, self.encoder, self.config, epsilon=0.0,
+                                         exploration_temperature=1.0, num_games=1,
+                                         bootstrap_depth=depth)
+            self.assertEqual(got["movers"], expected["movers"])
+            self.assertEqual(got["terminal_winner_white"], expected["terminal_winner_white"])
+            np.testing.assert_array_equal(np.stack(got["states"]), np.stack(expected["states"]))
+            np.testing.assert_allclose(got["bootstrap_values"], expected["bootstrap_values"],
+                                       rtol=0, atol=1e-6)
+
+    def test_lockstep_trajectories_are_complete(self):
+        self._seed(5)
+        trajs = play_games_lockstep(self.agent, self.encoder, self.config, epsilon=0.1,
+                                    exploration_temperature=1.0, num_games=4, bootstrap_depth=2)
+        self.assertEqual(len(trajs), 4)
+        for traj in trajs:
+            plies = traj["plies"]
+            self.assertEqual(len(traj["movers"]), plies)
+            for key in ("states", "exact_values", "bootstrap_values"):
+                self.assertEqual(len(traj[key]), plies + 1)
+            self.assertTrue(math.isnan(traj["bootstrap_values"][-1]))
+            self.assertTrue(all(0.0 <= b <= 1.0 for b in traj["bootstrap_values"][:-1]
+                                if not math.isnan(b)))
+            self.assertGreater(traj["game_seconds"], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import random
+import unittest
+
+import numpy as np
+import torch
+
+from ai.agent import Agent
+from ai.board_encoder import BoardEncoder, UNARY_V3, UNARY_V3_RAW
+from ai.board_evaluator import BoardEvaluator
+from ai.numpy_inference import NUMPY_FP16_INFERENCE, NUMPY_INFERENCE, NumpyEvaluator
+from config.config_loader import ConfigLoader
+from domain.board import Board
+from domain.constants import BLACK, WHITE
+from domain.dice import Dice
+from domain.move_generation import legal_moves
+
+
+def _positions(config, seed, plies=40):
+    rng = random.Random(seed)
+    dice = Dice(6)
+    board = Board.initial(config)
+    color = WHITE
+    boards, colors = [], []
+    for _ in range(plies):
+        if board.has_won(WHITE) or board.has_won(BLACK):
+            break
+        boards.append(board.clone())
+        colors.append(color)
+        dice.set(rng.randint(1, 6), rng.randint(1, 6))
+        moves = legal_moves(board, color, dice)
+        if moves:
+            board.apply(rng.choice(moves), color)
+        color = -color
+    return boards, colors
+
+
+class TestNumpyEvaluator(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.config = ConfigLoader("config-test.yml")
+        cls.encoder = BoardEncoder(cls.config, version=UNARY_V3)
+        cls.boards, cls.colors = _positions(cls.config, seed=2)
+        cls.encoded = cls.encoder.encode_boards(cls.boards, [c == WHITE for c in cls.colors])
+
+    def _evaluator(self, seed=0, aux_heads=0):
+        torch.manual_seed(seed)
+        return BoardEvaluator(self.encoder.input_size, hidden_sizes=[64, 32, 16],
+                              aux_heads=aux_heads).eval()
+
+    def test_matches_torch_forward(self):
+        evaluator = self._evaluator(aux_heads=2)
+        numpy_eval = NumpyEvaluator(evaluator)
+        with torch.no_grad():
+            x = torch.from_numpy(self.encoded)
+            expected_logits = evaluator.forward_logits(x).numpy()
+            expected = evaluator(x).numpy()
+        for rows in (1, 5, len(self.encoded)):
+            np.testing.assert_allclose(numpy_eval.forward_logits(self.encoded[:rows]),
+                                       expected_logits[:rows], rtol=0, atol=1e-5)
+            got = numpy_eval(self.encoded[:rows])
+            self.assertEqual(got.shape, (rows, 1))
+            self.assertEqual(got.dtype, np.float32)
+            np.testing.assert_allclose(got, expected[:rows], rtol=0, atol=1e-6)
+
+    def test_follows_weight_updates(self):
+        evaluator = self._evaluator(seed=0)
+        numpy_eval = NumpyEvaluator(evaluator)
+        before = numpy_eval(self.encoded)
+        evaluator.load_state_dict(self._evaluator(seed=1).state_dict())
+        after = numpy_eval(self.encoded)
+        self.assertFalse(np.allclose(before, after))
+        with torch.no_grad():
+            expected = evaluator(torch.from_numpy(self.encoded)).numpy()
+        np.testing.assert_allclose(after, expected, rtol=0, atol=1e-6)
+
+    def test_writes_into_out(self):
+        numpy_eval = NumpyEvaluator(self._evaluator())
+        expected = numpy_eval(self.encoded)
+        out = np.empty((len(self.encoded), 1), dtype=np.float32)
+        self.assertIs(numpy_eval(self.encoded, out=out), out)
+        np.testing.assert_array_equal(out, expected)
+        # Reused hidden buffers are sized for the largest batch seen so far.
+        np.testing.assert_allclose(numpy_eval(self.encoded[:3]), expected[:3], rtol=0, atol=1e-6)
+
+    def test_float16_weights(self):
+        evaluator = self._evaluator()
+        numpy_eval = NumpyEvaluator(evaluator, weight_dtype=np.float16)
+        self.assertTrue(all(w.dtype == np.float16 for w in numpy_eval.weights))
+        with torch.no_grad():
+            expected = evaluator(torch.from_numpy(self.encoded)).numpy()
+        got = numpy_eval(self.encoded)
+        self.assertEqual(got.dtype, np.float32)
+        np.testing.assert_allclose(got, expected, rtol=0, atol=2e-3)
+
+    def test_rejects_unsupported_configurations(self):
+        with self.assertRaises(ValueError):
+            NumpyEvaluator(self._evaluator(), weight_dtype=np.int8)
+        raw_encoder = BoardEncoder(self.config, version=UNARY_V3_RAW)
+        evaluator = BoardEvaluator(raw_encoder.input_size, hidden_sizes=[16],
+                                   fixed_features=raw_encoder.fixed_features())
+        with self.assertRaises(ValueError):
+            NumpyEvaluator(evaluator)
+        with self.assertRaises(ValueError):
+            Agent(evaluator, raw_encoder, inference="onnx")
+
+    def test_agent_backends_agree(self):
+        evaluator = self._evaluator()
+        agents = {name: Agent(evaluator, self.encoder, inference=name)
+                  for name in ("torch", NUMPY_INFERENCE, NUMPY_FP16_INFERENCE)}
+        dice = Dice(6)
+        dice.set(6, 1)
+        board, color = self.boards[12], self.colors[12]
+        moves = legal_moves(board, color, dice)
+        expected = agents["torch"].evaluate_moves(board, moves, color, lookahead_plies=2)
+        np.testing.assert_allclose(
+            agents[NUMPY_INFERENCE].evaluate_moves(board, moves, color, lookahead_plies=2),
+            expected, rtol=0, atol=1e-6)
+        np.testing.assert_allclose(
+            agents[NUMPY_FP16_INFERENCE].evaluate_moves(board, moves, color, lookahead_plies=2),
+            expected, rtol=0, atol=2e-3)
+        self.assertAlmostEqual(agents[NUMPY_INFERENCE].position_value_lookahead(board, color),
+                               agents["torch"].position_value_lookahead(board, color), places=6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import pickle
+import unittest
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from ai.checkpoint_io import load_agent_from_checkpoint
+from ai.parallel_search import SearchPool, SharedEvalCache
+from ai.rollout_analysis import rollout_values
+from config.config_loader import ConfigLoader
+from domain.board import Board
+from domain.constants import BLACK, WHITE
+from domain.dice import Dice
+from domain.move_generation import legal_moves
+
+CONFIG_PATH = str(Path(__file__).resolve().parents[2] / "config-test.yml")
+
+
+class TestSharedEvalCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = SharedEvalCache(100)
+
+    def tearDown(self):
+        self.cache.close(unlink=True)
+
+    def test_put_get_and_perspectives_are_separate(self):
+        self.assertEqual(self.cache.slots, 128)
+        self.assertIsNone(self.cache.get((12345, True)))
+        self.cache.put((12345, True), 0.625)
+        self.assertEqual(self.cache.get((12345, True)), 0.625)
+        self.assertIsNone(self.cache.get((12345, False)))
+        self.cache.put((12345 + 128, True), 0.25)  # same slot, replaces
+        self.assertIsNone(self.cache.get((12345, True)))
+        self.assertEqual(self.cache.get((12345 + 128, True)), 0.25)
+        self.assertEqual(self.cache.stats()["size"], 1)
+
+    def test_unpickled_copy_shares_the_table(self):
+        self.cache.put((-7, False), 0.5)  # zobrist keys may be negative
+        copy = pickle.loads(pickle.dumps(self.cache))
+        try:
+            self.assertEqual(copy.get((-7, False)), 0.5)
+            copy.put((99, True), 0.75)
+            self.assertEqual(self.cache.get((99, True)), 0.75)
+        finally:
+            copy.close()
+
+    def test_sync_clears_on_weight_change_only(self):
+        net = torch.nn.Linear(2, 1)
+        self.cache.sync(net)
+        self.cache.put((1, True), 0.5)
+        self.cache.sync(net)
+        self.assertEqual(self.cache.get((1, True)), 0.5)
+        with torch.no_grad():
+            net.weight.add_(1.0)
+        self.cache.sync(net)
+        self.assertIsNone(self.cache.get((1, True)))
+
+
+class TestSearchPool(unittest.TestCase):
+    """The pool must reproduce the in-process search's best move and score."""
+
+    @classmethod
+    def setUpClass(cls):
+        config = ConfigLoader(CONFIG_PATH)
+        cls.agent, _ = load_agent_from_checkpoint("models/gold_v1.pth", config,
+                                                  device=torch.device("cpu"))
+        cls.board = Board.from_config(config)
+        cls.board.set_point(5, WHITE, 2)
+        cls.board.set_point(10, WHITE, 1)
+        cls.board.set_point(15, WHITE, 1)
+        cls.board.set_point(8, BLACK, 1)
+        cls.board.set_point(12, BLACK, 1)
+        cls.board.set_point(20, BLACK, 2)
+        dice = Dice(config.get_die_sides())
+        dice.set(2, 4)
+        cls.moves = legal_moves(cls.board, WHITE, dice, compact=True)
+        cls.pool = SearchPool("models/gold_v1.pth", CONFIG_PATH, 2, cache_slots=1 << 16)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def _best_move(self, pool, chance_pruning):
+        self.agent.search_pool = pool
+        try:
+            move, score = self.agent.get_best_move(
+                self.board, self.moves, WHITE, time_budget_s=600, relative_cutoff=0.08,
+                max_branch=2, max_depth=3, chance_pruning=chance_pruning)
+        finally:
+            self.agent.search_pool = None
+        self.assertEqual(self.agent.last_search_depth, 3)
+        return move, score
+
+    def test_depth3_matches_in_process_search(self):
+        board_before = repr(self.board)
+        for chance_pruning in (False, True):
+            with self.subTest(chance_pruning=chance_pruning):
+                move, score = self._best_move(None, chance_pruning)
+                pool_move, pool_score = self._best_move(self.pool, chance_pruning)
+                self.assertEqual(pool_move, move)
+                self.assertAlmostEqual(pool_score, score, places=6)
+        self.assertEqual(repr(self.board), board_before)
+
+    def test_2ply_ranking_matches_in_process(self):
+        expected = self.agent.evaluate_moves(self.board, self.moves, WHITE, lookahead_plies=2)
+        scores = self.pool.evaluate_moves_2ply(self.board, self.moves, WHITE)
+        self.assertEqual(len(scores), len(self.moves))
+        for got, want in zip(scores, expected):
+            self.assertAlmostEqual(got, want, places=6)
+
+    def test_rollouts_match_in_process(self):
+        starts = [(self.board, BLACK), (self.board, WHITE)]
+        expected = rollout_values(self.agent, starts, range(2, 10), seed=7, truncate_plies=6)
+        values = self.pool.rollout_values(starts, range(2, 10), seed=7, truncate_plies=6)
+        np.testing.assert_allclose(values, expected, rtol=0, atol=1e-6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import torch
+
+from ai.agent import Agent
+from ai.board_encoder import BoardEncoder, UNARY_V3
+from ai.board_evaluator import BoardEvaluator
+from ai.checkpoint_io import load_agent_from_checkpoint, save_checkpoint
+from ai.quantization import (
+    INT8_DYNAMIC, INT8_STATIC, QuantizedEvaluator, quantization_report, quantize_module,
+    self_play_positions,
+)
+from config.config_loader import ConfigLoader
+from domain.board import Board
+from domain.constants import WHITE
+from domain.dice import Dice
+from domain.move_generation import legal_moves
+
+
+class TestQuantization(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.config = ConfigLoader("config-test.yml")
+        cls.encoder = BoardEncoder(cls.config, version=UNARY_V3)
+        torch.manual_seed(0)
+        cls.evaluator = BoardEvaluator(cls.encoder.input_size, hidden_sizes=[32, 16]).eval()
+        agent = Agent(cls.evaluator, cls.encoder)
+        cls.calibration = self_play_positions(agent, cls.config, games=1, seed=0)
+        cls.held_out = self_play_positions(agent, cls.config, games=1, seed=1)
+
+    def _float_values(self, evaluator, x):
+        with torch.no_grad():
+            return evaluator(torch.from_numpy(x)).numpy()
+
+    def test_positions_are_encoded_leaves(self):
+        self.assertEqual(self.calibration.dtype, np.float32)
+        self.assertEqual(self.calibration.shape[1], self.encoder.input_size)
+        self.assertGreater(len(self.calibration), 50)
+
+    def test_modes_stay_close_to_float(self):
+        expected = self._float_values(self.evaluator, self.held_out)
+        for mode, layers in ((INT8_DYNAMIC, (0,)), (INT8_DYNAMIC, (0, 1, 2)),
+                             (INT8_STATIC, (0,)), (INT8_STATIC, (0, 1, 2))):
+            with self.subTest(mode=mode, layers=layers):
+                quantized = QuantizedEvaluator(self.evaluator, mode, self.calibration, layers)
+                got = quantized(self.held_out)
+                self.assertEqual(got.shape, expected.shape)
+                report = quantization_report(self.evaluator, quantized, self.held_out)
+                self.assertLess(report["mae"], 0.02)
+                self.assertEqual(report["positions"], len(self.held_out))
+                np.testing.assert_allclose(got, expected, rtol=0, atol=0.1)
+
+    def test_requantizes_after_weight_change(self):
+        torch.manual_seed(3)
+        evaluator = BoardEvaluator(self.encoder.input_size, hidden_sizes=[32, 16]).eval()
+        quantized = QuantizedEvaluator(evaluator, INT8_DYNAMIC)
+        module = quantized.module
+        evaluator.load_state_dict(self.evaluator.state_dict())
+        got = quantized(self.held_out)
+        self.assertIsNot(quantized.module, module)
+        np.testing.assert_allclose(got, self._float_values(self.evaluator, self.held_out),
+                                   rtol=0, atol=0.1)
+
+    def test_static_refresh_keeps_calibrated_activation_scales(self):
+        torch.manual_seed(4)
+        evaluator = BoardEvaluator(self.encoder.input_size, hidden_sizes=[32, 16]).eval()
+        evaluator.load_state_dict(self.evaluator.state_dict())
+        quantized = QuantizedEvaluator(evaluator, INT8_STATIC, self.calibration, (0, 1))
+        qparams = quantized.activation_qparams
+        self.assertEqual(sorted(qparams), [0, 1])
+        with torch.no_grad():
+            evaluator.layers[0].weight.mul_(0.9)
+        got = quantized(self.held_out)
+        self.assertIs(quantized.activation_qparams, qparams)
+        reference = quantize_module(evaluator, INT8_STATIC, layers=(0, 1), activation_qparams=qparams)
+        with torch.no_grad():
+            np.testing.assert_array_equal(got, reference(torch.from_numpy(self.held_out)).numpy())
+        np.testing.assert_allclose(got, self._float_values(evaluator, self.held_out),
+                                   rtol=0, atol=0.1)
+
+    def test_rejects_bad_arguments(self):
+        with self.assertRaises(ValueError):
+            quantize_module(self.evaluator, "int4")
+        with self.assertRaises(ValueError):
+            quantize_module(self.evaluator, INT8_STATIC)
+        with self.assertRaises(ValueError):
+            quantize_module(self.evaluator, INT8_DYNAMIC, layers=(3,))
+        with self.assertRaises(ValueError):
+            Agent(self.evaluator, self.encoder, inference=INT8_STATIC)
+
+    def test_agent_backend(self):
+        board = Board.initial(self.config)
+        dice = Dice(6)
+        dice.set(5, 2)
+        moves = legal_moves(board, WHITE, dice)
+        expected = Agent(self.evaluator, self.encoder).evaluate_moves(board, moves, WHITE)
+        agent = Agent(self.evaluator, self.encoder, inference=INT8_DYNAMIC)
+        np.testing.assert_allclose(agent.evaluate_moves(board, moves, WHITE), expected,
+                                   rtol=0, atol=0.1)
+
+    def test_load_agent_from_checkpoint_calibrates_static(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.pth")
+            save_checkpoint(path, self.evaluator, self.config)
+            agent, _ = load_agent_from_checkpoint(path, self.config, inference=INT8_STATIC)
+        self.assertEqual(agent.inference, INT8_STATIC)
+        self.assertIsInstance(agent.backend_evaluator, QuantizedEvaluator)
+        self.assertGreater(len(agent.backend_evaluator.calibration), 0)
+        report = quantization_report(agent.board_evaluator, agent.backend_evaluator, self.held_out)
+        self.assertLess(report["mae"], 0.02)
+
+
+if __name__ == "__main__":
+    unittest.main()
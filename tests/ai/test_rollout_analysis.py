@@ -0,0 +1,118 @@
+import unittest
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from ai.agent import _DICE_OUTCOMES
+from ai.checkpoint_io import load_agent_from_checkpoint
+from ai.rollout_analysis import analyze_moves, rollout_values
+from config.config_loader import ConfigLoader
+from domain.board import Board
+from domain.constants import BLACK, WHITE
+from domain.dice import Dice
+from domain.move_generation import legal_moves
+
+CONFIG_PATH = str(Path(__file__).resolve().parents[2] / "config-test.yml")
+
+
+def _race_board(config):
+    """A no-contact position short enough for quick playouts."""
+    board = Board.from_config(config)
+    for i in range(board.board_size + 2):
+        board.set_point(i, 0, 0)
+    board.set_point(19, WHITE, 2)
+    board.set_point(22, WHITE, 2)
+    board.set_point(5, BLACK, 2)
+    board.set_point(2, BLACK, 2)
+    board.borne_off[WHITE] = config.get_pieces_per_player() - 4
+    board.borne_off[BLACK] = config.get_pieces_per_player() - 4
+    return board
+
+
+class TestRolloutValues(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.config = ConfigLoader(CONFIG_PATH)
+        cls.agent, _ = load_agent_from_checkpoint("models/gold_v1.pth", cls.config,
+                                                  device=torch.device("cpu"))
+        cls.board = _race_board(cls.config)
+
+    def test_trials_are_reproducible_and_common_across_starts(self):
+        starts = [(self.board, WHITE), (self.board.clone(), WHITE)]
+        first = rollout_values(self.agent, starts, range(6), seed=3)
+        self.assertEqual(first.shape, (2, 6))
+        # Equal up to float noise from the different batch compositions.
+        np.testing.assert_allclose(first[0], first[1], rtol=0, atol=1e-6)
+        again = rollout_values(self.agent, starts[:1], [4, 5, 2], seed=3)
+        np.testing.assert_allclose(again[0], first[0, [4, 5, 2]], rtol=0, atol=1e-6)
+
+    def test_zero_truncation_is_the_lookahead_value(self):
+        values = rollout_values(self.agent, [(self.board, BLACK)], range(2), seed=0,
+                                truncate_plies=0)
+        expected = self.agent.position_value_lookahead(self.board, BLACK)
+        np.testing.assert_allclose(values[0], [expected, expected], rtol=0, atol=1e-6)
+
+    def test_luck_adjustment_subtracts_the_rolled_outcomes_luck(self):
+        trials = range(8)
+        raw = rollout_values(self.agent, [(self.board, WHITE)], trials, seed=5,
+                             truncate_plies=1, luck_plies=0)
+        adjusted = rollout_values(self.agent, [(self.board, WHITE)], trials, seed=5,
+                                  truncate_plies=1, luck_plies=1)
+        (outcome_values,) = self.agent.roll_values([(self.board, WHITE)])
+        expected = sum(w * v for (_, _, w), v in zip(_DICE_OUTCOMES, outcome_values))
+        for t in trials:
+            d1, d2 = np.random.default_rng([5, t // 2]).integers(1, 7, size=2)
+            if t % 2:
+                d1, d2 = 7 - d1, 7 - d2  # antithetic twin
+            o = [(i, j) for i, j, _ in _DICE_OUTCOMES].index((min(d1, d2), max(d1, d2)))
+            luck = outcome_values[o] - expected
+            self.assertAlmostEqual(raw[0, t] - adjusted[0, t], luck, places=6)
+
+
+class TestAnalyzeMoves(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.config = ConfigLoader(CONFIG_PATH)
+        cls.agent, _ = load_agent_from_checkpoint("models/gold_v1.pth", cls.config,
+                                                  device=torch.device("cpu"))
+
+    def test_winning_move_wins_the_race(self):
+        board = Board.from_config(self.config)
+        for i in range(board.board_size + 2):
+            board.set_point(i, 0, 0)
+        board.borne_off[WHITE] = self.config.get_pieces_per_player() - 2
+        board.set_point(22, WHITE, 1)
+        board.set_point(20, WHITE, 1)
+        board.borne_off[BLACK] = self.config.get_pieces_per_player() - 2
+        board.set_point(1, BLACK, 2)  # bears off only with 1s
+        dice = Dice(self.config.get_die_sides())
+        dice.set(3, 5)
+        moves = legal_moves(board, WHITE, dice, compact=True)
+        self.assertGreater(len(moves), 1)
+        results = analyze_moves(self.agent, board, WHITE, moves, max_trials=16,
+                                round_trials=4)
+        self.assertEqual(results[0].mean, 1.0)
+        self.assertEqual(results[0].stderr, 0.0)
+        self.assertFalse(results[0].rejected)
+        token = board.apply(results[0].move, WHITE)
+        self.assertTrue(board.has_won(WHITE))
+        board.undo(token)
+        self.assertLess(results[1].mean, 1.0)
+        for r in results:
+            self.assertLessEqual(r.trials, 16)
+
+    def test_rejects_bad_round_sizes(self):
+        board = Board.initial(self.config)
+        dice = Dice(self.config.get_die_sides())
+        dice.set(3, 1)
+        moves = legal_moves(board, WHITE, dice, compact=True)
+        with self.assertRaises(ValueError):
+            analyze_moves(self.agent, board, WHITE, moves, round_trials=3)
+        with self.assertRaises(ValueError):
+            analyze_moves(self.agent, board, WHITE, moves, max_trials=4, round_trials=8)
+        self.assertEqual(analyze_moves(self.agent, board, WHITE, []), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
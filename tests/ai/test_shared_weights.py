@@ -0,0 +1,100 @@
+import multiprocessing as mp
+import pickle
+import threading
+import unittest
+
+import numpy as np
+import torch
+
+from ai.agent import EvalCache
+from ai.board_evaluator import BoardEvaluator
+from ai.shared_weights import SharedWeights
+
+
+def _read_in_child(weights, result_q):
+    evaluator = BoardEvaluator(6, hidden_sizes=[4]).eval()
+    version = weights.read_into(evaluator)
+    result_q.put((version, evaluator.layers[0].weight.detach().numpy().copy()))
+    weights.close()
+
+
+class TestSharedWeights(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(0)
+        self.source = BoardEvaluator(6, hidden_sizes=[4]).eval()
+        self.weights = SharedWeights(self.source.state_dict())
+
+    def tearDown(self):
+        self.weights.close(unlink=True)
+
+    def _assert_same(self, a, b):
+        for (name, x), y in zip(a.state_dict().items(), b.state_dict().values()):
+            torch.testing.assert_close(x, y, rtol=0, atol=0, msg=name)
+
+    def test_read_into_copies_and_skips_unchanged(self):
+        target = BoardEvaluator(6, hidden_sizes=[4]).eval()
+        self.assertEqual(self.weights.version, 1)
+        self.assertEqual(self.weights.read_into(target), 1)
+        self._assert_same(target, self.source)
+        with torch.no_grad():
+            target.layers[0].bias.zero_()
+        self.assertEqual(self.weights.read_into(target, have_version=1), 1)
+        self.assertEqual(float(target.layers[0].bias.detach().abs().sum()), 0.0)
+
+    def test_publish_bumps_version_and_invalidates_eval_cache(self):
+        target = BoardEvaluator(6, hidden_sizes=[4]).eval()
+        version = self.weights.read_into(target)
+        cache = EvalCache(8)
+        cache.sync(target)
+        cache.put((1, True), 0.5)
+        with torch.no_grad():
+            self.source.layers[0].weight.add_(1.0)
+        self.assertEqual(self.weights.publish(self.source.state_dict()), 2)
+        self.assertEqual(self.weights.read_into(target, version), 2)
+        self._assert_same(target, self.source)
+        cache.sync(target)
+        self.assertIsNone(cache.get((1, True)))
+
+    def test_concurrent_reads_are_never_torn(self):
+        target = BoardEvaluator(6, hidden_sizes=[4]).eval()
+        stop = threading.Event()
+
+        def write():
+            fill = 0.0
+            while not stop.is_set():
+                fill += 1.0
+                self.weights.publish({k: torch.full_like(v, fill)
+                                      for k, v in self.source.state_dict().items()})
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            version = 1  # skip the unfilled initial weights
+            for _ in range(200):
+                while self.weights.version == version:
+                    pass
+                version = self.weights.read_into(target, version)
+                values = torch.cat([v.flatten() for v in target.state_dict().values()])
+                self.assertTrue(bool((values == values[0]).all()))
+        finally:
+            stop.set()
+            writer.join()
+
+    def test_spawned_process_reads_published_weights(self):
+        ctx = mp.get_context("spawn")
+        result_q = ctx.Queue()
+        with torch.no_grad():
+            self.source.layers[0].weight.mul_(2.0)
+        self.weights.publish(self.source.state_dict())
+        pickle.dumps(self.weights)
+        child = ctx.Process(target=_read_in_child, args=(self.weights, result_q))
+        child.start()
+        version, weight = result_q.get(timeout=30)
+        child.join(timeout=10)
+        self.assertEqual(child.exitcode, 0)
+        self.assertEqual(version, 2)
+        np.testing.assert_array_equal(weight, self.source.layers[0].weight.detach().numpy())
+
+
+if __name__ == "__main__":
+    unittest.main()
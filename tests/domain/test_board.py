@@ -1,6 +1,8 @@
+import random
 import unittest
 
-from domain import Board, WHITE, BLACK, HalfMove, Move
+from domain import Board, Dice, WHITE, BLACK, HalfMove, Move, legal_moves
+from domain.move_code import encode_move
 
 
 def _make(board_size: int = 24, home_size: int = 6, pieces: int = 15) -> Board:
@@ -108,6 +110,142 @@ class TestBoardState(unittest.TestCase):
         self.assertEqual(b.n[5], 0)
         self.assertEqual(c.n[5], 1)
 
+    def test_apply_accepts_move_codes(self):
+        b = _make()
+        b.set_point(20, WHITE, 2)
+        b.set_point(22, BLACK, 1)
+        b.set_point(3, BLACK, 2)
+        move = Move((HalfMove(20, 22), HalfMove(20, 25)))
+        by_move = b.clone()
+        by_move.apply(move, WHITE)
+        token = b.apply(encode_move(move, WHITE), WHITE)
+        self.assertEqual((b.n, b.color, b.pinned, b.borne_off, b.zobrist),
+                         (by_move.n, by_move.color, by_move.pinned, by_move.borne_off,
+                          by_move.zobrist))
+        b.undo(token)
+        self.assertEqual(b.n[20], 2)
+        self.assertEqual(b.borne_off[WHITE], 0)
+
+        black = Move((HalfMove(3, 1), HalfMove(3, 0)))
+        token = b.apply(encode_move(black, BLACK), BLACK)
+        self.assertEqual((b.n[1], b.color[1], b.borne_off[BLACK]), (1, BLACK, 1))
+        b.undo(token)
+        self.assertEqual(b.n[3], 2)
+
+
+class TestBoardZobrist(unittest.TestCase):
+    def test_empty_board_hashes_to_zero(self):
+        self.assertEqual(_make().zobrist, 0)
+
+    def test_set_point_matches_recompute(self):
+        b = Board.initial(board_size=24, home_size=6, pieces_per_player=15)
+        b.set_point(10, WHITE, 2, pinned=True)
+        z = b.zobrist
+        b.recompute()
+        self.assertEqual(b.zobrist, z)
+        self.assertNotEqual(z, 0)
+
+    def test_apply_undo_restores_hash_and_transpositions_agree(self):
+        b = _make()
+        b.set_point(5, WHITE, 2)
+        b.set_point(9, BLACK, 1)
+        start = b.zobrist
+        t1 = b.apply(Move((HalfMove(5, 7), HalfMove(5, 9))), WHITE)
+        z1 = b.zobrist
+        check = b.clone()
+        check.recompute()
+        self.assertEqual(check.zobrist, z1)
+        b.undo(t1)
+        self.assertEqual(b.zobrist, start)
+        t2 = b.apply(Move((HalfMove(5, 9), HalfMove(5, 7))), WHITE)
+        self.assertEqual(b.zobrist, z1)
+        b.undo(t2)
+        self.assertEqual(b.zobrist, start)
+
+    def test_pin_state_changes_hash(self):
+        pinned = _make()
+        pinned.set_point(6, WHITE, 1, pinned=True)
+        plain = _make()
+        plain.set_point(6, WHITE, 1)
+        self.assertNotEqual(pinned.zobrist, plain.zobrist)
+
+    def test_clone_keeps_hash(self):
+        b = Board.initial(board_size=24, home_size=6, pieces_per_player=15)
+        self.assertEqual(b.clone().zobrist, b.zobrist)
+
+
+def _scan_counters(b: Board) -> dict:
+    """Brute-force reference for the incremental summary counters."""
+    out = {"outside": {WHITE: 0, BLACK: 0}, "pips": {WHITE: 0, BLACK: 0},
+           "blots": {WHITE: 0, BLACK: 0}, "pins": 0}
+    for i in range(1, b.board_size + 1):
+        if b.n[i] == 0:
+            continue
+        c = b.color[i]
+        checkers = [(c, b.n[i])]
+        if b.pinned[i]:
+            out["pins"] += 1
+            checkers.append((-c, 1))
+        elif b.n[i] == 1:
+            out["blots"][c] += 1
+        for owner, k in checkers:
+            out["pips"][owner] += k * (b.board_size + 1 - i if owner == WHITE else i)
+            if not b.is_home(owner, i):
+                out["outside"][owner] += k
+    return out
+
+
+class TestBoardSummary(unittest.TestCase):
+    def _assert_counters(self, b: Board) -> None:
+        ref = _scan_counters(b)
+        for c in (WHITE, BLACK):
+            self.assertEqual(b.count_outside_home(c), ref["outside"][c])
+            self.assertEqual(b.pip_count(c), ref["pips"][c])
+            self.assertEqual(b.blot_count(c), ref["blots"][c])
+        self.assertEqual(b.pin_count(), ref["pins"])
+        self.assertEqual(b.is_pure_race(),
+                         ref["pins"] == 0 and ref["outside"] == {WHITE: 0, BLACK: 0})
+
+    def test_initial_counters(self):
+        b = Board.initial(board_size=24, home_size=6, pieces_per_player=15)
+        self.assertEqual(b.pip_count(WHITE), 15 * 24)
+        self.assertEqual(b.pip_count(BLACK), 15 * 24)
+        self.assertEqual(b.count_outside_home(WHITE), 15)
+        self.assertEqual(b.pin_count(), 0)
+        self.assertFalse(b.is_pure_race())
+
+    def test_counters_track_random_games(self):
+        rng = random.Random(3)
+        dice = Dice(6)
+        for _ in range(4):
+            b = Board.initial(board_size=24, home_size=6, pieces_per_player=15)
+            color = WHITE
+            while not (b.has_won(WHITE) or b.has_won(BLACK)):
+                dice.set(rng.randint(1, 6), rng.randint(1, 6))
+                moves = legal_moves(b, color, dice)
+                if moves:
+                    move = rng.choice(moves)
+                    before = b.summary
+                    b.undo(b.apply(move, color))
+                    self.assertEqual(b.summary, before)
+                    b.apply(move, color)
+                    self._assert_counters(b)
+                color = -color
+
+    def test_pure_race_and_pin_release(self):
+        b = _make()
+        b.set_point(20, WHITE, 3)
+        b.set_point(2, BLACK, 2)
+        self.assertTrue(b.is_pure_race())
+        b.set_point(2, BLACK, 1, pinned=True)
+        self.assertFalse(b.is_pure_race())
+        self._assert_counters(b)
+        token = b.apply(Move((HalfMove(2, 1),)), BLACK)
+        self._assert_counters(b)
+        self.assertEqual(b.color[2], WHITE)
+        b.undo(token)
+        self._assert_counters(b)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,7 +1,10 @@
+import random
 import unittest
 from pathlib import Path
 
-from domain import Board, Dice, HalfMove, Move, WHITE, BLACK, legal_moves
+from domain import Board, Dice, HalfMove, Move, WHITE, BLACK, legal_afterstates, legal_moves
+from domain.move_code import decode_move, encode_move, iter_halves
+from domain.move_generation import disable_move_cache, enable_move_cache
 from config.config_loader import ConfigLoader
 
 
@@ -157,5 +160,137 @@ class TestLegalMoves(unittest.TestCase):
         self.assertEqual(moves[0].halves[0].dst, 8)
 
 
+class TestLegalAfterstates(unittest.TestCase):
+    def setUp(self) -> None:
+        config_path = Path(__file__).resolve().parents[2] / "config-test.yml"
+        self.config = ConfigLoader(str(config_path))
+        self.dice = Dice(self.config.get_die_sides())
+
+    def _positions(self, board: Board, color: int, moves) -> set:
+        out = set()
+        for move in moves:
+            token = board.apply(move, color)
+            out.add((tuple(board.n), tuple(board.color), tuple(board.pinned)))
+            board.undo(token)
+        return out
+
+    def test_same_positions_as_legal_moves_without_duplicates(self):
+        board = Board.initial(self.config)
+        board.apply(Move((HalfMove(1, 4), HalfMove(1, 6))), WHITE)
+        board.apply(Move((HalfMove(24, 19), HalfMove(24, 22))), BLACK)
+        for color in (WHITE, BLACK):
+            for d1, d2 in ((1, 2), (3, 3), (6, 5), (2, 2)):
+                with_dice(self.dice, d1, d2)
+                moves = legal_moves(board, color, self.dice)
+                after = legal_afterstates(board, color, self.dice)
+                reps = list(after.values())
+                self.assertEqual(self._positions(board, color, reps),
+                                 self._positions(board, color, moves))
+                self.assertEqual(len(self._positions(board, color, reps)), len(reps))
+                for z, move in after.items():
+                    token = board.apply(move, color)
+                    self.assertEqual(board.zobrist, z)
+                    board.undo(token)
+
+    def test_legal_moves_emits_no_transpositions(self):
+        # Pasch sources are generated in non-decreasing order and chained pairs
+        # are left to the merged-jump pass, so every Move already reaches a
+        # distinct position; legal_afterstates must not drop any.
+        rng = random.Random(11)
+        board = Board.initial(self.config)
+        color = WHITE
+        for _ in range(120):
+            if board.has_won(WHITE) or board.has_won(BLACK):
+                break
+            with_dice(self.dice, rng.randint(1, 6), rng.randint(1, 6))
+            moves = legal_moves(board, color, self.dice)
+            self.assertEqual(len(legal_afterstates(board, color, self.dice)), len(moves))
+            if moves:
+                board.apply(rng.choice(moves), color)
+            color = -color
+
+
+class TestCompactMoves(unittest.TestCase):
+    def setUp(self) -> None:
+        config_path = Path(__file__).resolve().parents[2] / "config-test.yml"
+        self.config = ConfigLoader(str(config_path))
+        self.dice = Dice(self.config.get_die_sides())
+
+    def test_compact_codes_decode_to_the_same_moves_in_order(self):
+        rng = random.Random(4)
+        board = Board.initial(self.config)
+        color = WHITE
+        for _ in range(80):
+            if board.has_won(WHITE) or board.has_won(BLACK):
+                break
+            for d1, d2 in ((1, 2), (4, 4), (6, 5), (1, 1)):
+                with_dice(self.dice, d1, d2)
+                moves = legal_moves(board, color, self.dice)
+                codes = legal_moves(board, color, self.dice, compact=True)
+                self.assertEqual([decode_move(code, color) for code in codes], moves)
+                self.assertEqual([encode_move(m, color) for m in moves], codes)
+            with_dice(self.dice, rng.randint(1, 6), rng.randint(1, 6))
+            moves = legal_moves(board, color, self.dice)
+            if moves:
+                board.apply(rng.choice(moves), color)
+            color = -color
+
+    def test_bear_off_round_trip(self):
+        move = Move((HalfMove(3, 0), HalfMove(2, 0), HalfMove(5, 3), HalfMove(3, 1)))
+        code = encode_move(move, BLACK)
+        self.assertEqual(list(iter_halves(code, BLACK)), [(3, 0), (2, 0), (5, 3), (3, 1)])
+        self.assertEqual(decode_move(code, BLACK), move)
+
+
+class TestMoveCache(unittest.TestCase):
+    def setUp(self) -> None:
+        config_path = Path(__file__).resolve().parents[2] / "config-test.yml"
+        self.config = ConfigLoader(str(config_path))
+        self.board = Board.initial(self.config)
+        self.dice = Dice(self.config.get_die_sides())
+
+    def tearDown(self) -> None:
+        disable_move_cache()
+
+    def test_hits_and_die_order(self):
+        uncached = legal_moves(self.board, WHITE, with_dice(self.dice, 2, 5))
+        uncached_swapped = legal_moves(self.board, WHITE, with_dice(self.dice, 5, 2))
+        cache = enable_move_cache(16)
+        first = legal_moves(self.board, WHITE, with_dice(self.dice, 2, 5))
+        again = legal_moves(self.board, WHITE, with_dice(self.dice, 2, 5))
+        swapped = legal_moves(self.board, WHITE, with_dice(self.dice, 5, 2))
+        # Half-move order follows the dice as given, cached or not.
+        self.assertEqual(first, uncached)
+        self.assertEqual(again, uncached)
+        self.assertEqual(swapped, uncached_swapped)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["size"]), (1, 2, 2))
+
+        # compact results are cached separately; the position is keyed by hash.
+        legal_moves(self.board, WHITE, self.dice, compact=True)
+        token = self.board.apply(first[0], WHITE)
+        after = legal_moves(self.board, WHITE, self.dice)
+        self.board.undo(token)
+        self.assertEqual(cache.misses, 4)
+        self.assertNotEqual(after, swapped)
+
+    def test_returned_lists_are_independent(self):
+        enable_move_cache(4)
+        moves = legal_moves(self.board, BLACK, with_dice(self.dice, 3, 3))
+        moves.clear()
+        self.assertTrue(legal_moves(self.board, BLACK, self.dice))
+
+    def test_lru_eviction(self):
+        cache = enable_move_cache(2)
+        for d1, d2 in ((1, 2), (3, 4), (1, 2), (5, 6), (3, 4)):
+            legal_moves(self.board, WHITE, with_dice(self.dice, d1, d2))
+        # (3, 4) was the least recently used entry when (5, 6) came in.
+        self.assertEqual((cache.hits, cache.misses, len(cache.entries)), (1, 4, 2))
+
+    def test_rejects_non_positive_capacity(self):
+        with self.assertRaises(ValueError):
+            enable_move_cache(0)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,108 @@
+import random
+import unittest
+
+from domain import Board, Dice, PackedBoard, WHITE, BLACK, HalfMove, Move, legal_moves
+from domain.move_code import encode_move
+
+
+def _random_walk(seed: int, plies: int = 200):
+    """Yield (board, color, move) along a random legal-move game."""
+    rng = random.Random(seed)
+    board = Board.initial(board_size=24, home_size=6, pieces_per_player=15)
+    dice = Dice(6)
+    color = WHITE
+    for _ in range(plies):
+        if board.has_won(WHITE) or board.has_won(BLACK):
+            return
+        dice.set(rng.randint(1, 6), rng.randint(1, 6))
+        moves = legal_moves(board, color, dice)
+        if moves:
+            move = rng.choice(moves)
+            yield board, color, move
+            board.apply(move, color)
+        color = -color
+
+
+class TestPackedBoard(unittest.TestCase):
+    def test_round_trip_with_pin_and_bear_off(self):
+        b = Board(board_size=24, home_size=6, pieces_per_player=15)
+        b.set_point(10, WHITE, 2, pinned=True)
+        b.set_point(3, BLACK, 4)
+        b.set_point(0, BLACK, 2)
+        b.borne_off[BLACK] = 2
+        p = PackedBoard.from_board(b)
+        self.assertEqual(p.zobrist, b.zobrist)
+        self.assertEqual(p.count(10), 2)
+        self.assertEqual(p.owner(10), WHITE)
+        self.assertTrue(p.is_pinned(10))
+        self.assertEqual(p.borne_off, b.borne_off)
+        back = p.to_board()
+        self.assertEqual((back.n, back.color, back.pinned, back.borne_off),
+                         (b.n, b.color, b.pinned, b.borne_off))
+        self.assertEqual(back.zobrist, b.zobrist)
+
+    def test_pin_and_release(self):
+        p = PackedBoard()
+        p.cells[5] = WHITE
+        p.cells[6] = BLACK
+        p.recompute()
+        p.apply(Move((HalfMove(5, 6),)), WHITE)
+        self.assertTrue(p.is_pinned(6))
+        self.assertEqual(p.owner(6), WHITE)
+        self.assertEqual(p.count(5), 0)
+        p.apply(Move((HalfMove(6, 7),)), WHITE)
+        self.assertEqual(p.owner(6), BLACK)
+        self.assertFalse(p.is_pinned(6))
+
+        p2 = PackedBoard()
+        p2.cells[5] = WHITE
+        p2.cells[6] = BLACK
+        p2.recompute()
+        start = (p2.key(), p2.zobrist)
+        p2.undo(p2.apply(Move((HalfMove(5, 6),)), WHITE))
+        self.assertEqual((p2.key(), p2.zobrist), start)
+
+    def test_illegal_push_raises(self):
+        p = PackedBoard()
+        p.cells[5] = WHITE
+        p.cells[6] = 2 * BLACK
+        with self.assertRaises(ValueError):
+            p.apply_half(5, 6, WHITE)
+
+    def test_tracks_board_along_random_games(self):
+        for seed in range(5):
+            packed = None
+            for board, color, move in _random_walk(seed):
+                if packed is None:
+                    packed = PackedBoard.from_board(board)
+                self.assertEqual(packed, PackedBoard.from_board(board))
+                self.assertEqual(packed.zobrist, board.zobrist)
+                self.assertEqual(packed.summary, board.summary)
+                for c in (WHITE, BLACK):
+                    self.assertEqual(packed.count_outside_home(c), board.count_outside_home(c))
+                    self.assertEqual(packed.has_won(c), board.has_won(c))
+                before = (packed.key(), packed.zobrist)
+                packed.undo(packed.apply(move, color))
+                self.assertEqual((packed.key(), packed.zobrist), before)
+                packed.undo(packed.apply(encode_move(move, color), color))
+                self.assertEqual((packed.key(), packed.zobrist), before)
+                packed.apply(move, color)
+
+    def test_incremental_hash_matches_recompute(self):
+        for board, _color, _move in _random_walk(7):
+            fresh = board.clone()
+            fresh.recompute()
+            self.assertEqual(board.zobrist, fresh.zobrist)
+            self.assertEqual(board.summary, fresh.summary)
+
+    def test_hashable_and_equal_by_position(self):
+        a = PackedBoard.from_board(Board.initial(board_size=24, home_size=6, pieces_per_player=15))
+        b = a.clone()
+        self.assertEqual(a, b)
+        self.assertEqual(len({a, b}), 1)
+        b.apply(Move((HalfMove(1, 4),)), WHITE)
+        self.assertNotEqual(a, b)
+
+
+if __name__ == "__main__":
+    unittest.main()
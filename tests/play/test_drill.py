@@ -6,7 +6,7 @@ from config.config_loader import ConfigLoader
 from domain.board import Board
 from domain.constants import WHITE, BLACK
 from domain.dice import Dice
-from domain.move_generation import legal_moves
+from domain.move_generation import disable_move_cache, enable_move_cache, legal_moves
 from play import loop
 from play.session import DiceMode, PlaySession
 
@@ -99,6 +99,25 @@ class TestMatchMoveNonDoubles(unittest.TestCase):
         self.assertEqual(_strs(_match([18, 20], ranked, (1, 4), False)), ["(18->17,20->16)"])
 
 
+class TestMatchMoveWithMoveCache(unittest.TestCase):
+    """Play enables the move cache; input order must still map to die order."""
+
+    def setUp(self):
+        enable_move_cache(16)
+
+    def tearDown(self):
+        disable_move_cache()
+
+    def test_low_die_first(self):
+        board = Board.initial(_config())
+        dice = Dice(6)
+        dice.set(5, 2)
+        legal_moves(board, WHITE, dice)  # cache the swapped roll first
+        dice.set(2, 5)
+        ranked = [(m, 0.0) for m in legal_moves(board, WHITE, dice)]
+        self.assertEqual(_strs(_match([1, 1], ranked, (2, 5), True)), ["(1->3,1->6)"])
+
+
 # --- _match_move: doubles ----------------------------------------------
 
 
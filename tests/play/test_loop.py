@@ -148,6 +148,10 @@ class TestAiTurnUsesTimeBudget(unittest.TestCase):
             agent.last_kwargs.get("max_branch"),
             s.config.get_search_max_branch(),
         )
+        self.assertEqual(
+            agent.last_kwargs.get("chance_pruning"),
+            s.config.get_search_chance_pruning(),
+        )
         # The AI move was committed.
         self.assertEqual(s.ply_count(), 1)
 
@@ -140,6 +140,11 @@ class TestReviewDrillCommands(unittest.TestCase):
     def test_review_custom_threshold(self):
         self.assertEqual(parse_command("review 15"), Review(threshold=0.15))
 
+    def test_review_rollout(self):
+        self.assertEqual(parse_command("review rollout"), Review(threshold=0.10, rollout=True))
+        self.assertEqual(parse_command("review 15 rollout"), Review(threshold=0.15, rollout=True))
+        self.assertIsInstance(parse_command("review rollout 15"), Unparseable)
+
     def test_drill_default_threshold(self):
         self.assertEqual(parse_command("drill"), Drill(threshold=0.10))
 
@@ -1,15 +1,42 @@
-"""Microbenchmark: time legal_moves on three fixed positions.
+"""Domain / engine microbenchmark suite with regression baselines.
+
+Times the engine's hot paths on a corpus of positions sampled from real games
+(the gold model playing itself 1-ply greedy under a fixed dice seed), plus the
+three hand-built legal_moves positions this tool started with:
+
+- ``legal_moves.*``: the fixed positions and the corpus (Move and compact codes)
+- ``board.*``: apply+undo, clone, count_outside_home
+- ``encode.*``: BoardEncoder.encode_board for every encoder version
+- ``bearoff.*``: race_state on the corpus, exact_value_on_roll on small races
+- ``agent.*``: 1-ply and 2-ply evaluate_moves
+- ``selfplay.game``: one full play_one_game_record game
+
+Every bench reports the median and p95 time *per operation* over repeated
+rounds. ``--json`` writes the results, ``--compare`` checks them against a
+previously written file and exits 1 when any bench is slower than
+``--threshold`` (relative median), so a baseline can gate a refactor:
+
+    python -m tools.bench_domain --json baseline.json      # before
+    python -m tools.bench_domain --compare baseline.json   # after
 
 Usage:
-    python -m tools.bench_domain [iterations]   # default 10000
+    python -m tools.bench_domain [--quick] [--only SUBSTR ...]
+                                 [--json OUT] [--compare BASELINE] [--threshold 0.10]
 """
 
 import argparse
+import json
+import platform
+import random
 import statistics
+import subprocess
 import sys
 import time
 from pathlib import Path
-from typing import Callable, List, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
 
 from config.config_loader import ConfigLoader
 from domain.board import Board
@@ -18,7 +45,13 @@ from domain.move_generation import legal_moves
 from domain.constants import WHITE, BLACK
 
 
-CONFIG_PATH = Path(__file__).resolve().parents[1] / "config-test.yml"
+ROOT = Path(__file__).resolve().parents[1]
+CONFIG_PATH = ROOT / "config-test.yml"
+MAIN_CONFIG_PATH = ROOT / "config" / "config.yml"
+ENCODER_VERSIONS = ("legacy_unary_v1", "unary_v2", "unary_v3")
+
+# A bench returns (run_one_round, ops_per_round); timings are reported per op.
+Bench = Callable[[], Tuple[Callable[[], None], int]]
 
 
 def position_opening() -> Tuple[Board, str, int, List[Tuple[int, int]]]:
@@ -61,6 +94,9 @@ def position_late_bear_off() -> Tuple[Board, str, int, List[Tuple[int, int]]]:
     return board, "late-bear-off", WHITE, schedule
 
 
+FIXED_POSITIONS = (position_opening, position_midgame_two_pins, position_late_bear_off)
+
+
 def _time_calls(fn: Callable[[], None], iterations: int) -> List[float]:
     times = []
     for _ in range(iterations):
@@ -73,32 +109,260 @@ def _time_calls(fn: Callable[[], None], iterations: int) -> List[float]:
 def _stats(times: List[float]) -> Tuple[float, float, float]:
     n = len(times)
     sorted_t = sorted(times)
-    p95 = sorted_t[int(n * 0.95)]
+    p95 = sorted_t[min(n - 1, int(n * 0.95))]
     return statistics.median(times) * 1e6, p95 * 1e6, statistics.mean(times) * 1e6
 
 
-def bench_one_position(builder, iterations: int) -> None:
-    board, name, color, schedule = builder()
-    print(f"\n=== {name} (color={'W' if color == WHITE else 'B'}, {iterations} iters per dice) ===")
-    print(f"{'dice':<8} {'median':>11} {'p95':>9} {'moves':>8}")
-    for v1, v2 in schedule:
-        dice = Dice(6)
-        dice.set(v1, v2)
-        call = lambda: legal_moves(board, color, dice)
-        for _ in range(50):
-            call()
-        times = _time_calls(call, iterations)
-        med, p95, _ = _stats(times)
-        nmoves = len(call())
-        print(f"{v1},{v2:<6}{med:>10.1f}µs {p95:>8.1f}µs {nmoves:>8d}")
+# --- corpus ---
+
+
+def _load_agent(config: ConfigLoader, model_path: str):
+    """The gold checkpoint, or a seeded random unary_v3 net when it is missing
+    (timings stay comparable; the sampled positions are just less realistic)."""
+    from ai.checkpoint_io import load_agent_from_checkpoint
+
+    if Path(model_path).exists():
+        agent, _ = load_agent_from_checkpoint(model_path, config)
+        return agent, model_path
+    from ai.agent import Agent
+    from ai.board_encoder import BoardEncoder
+    from ai.board_evaluator import BoardEvaluator
+
+    torch.manual_seed(0)
+    encoder = BoardEncoder(config, version="unary_v3")
+    evaluator = BoardEvaluator(encoder.input_size, hidden_sizes=[256, 128, 64])
+    evaluator.eval()
+    return Agent(evaluator, encoder), "random-init"
+
+
+def sample_corpus(agent, config: ConfigLoader, games: int, seed: int = 0
+                  ) -> List[Tuple[Board, int, Dice]]:
+    """(board, color to move, roll) at every ply of `games` greedy self-play
+    games with seeded dice. Positions without a legal move are skipped."""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(games):
+        board = Board.initial(config)
+        color = WHITE
+        while not (board.has_won(WHITE) or board.has_won(BLACK)):
+            dice = Dice(config.get_die_sides())
+            dice.set(rng.randint(1, 6), rng.randint(1, 6))
+            moves = legal_moves(board, color, dice, compact=True)
+            if moves:
+                corpus.append((board.clone(), color, dice))
+                move, _ = agent.get_best_move(board, moves, color)
+                board.apply(move, color)
+            color = -color
+    return corpus
+
+
+# --- benches ---
+
+
+def build_benches(config: ConfigLoader, agent, corpus, quick: bool) -> Dict[str, Bench]:
+    from ai.bearoff import BearoffDB, exact_value_on_roll, race_state
+    from ai.board_encoder import BoardEncoder
+    from ai.self_play_worker import play_one_game_record
+
+    boards = [b for b, _, _ in corpus]
+    benches: Dict[str, Bench] = {}
+
+    for builder in FIXED_POSITIONS:
+        def fixed(builder=builder):
+            board, _, color, schedule = builder()
+            rolls = []
+            for v1, v2 in schedule:
+                dice = Dice(6)
+                dice.set(v1, v2)
+                rolls.append(dice)
+            return (lambda: [legal_moves(board, color, d) for d in rolls]), len(rolls)
+        benches[f"legal_moves.{builder()[1]}"] = fixed
+
+    def corpus_moves(compact: bool):
+        def bench():
+            return (lambda: [legal_moves(b, c, d, compact=compact) for b, c, d in corpus]), len(corpus)
+        return bench
+    benches["legal_moves.corpus"] = corpus_moves(False)
+    benches["legal_moves.corpus_compact"] = corpus_moves(True)
+
+    def apply_undo():
+        plays = []
+        for board, color, dice in corpus:
+            for move in legal_moves(board, color, dice, compact=True)[:4]:
+                plays.append((board, color, move))
+
+        def run():
+            for board, color, move in plays:
+                board.undo(board.apply(move, color))
+        return run, len(plays)
+    benches["board.apply_undo"] = apply_undo
+    benches["board.clone"] = lambda: ((lambda: [b.clone() for b in boards]), len(boards))
+    benches["board.count_outside_home"] = lambda: (
+        (lambda: [b.count_outside_home(c) for b, c, _ in corpus]), len(corpus))
+
+    for version in ENCODER_VERSIONS:
+        def encode(version=version):
+            encoder = BoardEncoder(config, version=version)
+            return (lambda: [encoder.encode_board(b, c == WHITE) for b, c, _ in corpus]), len(corpus)
+        benches[f"encode.{version}"] = encode
+
+    benches["bearoff.race_state"] = lambda: ((lambda: [race_state(b) for b in boards]), len(boards))
+
+    def exact_value():
+        # A 4-checker database builds in well under a second; the lookup path is
+        # the same as with the full 15-checker one.
+        hs = config.get_home_size()
+        db = BearoffDB.build(home_size=hs, max_checkers=4, board_size=config.get_board_size())
+        rng = random.Random(1)
+        races = []
+        for _ in range(200):
+            board = Board.from_config(config)
+            for color, home in ((WHITE, range(config.get_board_size() - hs + 1, config.get_board_size() + 1)),
+                                (BLACK, range(1, hs + 1))):
+                for _ in range(rng.randint(1, 4)):
+                    i = rng.choice(list(home))
+                    board.set_point(i, color, board.n[i] + 1)
+            races.append(board)
+        return (lambda: [exact_value_on_roll(b, True, db) for b in races]), len(races)
+    benches["bearoff.exact_value_on_roll"] = exact_value
+
+    def evaluate(plies: int, positions: int):
+        def bench():
+            sample = corpus[:: max(1, len(corpus) // positions)][:positions]
+            work = [(b, legal_moves(b, c, d, compact=True), c) for b, c, d in sample]
+
+            def run():
+                with torch.no_grad():
+                    for board, moves, color in work:
+                        agent.evaluate_moves(board, moves, color, lookahead_plies=plies)
+            return run, len(work)
+        return bench
+    benches["agent.evaluate_1ply"] = evaluate(1, 20 if quick else 100)
+    benches["agent.evaluate_2ply"] = evaluate(2, 1 if quick else 3)
+
+    def selfplay():
+        def run():
+            random.seed(0)
+            with torch.no_grad():
+                play_one_game_record(agent, agent.board_encoder, config,
+                                     epsilon=0.0, exploration_temperature=1.0)
+        return run, 1
+    benches["selfplay.game"] = selfplay
+
+    return benches
+
+
+def run_bench(bench: Bench, rounds: int) -> Dict[str, float]:
+    run, ops = bench()
+    run()  # warm-up (table builds, allocator, torch dispatch)
+    times = [t / ops for t in _time_calls(run, rounds)]
+    med, p95, mean = _stats(times)
+    return {"median_us": med, "p95_us": p95, "mean_us": mean, "ops": ops, "rounds": rounds}
+
+
+def _rounds_for(name: str, quick: bool) -> int:
+    if name.startswith(("agent.evaluate_2ply", "selfplay.")):
+        return 2 if quick else 5
+    if name.startswith("agent."):
+        return 3 if quick else 10
+    return 5 if quick else 30
+
+
+# --- baselines ---
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            threshold: float) -> List[str]:
+    """Print current vs baseline medians; return the names that regressed by
+    more than `threshold` (relative). Benches missing on either side are listed
+    but never count as regressions."""
+    regressions = []
+    print(f"\n{'bench':<34} {'baseline':>11} {'current':>11} {'change':>8}")
+    for name in sorted(set(results) | set(baseline)):
+        if name not in results or name not in baseline:
+            side = "baseline" if name in baseline else "current"
+            print(f"{name:<34} {'(only in ' + side + ')':>31}")
+            continue
+        old = baseline[name]["median_us"]
+        new = results[name]["median_us"]
+        change = new / old - 1.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif change < -threshold:
+            flag = "  faster"
+        print(f"{name:<34} {old:>9.1f}µs {new:>9.1f}µs {change:>+7.1%}{flag}")
+    return regressions
 
 
 def main(argv=None) -> int:
-    p = argparse.ArgumentParser()
-    p.add_argument("iterations", nargs="?", type=int, default=10000)
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--quick", action="store_true", help="smaller corpus and fewer rounds")
+    p.add_argument("--only", nargs="*", default=None, help="run benches whose name contains any SUBSTR")
+    p.add_argument("--games", type=int, default=None, help="corpus games (default 4, quick 1)")
+    p.add_argument("--model", default=None, help="checkpoint (default: gold_model_path of config/config.yml)")
+    p.add_argument("--json", dest="json_out", default=None, help="write results to this file")
+    p.add_argument("--compare", default=None, help="baseline JSON to compare against")
+    p.add_argument("--threshold", type=float, default=0.10,
+                   help="relative median slowdown that counts as a regression")
     args = p.parse_args(argv)
-    for builder in (position_opening, position_midgame_two_pins, position_late_bear_off):
-        bench_one_position(builder, args.iterations)
+
+    torch.set_num_threads(1)
+    np.random.seed(0)
+    config = ConfigLoader(str(CONFIG_PATH))
+    model_path = args.model or ConfigLoader(str(MAIN_CONFIG_PATH)).get_gold_model_path()
+    agent, model_used = _load_agent(config, str(ROOT / model_path))
+    games = args.games if args.games is not None else (1 if args.quick else 4)
+    corpus = sample_corpus(agent, config, games)
+    print(f"corpus: {len(corpus)} positions from {games} game(s), model {model_used}")
+
+    benches = build_benches(config, agent, corpus, args.quick)
+    if args.only:
+        benches = {n: b for n, b in benches.items() if any(s in n for s in args.only)}
+
+    results: Dict[str, Dict[str, float]] = {}
+    print(f"\n{'bench':<34} {'median':>11} {'p95':>11} {'ops':>6}")
+    for name, bench in benches.items():
+        r = run_bench(bench, _rounds_for(name, args.quick))
+        results[name] = r
+        print(f"{name:<34} {r['median_us']:>9.1f}µs {r['p95_us']:>9.1f}µs {r['ops']:>6d}")
+
+    if args.json_out:
+        payload = {
+            "meta": {
+                "commit": _git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "torch_threads": torch.get_num_threads(),
+                "model": model_used,
+                "corpus_games": games,
+                "corpus_positions": len(corpus),
+                "quick": args.quick,
+            },
+            "results": results,
+        }
+        with open(args.json_out, "w") as f:
+            json.dump(payload, f, indent=2)
+        print(f"\nwrote {args.json_out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+        print(f"\nno regressions above {args.threshold:.0%}")
     return 0
 
 